@@ -0,0 +1,88 @@
+"""Compressed renditions of uploaded audio, transcoded with ffmpeg and stored as blobs"""
+import asyncio
+import hashlib
+import os
+import shutil
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from uploads import BlobStore, UPLOAD_CHUNK_SIZE
+
+FFMPEG_BINARY = os.environ.get("FFMPEG_BINARY", "ffmpeg")
+
+AUDIO_MEDIA_TYPES = {
+    ".wav": "audio/wav",
+    ".mp3": "audio/mpeg",
+    ".m4a": "audio/mp4",
+    ".ogg": "audio/ogg",
+    ".opus": "audio/ogg",
+    ".flac": "audio/flac",
+}
+
+
+@dataclass
+class Rendition:
+    extension: str
+    container: str  # ffmpeg -f, the temp file has no telling extension
+    arguments: List[str]
+
+
+# Speech-oriented bitrates: Opus for browsers that play it, MP3 for the rest (Safari < 17)
+AUDIO_RENDITIONS: Dict[str, Rendition] = {
+    "opus": Rendition(".opus", "ogg", ["-c:a", "libopus", "-b:a", "64k", "-vbr", "on"]),
+    "mp3": Rendition(".mp3", "mp3", ["-c:a", "libmp3lame", "-b:a", "96k"]),
+}
+
+
+def ffmpeg_available() -> bool:
+    return shutil.which(FFMPEG_BINARY) is not None
+
+
+def _hash_file(path: Path) -> Tuple[str, int]:
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, "rb") as f:
+        while chunk := f.read(UPLOAD_CHUNK_SIZE):
+            digest.update(chunk)
+            size += len(chunk)
+    return digest.hexdigest(), size
+
+
+async def _transcode(source: Path, target: Path, rendition: Rendition):
+    process = await asyncio.create_subprocess_exec(
+        FFMPEG_BINARY, "-nostdin", "-y", "-loglevel", "error",
+        "-i", str(source), "-vn", "-map_metadata", "-1",
+        *rendition.arguments, "-f", rendition.container, str(target),
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.PIPE
+    )
+    _, stderr = await process.communicate()
+    if process.returncode != 0:
+        raise RuntimeError(f"ffmpeg exited with {process.returncode}: {stderr.decode(errors='replace')[-500:]}")
+
+
+async def transcode_renditions(source: Path, blob_store: BlobStore) -> Dict[str, str]:
+    """Transcode ``source`` into every rendition, each stored as a blob.
+
+    Returns ``{rendition: blob filename}``; the caller owns one reference
+    to each blob. On failure the blobs already stored are released.
+    """
+    stored: Dict[str, str] = {}
+    try:
+        for name, rendition in AUDIO_RENDITIONS.items():
+            # ".part" temp names are swept by the blob GC if we die halfway
+            temp_path = blob_store.upload_dir / f".{uuid.uuid4()}.part"
+            try:
+                await _transcode(source, temp_path, rendition)
+                sha256, size = await asyncio.to_thread(_hash_file, temp_path)
+                stored[name] = await blob_store.acquire(temp_path, sha256, rendition.extension, size)
+            finally:
+                if temp_path.exists():
+                    temp_path.unlink()
+    except Exception:
+        for filename in stored.values():
+            await blob_store.release(filename)
+        raise
+    return stored
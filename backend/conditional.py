@@ -0,0 +1,242 @@
+"""ETag / Last-Modified validators, 304 handling and byte ranges for served files"""
+import uuid
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from pathlib import Path
+from typing import Optional, Dict, List, Tuple
+
+import aiofiles
+from fastapi import Request
+from fastapi.responses import FileResponse, Response
+from fastapi.staticfiles import StaticFiles
+
+from uploads import BLOB_FILENAME
+
+# Content-addressed URLs never change meaning, everything else is revalidated
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "public, no-cache"
+
+# More ranges than this (after merging) are answered with the whole file
+MAX_RANGES = 16
+RANGE_CHUNK_SIZE = 64 * 1024
+
+
+def is_content_addressed(filename: str) -> bool:
+    return bool(BLOB_FILENAME.match(filename))
+
+
+def content_etag(filename: str, content_id: Optional[str] = None) -> Optional[str]:
+    """Strong ETag from a stored content hash, without touching the file"""
+    if content_id:
+        return f'"{content_id}"'
+    if is_content_addressed(filename):
+        return f'"{Path(filename).stem}"'
+    return None
+
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[datetime]) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # Weak comparison, as required for If-None-Match
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in tags or etag in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        return last_modified.replace(microsecond=0) <= since
+    return False
+
+
+def parse_range(header: str, size: int) -> Optional[List[Tuple[int, int]]]:
+    """Inclusive (start, end) byte ranges from a Range header, sorted and merged.
+
+    None means the header is ignored and the whole file is sent (unknown
+    unit, malformed, too many ranges); an empty list means none of the
+    ranges is satisfiable (416).
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes":
+        return None
+
+    ranges = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        first, dash, last = part.partition("-")
+        if not dash:
+            return None
+        try:
+            if first == "":
+                suffix = int(last)  # "-500": the last 500 bytes
+                if suffix == 0:
+                    continue
+                start, end = max(0, size - suffix), size - 1
+            else:
+                start = int(first)
+                end = int(last) if last else size - 1
+                if last and end < start:
+                    return None
+                end = min(end, size - 1)
+        except ValueError:
+            return None
+        if start < size:
+            ranges.append((start, end))
+
+    merged: List[Tuple[int, int]] = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    if len(merged) > MAX_RANGES:
+        return None
+    return merged
+
+
+def if_range_matches(request: Request, etag: str, last_modified: datetime) -> bool:
+    """False when If-Range names an older representation, so the full file must be sent"""
+    if_range = request.headers.get("if-range")
+    if if_range is None:
+        return True
+    if_range = if_range.strip()
+    if if_range.startswith(('"', "W/")):
+        # Strong comparison only
+        return if_range == etag
+    try:
+        since = parsedate_to_datetime(if_range)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    return last_modified.replace(microsecond=0) == since
+
+
+class PartialFileResponse(Response):
+    """206 response streaming byte ranges of a file, as multipart/byteranges when there are several"""
+
+    def __init__(self, path: Path, ranges: List[Tuple[int, int]], size: int, media_type: str,
+                 headers: Dict[str, str]):
+        self.path = path
+        self.status_code = 206
+        self.background = None
+        self.parts: List[Tuple[bytes, int, int]] = []
+        headers = dict(headers)
+
+        if len(ranges) == 1:
+            start, end = ranges[0]
+            self.parts.append((b"", start, end))
+            self.trailer = b""
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+            self.media_type = media_type
+            length = end - start + 1
+        else:
+            boundary = uuid.uuid4().hex
+            length = 0
+            for start, end in ranges:
+                head = (
+                    f"--{boundary}\r\nContent-Type: {media_type}\r\n"
+                    f"Content-Range: bytes {start}-{end}/{size}\r\n\r\n"
+                ).encode("latin-1")
+                self.parts.append((head, start, end))
+                length += len(head) + end - start + 1 + 2  # part body, then CRLF
+            self.trailer = f"--{boundary}--\r\n".encode("latin-1")
+            length += len(self.trailer)
+            self.media_type = f"multipart/byteranges; boundary={boundary}"
+
+        headers["Content-Length"] = str(length)
+        self.init_headers(headers)
+
+    async def __call__(self, scope, receive, send):
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if scope["method"] == "HEAD":
+            return await send({"type": "http.response.body", "body": b""})
+
+        multipart = bool(self.trailer)
+        async with aiofiles.open(self.path, "rb") as f:
+            for head, start, end in self.parts:
+                if head:
+                    await send({"type": "http.response.body", "body": head, "more_body": True})
+                await f.seek(start)
+                remaining = end - start + 1
+                while remaining > 0:
+                    chunk = await f.read(min(RANGE_CHUNK_SIZE, remaining))
+                    if not chunk:
+                        break
+                    remaining -= len(chunk)
+                    await send({"type": "http.response.body", "body": chunk, "more_body": True})
+                if multipart:
+                    await send({"type": "http.response.body", "body": b"\r\n", "more_body": True})
+        await send({"type": "http.response.body", "body": self.trailer})
+
+
+def conditional_file_response(
+    request: Request,
+    path: Path,
+    media_type: str,
+    filename: Optional[str] = None,
+    content_id: Optional[str] = None,
+    last_modified: Optional[datetime] = None,
+    cache_control: str = REVALIDATE_CACHE_CONTROL,
+    headers: Optional[Dict[str, str]] = None
+) -> Response:
+    """Serve ``path`` with validators, answering 304 when the client copy is current
+    and 206 (or 416) for Range requests.
+
+    ``content_id`` identifies the bytes (usually their SHA-256) and becomes
+    the ETag. ``last_modified`` is a naive UTC timestamp (as stored in Mongo). The
+    file is only stat'ed when the hash or the timestamp is unknown.
+    Only pass the immutable policy when the URL itself names the content.
+    """
+    etag = content_etag(path.name, content_id)
+    if etag is None or last_modified is None:
+        stat_result = path.stat()
+        if etag is None:
+            etag = f'"{stat_result.st_size:x}-{stat_result.st_mtime_ns:x}"'
+        if last_modified is None:
+            last_modified = datetime.utcfromtimestamp(stat_result.st_mtime)
+    last_modified = last_modified.replace(tzinfo=timezone.utc)
+
+    response_headers = {
+        "ETag": etag,
+        "Last-Modified": format_datetime(last_modified, usegmt=True),
+        "Cache-Control": cache_control,
+        "Accept-Ranges": "bytes"
+    }
+    response_headers.update(headers or {})
+
+    if is_not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=response_headers)
+
+    full_response = FileResponse(path=path, filename=filename, media_type=media_type, headers=response_headers)
+
+    range_header = request.headers.get("range")
+    if range_header and request.method in ("GET", "HEAD") and if_range_matches(request, etag, last_modified):
+        size = path.stat().st_size
+        ranges = parse_range(range_header, size)
+        if ranges == []:
+            return Response(status_code=416, headers={**response_headers, "Content-Range": f"bytes */{size}"})
+        if ranges is not None:
+            # Resumed downloads keep the attachment filename the full response sends
+            content_disposition = full_response.headers.get("content-disposition")
+            if content_disposition:
+                response_headers["Content-Disposition"] = content_disposition
+            return PartialFileResponse(path, ranges, size, media_type, response_headers)
+
+    return full_response
+
+
+class UploadStaticFiles(StaticFiles):
+    """StaticFiles that marks content-addressed uploads as immutable"""
+
+    def file_response(self, full_path, stat_result, scope, status_code=200) -> Response:
+        response = super().file_response(full_path, stat_result, scope, status_code)
+        if is_content_addressed(Path(full_path).name):
+            response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+        return response
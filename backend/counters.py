@@ -0,0 +1,100 @@
+"""Write-behind view/download counters flushed to Mongo in batches"""
+import asyncio
+import os
+import re
+from collections import defaultdict
+from typing import Dict, Optional
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
+
+COUNTER_FLUSH_INTERVAL = float(os.environ.get("COUNTER_FLUSH_INTERVAL", "5"))
+COUNTER_IGNORE_BOTS = os.environ.get("COUNTER_IGNORE_BOTS", "true").lower() == "true"
+
+# User agents that should not inflate view/download counts
+BOT_USER_AGENT = re.compile(
+    r"bot|crawl|spider|slurp|preview|facebookexternalhit|embedly|headless",
+    re.IGNORECASE
+)
+
+
+def is_bot(user_agent: Optional[str]) -> bool:
+    if not COUNTER_IGNORE_BOTS:
+        return False
+    return not user_agent or bool(BOT_USER_AGENT.search(user_agent))
+
+
+class CounterBuffer:
+    """Aggregates ``$inc`` updates in memory and writes them with one bulk_write.
+
+    Increments are keyed by document ``id`` and field name. A background task
+    flushes every ``flush_interval`` seconds; ``stop`` performs a final flush
+    so nothing is lost on a clean shutdown. Increments that were not written
+    are merged back into the buffer and retried on the next tick: only the
+    failed operations of a partial bulk write, everything otherwise.
+    """
+
+    def __init__(self, collection, flush_interval: float = COUNTER_FLUSH_INTERVAL):
+        self.collection = collection
+        self.flush_interval = flush_interval
+        self._pending: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self._task: Optional[asyncio.Task] = None
+
+    def increment(self, item_id: str, field: str, amount: int = 1):
+        self._pending[item_id][field] += amount
+
+    def pending(self, item_id: str, field: str) -> int:
+        """Increments for an item not yet written to Mongo"""
+        if item_id not in self._pending:
+            return 0
+        return self._pending[item_id].get(field, 0)
+
+    def discard(self, item_id: str):
+        """Drop buffered increments for a deleted item"""
+        self._pending.pop(item_id, None)
+
+    async def flush(self) -> int:
+        if not self._pending:
+            return 0
+
+        # Swap the buffer before awaiting so new increments go to a fresh one
+        batch, self._pending = self._pending, defaultdict(lambda: defaultdict(int))
+        items = list(batch.items())
+        operations = [UpdateOne({"id": item_id}, {"$inc": dict(fields)}) for item_id, fields in items]
+        try:
+            await self.collection.bulk_write(operations, ordered=False)
+        except BulkWriteError as e:
+            # Unordered: every operation not listed in writeErrors was applied
+            failed = {error["index"] for error in e.details.get("writeErrors", [])}
+            print(f"Error flushing counters: {len(failed)} of {len(operations)} updates failed")
+            self._merge_back(items[index] for index in sorted(failed))
+            return len(operations) - len(failed)
+        except PyMongoError as e:
+            print(f"Error flushing counters: {e}")
+            self._merge_back(items)
+            return 0
+        return len(operations)
+
+    def _merge_back(self, items):
+        for item_id, fields in items:
+            for field, amount in fields.items():
+                self._pending[item_id][field] += amount
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
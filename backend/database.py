@@ -0,0 +1,78 @@
+"""Motor client options from the environment and read-preference routing for public reads"""
+import os
+from typing import Dict
+
+from pymongo.read_preferences import Nearest, Primary, PrimaryPreferred, Secondary, SecondaryPreferred
+
+# Unset variables leave the option to the connection string or the driver default
+CLIENT_OPTIONS = (
+    ("maxPoolSize", "MONGO_MAX_POOL_SIZE", int),
+    ("minPoolSize", "MONGO_MIN_POOL_SIZE", int),
+    ("maxIdleTimeMS", "MONGO_MAX_IDLE_TIME_MS", int),
+    ("maxConnecting", "MONGO_MAX_CONNECTING", int),
+    ("waitQueueTimeoutMS", "MONGO_WAIT_QUEUE_TIMEOUT_MS", int),
+    ("connectTimeoutMS", "MONGO_CONNECT_TIMEOUT_MS", int),
+    ("socketTimeoutMS", "MONGO_SOCKET_TIMEOUT_MS", int),
+    ("serverSelectionTimeoutMS", "MONGO_SERVER_SELECTION_TIMEOUT_MS", int),
+    ("compressors", "MONGO_COMPRESSORS", str),  # e.g. "zstd,zlib"
+    ("zlibCompressionLevel", "MONGO_ZLIB_COMPRESSION_LEVEL", int),
+)
+
+# Public listings, details, stats and download lookups; writes always go to the primary
+MONGO_PUBLIC_READ_PREFERENCE = os.environ.get("MONGO_PUBLIC_READ_PREFERENCE", "primary")
+MONGO_MAX_STALENESS_SECONDS = int(os.environ.get("MONGO_MAX_STALENESS_SECONDS", "90"))  # server minimum is 90
+MONGO_HEARTBEAT_SECONDS = 10  # driver default heartbeatFrequencyMS, added to the staleness bound
+
+READ_PREFERENCES = {
+    "primary": Primary,
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
+
+
+def client_options() -> dict:
+    options = {}
+    for option, variable, parse in CLIENT_OPTIONS:
+        value = os.environ.get(variable)
+        if value is not None:
+            options[option] = parse(value)
+    return options
+
+
+def public_read_preference(mode: str = MONGO_PUBLIC_READ_PREFERENCE, max_staleness: int = MONGO_MAX_STALENESS_SECONDS):
+    if mode not in READ_PREFERENCES:
+        raise ValueError(f"Unknown read preference {mode!r}, expected one of {', '.join(READ_PREFERENCES)}")
+    if mode == "primary":
+        return Primary()
+    return READ_PREFERENCES[mode](max_staleness=max_staleness)
+
+
+class ReadRouter:
+    """Collection handles for public reads.
+
+    Reads use ``read_preference`` (bounded staleness on secondaries),
+    except on collections this worker saw written within the staleness
+    bound: those read from the primary, so the reads that follow a write,
+    and the response cache entries they fill, include it. ``versions`` are
+    the response cache tag versions, bumped by every write.
+    """
+
+    def __init__(self, db, read_preference, versions, max_staleness: int = MONGO_MAX_STALENESS_SECONDS):
+        self.primary = db
+        self.replica = db if isinstance(read_preference, Primary) else db.with_options(read_preference=read_preference)
+        self.versions = versions
+        self.window = max_staleness + MONGO_HEARTBEAT_SECONDS
+        self._primary_collections: Dict[str, object] = {}
+        self._replica_collections: Dict[str, object] = {}
+
+    def __getitem__(self, name: str):
+        if self.replica is self.primary or self.versions.changed_within(name, self.window):
+            collections, db = self._primary_collections, self.primary
+        else:
+            collections, db = self._replica_collections, self.replica
+        collection = collections.get(name)
+        if collection is None:
+            collection = collections[name] = db[name]
+        return collection
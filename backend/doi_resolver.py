@@ -0,0 +1,158 @@
+"""Async CrossRef DOI resolver with a persistent cache and single-flight lookups"""
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Optional, Dict, Any
+from urllib.parse import quote
+
+import httpx
+
+from metrics import metrics
+
+CROSSREF_API_URL = os.environ.get("CROSSREF_API_URL", "https://api.crossref.org")
+DOI_CACHE_TTL_HOURS = int(os.environ.get("DOI_CACHE_TTL_HOURS", "720"))  # 30 dias
+DOI_NEGATIVE_CACHE_TTL_MINUTES = int(os.environ.get("DOI_NEGATIVE_CACHE_TTL_MINUTES", "60"))
+DOI_REQUEST_TIMEOUT = float(os.environ.get("DOI_REQUEST_TIMEOUT", "10"))
+
+
+def normalize_doi(doi: str) -> str:
+    """Canonical cache key for a DOI (DOIs are case-insensitive)"""
+    doi = doi.strip()
+    for prefix in ("https://doi.org/", "http://doi.org/", "https://dx.doi.org/", "http://dx.doi.org/", "doi:"):
+        if doi.lower().startswith(prefix):
+            doi = doi[len(prefix):]
+            break
+    return doi.lower()
+
+
+def parse_crossref_work(work: Dict[str, Any]) -> Dict[str, Any]:
+    """Extract the fields used by the product form from a CrossRef work"""
+    metadata = {
+        "title": work.get("title", [""])[0] if work.get("title") else "",
+        "authors": [],
+        "journal": work.get("container-title", [""])[0] if work.get("container-title") else "",
+        "publication_year": work.get("published-print", {}).get("date-parts", [[None]])[0][0] or
+                            work.get("published-online", {}).get("date-parts", [[None]])[0][0],
+        "abstract": work.get("abstract", ""),
+        "url": work.get("URL", "")
+    }
+
+    # Extract authors
+    if work.get("author"):
+        for author in work["author"]:
+            given = author.get("given", "")
+            family = author.get("family", "")
+            full_name = f"{given} {family}".strip()
+            if full_name:
+                metadata["authors"].append(full_name)
+
+    return metadata
+
+
+class DoiResolver:
+    """Resolves DOIs through CrossRef without blocking the event loop.
+
+    Results are stored in a Mongo collection keyed by the normalized DOI.
+    Unknown DOIs are cached for a shorter period, transient failures
+    (timeouts, 5xx) are not cached at all. Concurrent lookups for the same
+    DOI share a single upstream request.
+    """
+
+    def __init__(
+        self,
+        cache_collection,
+        base_url: str = CROSSREF_API_URL,
+        ttl: timedelta = timedelta(hours=DOI_CACHE_TTL_HOURS),
+        negative_ttl: timedelta = timedelta(minutes=DOI_NEGATIVE_CACHE_TTL_MINUTES),
+        timeout: float = DOI_REQUEST_TIMEOUT,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.cache_collection = cache_collection
+        self.base_url = base_url.rstrip("/")
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.timeout = timeout
+        self.transport = transport  # lets tests answer for CrossRef
+        self._client: Optional[httpx.AsyncClient] = None
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                headers={"Accept": "application/json"},
+                limits=httpx.Limits(max_connections=10, max_keepalive_connections=5),
+                transport=self.transport,
+            )
+        return self._client
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def resolve(self, doi: str) -> Optional[Dict[str, Any]]:
+        """Return metadata for a DOI, or None if CrossRef does not know it"""
+        key = normalize_doi(doi)
+        if not key:
+            return None
+
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._lookup(key))
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+
+        # Shield so a cancelled caller does not cancel the shared lookup
+        return await asyncio.shield(future)
+
+    async def _lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        cached = await self.cache_collection.find_one({"_id": key})
+        if cached and cached["expires_at"] > datetime.utcnow():
+            return cached.get("metadata")
+
+        try:
+            found, metadata = await self._fetch(key)
+        except httpx.HTTPError as e:
+            print(f"Error fetching DOI metadata: {e}")
+            return None
+
+        if found is not None:
+            ttl = self.ttl if found else self.negative_ttl
+            now = datetime.utcnow()
+            await self.cache_collection.update_one(
+                {"_id": key},
+                {"$set": {
+                    "metadata": metadata,
+                    "found": found,
+                    "fetched_at": now,
+                    "expires_at": now + ttl
+                }},
+                upsert=True
+            )
+        return metadata
+
+    async def _fetch(self, key: str):
+        """Query CrossRef; ``found`` is None when the answer is not cacheable"""
+        start = time.perf_counter()
+        try:
+            response = await self.client.get(f"{self.base_url}/works/{quote(key, safe='/')}")
+        except httpx.HTTPError:
+            metrics.inc("crossref_requests_total", outcome="error")
+            raise
+        finally:
+            metrics.observe("crossref_request_duration_seconds", time.perf_counter() - start)
+        metrics.inc("crossref_requests_total", outcome=str(response.status_code))
+
+        if response.status_code == 200:
+            try:
+                return True, parse_crossref_work(response.json()["message"])
+            except (ValueError, KeyError, IndexError, TypeError, AttributeError) as e:
+                # Malformed record (bad JSON, odd date-parts): not found, and not cached
+                print(f"Error parsing DOI metadata for {key}: {e!r}")
+                return None, None
+        if response.status_code in (400, 404):
+            return False, None
+        return None, None
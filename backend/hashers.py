@@ -0,0 +1,88 @@
+"""Salted scrypt password hashing, run off the event loop"""
+import asyncio
+import base64
+import hashlib
+import hmac
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+# Cost parameters; memory per hash is 128 * n * r bytes (16MB by default)
+PASSWORD_SCRYPT_N = int(os.environ.get("PASSWORD_SCRYPT_N", str(2 ** 14)))
+PASSWORD_SCRYPT_R = int(os.environ.get("PASSWORD_SCRYPT_R", "8"))
+PASSWORD_SCRYPT_P = int(os.environ.get("PASSWORD_SCRYPT_P", "1"))
+PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 1)))
+
+SALT_SIZE = 16
+KEY_SIZE = 32
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.b64encode(data).decode().rstrip("=")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.b64decode(data + "=" * (-len(data) % 4))
+
+
+class ScryptHasher:
+    """Hashes as ``scrypt$n$r$p$salt$key``; also verifies legacy unsalted SHA-256 hex digests"""
+
+    algorithm = "scrypt"
+
+    def __init__(self, n: int = PASSWORD_SCRYPT_N, r: int = PASSWORD_SCRYPT_R, p: int = PASSWORD_SCRYPT_P,
+                 workers: int = PASSWORD_HASH_WORKERS):
+        self.n = n
+        self.r = r
+        self.p = p
+        self.workers = workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def _derive(self, password: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+        return hashlib.scrypt(
+            password.encode(), salt=salt, n=n, r=r, p=p,
+            maxmem=256 * n * r * p, dklen=KEY_SIZE
+        )
+
+    def hash(self, password: str) -> str:
+        salt = os.urandom(SALT_SIZE)
+        key = self._derive(password, salt, self.n, self.r, self.p)
+        return f"{self.algorithm}${self.n}${self.r}${self.p}${_b64encode(salt)}${_b64encode(key)}"
+
+    def verify(self, password: str, hashed_password: str) -> bool:
+        if not hashed_password.startswith(f"{self.algorithm}$"):
+            # Legacy hashes: hex SHA-256 of the password
+            legacy = hashlib.sha256(password.encode()).hexdigest()
+            return hmac.compare_digest(legacy, hashed_password)
+
+        try:
+            _, n, r, p, salt, key = hashed_password.split("$")
+            expected = _b64decode(key)
+            derived = self._derive(password, _b64decode(salt), int(n), int(r), int(p))
+        except ValueError:
+            return False
+        return hmac.compare_digest(derived, expected)
+
+    def needs_rehash(self, hashed_password: str) -> bool:
+        """True for legacy hashes and hashes made with other cost parameters"""
+        return not hashed_password.startswith(f"{self.algorithm}${self.n}${self.r}${self.p}$")
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        # Dedicated pool: a login burst queues here instead of starving other to_thread work
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hash")
+        return self._executor
+
+    async def hash_async(self, password: str) -> str:
+        return await asyncio.get_running_loop().run_in_executor(self.executor, self.hash, password)
+
+    async def verify_async(self, password: str, hashed_password: str) -> bool:
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, self.verify, password, hashed_password
+        )
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
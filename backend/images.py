@@ -0,0 +1,154 @@
+"""Resized image derivatives rendered in a process pool and kept in a size-bounded disk cache"""
+import asyncio
+import multiprocessing
+import os
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Dict, Optional
+
+from PIL import Image, ImageOps
+from PIL.Image import DecompressionBombError
+
+IMAGE_CACHE_DIR = Path(os.environ.get("IMAGE_CACHE_DIR", "image_cache"))
+IMAGE_CACHE_MAX_BYTES = int(os.environ.get("IMAGE_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))  # 256MB
+IMAGE_WORKERS = int(os.environ.get("IMAGE_WORKERS", "2"))
+
+# Requested widths are rounded up to one of these, so the cache stays bounded
+DERIVATIVE_WIDTHS = (160, 320, 640, 960, 1280, 1920)
+# Generated for every uploaded image (card thumbnails and detail views)
+STANDARD_WIDTHS = (320, 640, 1280)
+DEFAULT_QUALITY = 80
+DERIVATIVE_FORMATS = {
+    "webp": ("WEBP", "image/webp"),
+    "jpeg": ("JPEG", "image/jpeg"),
+}
+
+
+def render_derivative(source: str, destination: str, width: int, quality: int, image_format: str):
+    """Resize ``source`` to at most ``width`` pixels wide; runs in a worker process"""
+    with Image.open(source) as image:
+        image = ImageOps.exif_transpose(image)
+        if image.width > width:
+            height = max(1, round(image.height * width / image.width))
+            image = image.resize((width, height), Image.LANCZOS)
+        if image_format == "JPEG" and image.mode != "RGB":
+            image = image.convert("RGB")
+        elif image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA")
+
+        temp_path = f"{destination}.{uuid.uuid4()}.part"
+        image.save(temp_path, image_format, quality=quality)
+        os.replace(temp_path, destination)
+
+
+def snap_width(width: Optional[int]) -> int:
+    if width is None:
+        return DERIVATIVE_WIDTHS[-1]
+    for allowed in DERIVATIVE_WIDTHS:
+        if width <= allowed:
+            return allowed
+    return DERIVATIVE_WIDTHS[-1]
+
+
+def snap_quality(quality: Optional[int]) -> int:
+    if quality is None:
+        return DEFAULT_QUALITY
+    return min(95, max(30, round(quality / 5) * 5))
+
+
+class ImageDerivatives:
+    """Renders and caches resized copies of uploaded images.
+
+    Derivatives are named after the original file plus width, quality and
+    format, so content-addressed originals give content-addressed
+    derivatives. Cache hits refresh the file mtime; when the cache grows
+    past ``max_bytes`` the least recently used files are evicted.
+    """
+
+    def __init__(self, upload_dir: Path, cache_dir: Path = IMAGE_CACHE_DIR,
+                 max_bytes: int = IMAGE_CACHE_MAX_BYTES, workers: int = IMAGE_WORKERS):
+        self.upload_dir = upload_dir
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.workers = workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._size: Optional[int] = None
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # Spawned, not forked: the server runs Motor's threads, and a forked
+            # child would inherit their locks in whatever state they were in
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def cache_path(self, filename: str, width: int, quality: int, format_name: str) -> Path:
+        return self.cache_dir / f"{Path(filename).stem}_w{width}_q{quality}.{format_name}"
+
+    async def get(self, filename: str, width: int, quality: int, format_name: str) -> Path:
+        """Path of the derivative, rendering it first if it is not cached"""
+        path = self.cache_path(filename, width, quality, format_name)
+        if path.exists():
+            os.utime(path)
+            return path
+
+        key = path.name
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._render(filename, path, width, quality, format_name))
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        await asyncio.shield(future)
+        return path
+
+    async def pregenerate(self, filename: str):
+        """Render the standard sizes for a freshly uploaded image; errors propagate so the job is retried"""
+        for width in STANDARD_WIDTHS:
+            for format_name in DERIVATIVE_FORMATS:
+                await self.get(filename, width, DEFAULT_QUALITY, format_name)
+
+    async def _render(self, filename: str, path: Path, width: int, quality: int, format_name: str):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        loop = asyncio.get_running_loop()
+        executor = self.executor
+        try:
+            await loop.run_in_executor(
+                executor, render_derivative,
+                str(self.upload_dir / filename), str(path), width, quality, DERIVATIVE_FORMATS[format_name][0]
+            )
+        except BrokenProcessPool:
+            # A worker died (crash, OOM kill) and the pool refuses all further
+            # work; the next render starts a fresh one
+            if self._executor is executor:
+                self.close()
+            raise
+        if self._size is None:
+            self._size = sum(p.stat().st_size for p in self.cache_dir.iterdir() if p.is_file())
+        else:
+            self._size += path.stat().st_size
+        if self._size > self.max_bytes:
+            self._evict()
+
+    def _evict(self):
+        """Drop least recently used derivatives until the cache is at 90% of its budget"""
+        entries = sorted(
+            (p.stat().st_mtime, p.stat().st_size, p) for p in self.cache_dir.iterdir() if p.is_file()
+        )
+        size = sum(entry[1] for entry in entries)
+        target = self.max_bytes * 0.9
+        for _, file_size, path in entries:
+            if size <= target:
+                break
+            path.unlink(missing_ok=True)
+            size -= file_size
+        self._size = size
@@ -0,0 +1,252 @@
+"""Declarative Mongo index definitions and startup reconciliation"""
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from pymongo import ASCENDING, DESCENDING, TEXT
+from pymongo.errors import OperationFailure
+
+
+@dataclass
+class IndexSpec:
+    name: str
+    keys: List[Tuple[str, int]]
+    unique: bool = False
+    expire_after_seconds: Optional[int] = None
+    weights: Optional[Dict[str, int]] = None
+    default_language: Optional[str] = None
+    serves: List[str] = field(default_factory=list)
+
+    def options(self) -> dict:
+        options = {"name": self.name}
+        if self.unique:
+            options["unique"] = True
+        if self.expire_after_seconds is not None:
+            options["expireAfterSeconds"] = self.expire_after_seconds
+        if self.weights is not None:
+            options["weights"] = self.weights
+            options["default_language"] = self.default_language or "english"
+            # Documents never carry a per-document language
+            options["language_override"] = "text_language"
+        return options
+
+    @property
+    def is_text(self) -> bool:
+        return any(direction == TEXT for _, direction in self.keys)
+
+
+# Every index the API relies on, grouped by collection. "serves" lists the
+# queries each index exists for, so the startup report explains itself.
+INDEX_SPECS: Dict[str, List[IndexSpec]] = {
+    "products": [
+        IndexSpec("id_unique", [("id", ASCENDING)], unique=True, serves=[
+            "get_product", "update_product", "delete_product", "download_file"
+        ]),
+        IndexSpec("created_at_desc", [("created_at", DESCENDING), ("id", DESCENDING)], serves=[
+            "get_products (no filter)", "get_stats recent_products"
+        ]),
+        IndexSpec("product_type_created_at", [("product_type", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], serves=[
+            "get_products?product_type="
+        ]),
+        IndexSpec("publication_year_created_at", [("publication_year", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], serves=[
+            "get_products?year="
+        ]),
+        # Weighted full-text index; Portuguese stemming, and text index v3 is
+        # case- and diacritic-insensitive ("educacao" matches "educação")
+        IndexSpec("search_text", [("title", TEXT), ("keywords", TEXT), ("abstract", TEXT)],
+                  weights={"title": 10, "keywords": 5, "abstract": 1},
+                  default_language="portuguese", serves=[
+            "get_products?search="
+        ]),
+    ],
+    "news": [
+        IndexSpec("id_unique", [("id", ASCENDING)], unique=True, serves=[
+            "get_news_item", "delete_news"
+        ]),
+        IndexSpec("created_at_desc", [("created_at", DESCENDING), ("id", DESCENDING)], serves=[
+            "get_news (no filter)"
+        ]),
+        IndexSpec("category_created_at", [("category", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], serves=[
+            "get_news?category="
+        ]),
+    ],
+    "ensino": [
+        IndexSpec("id_unique", [("id", ASCENDING)], unique=True, serves=[
+            "delete_ensino", "download_ensino_material"
+        ]),
+        IndexSpec("created_at_desc", [("created_at", DESCENDING), ("id", DESCENDING)], serves=[
+            "get_ensino", "get_stats recent_ensino"
+        ]),
+    ],
+    "extensao": [
+        IndexSpec("id_unique", [("id", ASCENDING)], unique=True, serves=[
+            "delete_extensao", "download_extensao_material"
+        ]),
+        IndexSpec("created_at_desc", [("created_at", DESCENDING), ("id", DESCENDING)], serves=[
+            "get_extensao", "get_stats recent_extensao"
+        ]),
+    ],
+    "users": [
+        IndexSpec("username_unique", [("username", ASCENDING)], unique=True, serves=[
+            "login", "get_current_user", "register", "change_password"
+        ]),
+    ],
+    "blobs": [
+        IndexSpec("refcount_released_at", [("refcount", ASCENDING), ("released_at", ASCENDING)], serves=[
+            "blob garbage collection"
+        ]),
+    ],
+    "rate_limits": [
+        IndexSpec("expires_at_ttl", [("expires_at", ASCENDING)], expire_after_seconds=0, serves=[
+            "expiry of idle shared rate-limit buckets"
+        ]),
+    ],
+    "jobs": [
+        IndexSpec("status_run_at", [("status", ASCENDING), ("run_at", ASCENDING)], serves=[
+            "job claim (queued jobs due, expired leases)", "admin job counts"
+        ]),
+        IndexSpec("expires_at_ttl", [("expires_at", ASCENDING)], expire_after_seconds=0, serves=[
+            "expiry of finished jobs"
+        ]),
+    ],
+    "doi_cache": [
+        IndexSpec("expires_at_ttl", [("expires_at", ASCENDING)], expire_after_seconds=0, serves=[
+            "expiry of cached CrossRef lookups"
+        ]),
+    ],
+}
+
+
+def _is_text_index(info: dict) -> bool:
+    return ("_fts", "text") in [tuple(k) for k in info["key"]]
+
+
+def _same_keys(info: dict, spec: IndexSpec) -> bool:
+    if spec.is_text:
+        return _is_text_index(info)
+    return [tuple(k) for k in info["key"]] == [tuple(k) for k in spec.keys]
+
+
+def _matches(existing: dict, spec: IndexSpec) -> bool:
+    if spec.is_text:
+        return (
+            _is_text_index(existing)
+            and existing.get("weights") == spec.weights
+            and existing.get("default_language") == spec.default_language
+        )
+    return (
+        [tuple(k) for k in existing["key"]] == [tuple(k) for k in spec.keys]
+        and bool(existing.get("unique", False)) == spec.unique
+        and existing.get("expireAfterSeconds") == spec.expire_after_seconds
+    )
+
+
+def _definition(info: dict) -> Tuple[List[Tuple[str, int]], dict]:
+    """create_index arguments that rebuild an index from its index_information() entry"""
+    if _is_text_index(info):
+        keys = [(name, TEXT) for name in info["weights"]]
+    else:
+        keys = [tuple(k) for k in info["key"]]
+    options = {k: v for k, v in info.items() if k not in ("v", "key", "ns", "textIndexVersion")}
+    return keys, options
+
+
+async def _has_duplicates(collection, spec: IndexSpec) -> bool:
+    key_fields = {name.replace(".", "_"): f"${name}" for name, _ in spec.keys}
+    duplicates = await collection.aggregate([
+        {"$group": {"_id": key_fields, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+        {"$limit": 1}
+    ]).to_list(length=1)
+    return bool(duplicates)
+
+
+async def _create(collection, spec: IndexSpec) -> bool:
+    try:
+        await collection.create_index(spec.keys, **spec.options())
+        return True
+    except OperationFailure as e:
+        print(f"Could not create index {collection.name}.{spec.name}: {e}")
+        return False
+
+
+async def _replace(collection, spec: IndexSpec, old_name: str, old: dict) -> str:
+    """Swap ``old`` for ``spec`` without leaving the collection unindexed"""
+    if spec.unique and await _has_duplicates(collection, spec):
+        print(f"Not rebuilding {collection.name}.{spec.name}: duplicate keys would fail the unique build")
+        return "failed"
+
+    # Build the replacement first where MongoDB lets both coexist
+    if old_name != spec.name:
+        try:
+            await collection.create_index(spec.keys, **spec.options())
+        except OperationFailure:
+            pass  # same key pattern (or a second text index): must drop first
+        else:
+            await collection.drop_index(old_name)
+            return "rebuilt"
+
+    await collection.drop_index(old_name)
+    if await _create(collection, spec):
+        return "rebuilt"
+    keys, options = _definition(old)
+    try:
+        await collection.create_index(keys, **options)
+        print(f"Restored the previous {collection.name}.{old_name}")
+    except OperationFailure as e:
+        print(f"Could not restore {collection.name}.{old_name}: {e}")
+    return "failed"
+
+
+async def ensure_indexes(db, specs: Dict[str, List[IndexSpec]] = INDEX_SPECS) -> Dict[str, List[dict]]:
+    """Create missing indexes and rebuild drifted ones; safe to run on every startup.
+
+    Returns a per-collection report with the status of every declared index
+    and the queries it serves. An existing index on a declared key pattern
+    (under any name) stands for that declaration: it is kept if its options
+    match, and replaced if they drifted. The replacement is built before the
+    old index is dropped when MongoDB allows both at once; otherwise the old
+    one is dropped first and restored if the rebuild fails. Indexes on
+    undeclared key patterns are reported as unmanaged and never dropped.
+    """
+    report: Dict[str, List[dict]] = {}
+
+    for collection_name, collection_specs in specs.items():
+        collection = db[collection_name]
+        existing = await collection.index_information()
+        entries = []
+
+        for spec in collection_specs:
+            current_name = spec.name if spec.name in existing else None
+            # Same key pattern under another name (e.g. created by hand);
+            # a collection can only hold one text index
+            if current_name is None:
+                current_name = next(
+                    (name for name, info in existing.items() if name != "_id_" and _same_keys(info, spec)), None
+                )
+            current = existing.pop(current_name) if current_name else None
+
+            if current is None:
+                status = "created" if await _create(collection, spec) else "failed"
+            elif _matches(current, spec):
+                status = "ok"
+            else:
+                status = await _replace(collection, spec, current_name, current)
+
+            entry = {
+                "name": spec.name,
+                "keys": [list(k) for k in spec.keys],
+                "unique": spec.unique,
+                "status": status,
+                "serves": spec.serves
+            }
+            if current_name not in (None, spec.name):
+                entry["existing_name"] = current_name
+            entries.append(entry)
+
+        for name in existing:
+            if name != "_id_":
+                entries.append({"name": name, "status": "unmanaged", "serves": []})
+
+        report[collection_name] = entries
+
+    return report
@@ -0,0 +1,185 @@
+"""Persistent background jobs: Mongo job records, a worker pool, retries with backoff"""
+import asyncio
+import inspect
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from functools import partial
+from typing import Callable, Dict, Optional
+
+from pymongo import ReturnDocument
+
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "2"))
+JOB_MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", "5"))
+JOB_POLL_INTERVAL = float(os.environ.get("JOB_POLL_INTERVAL", "5"))
+JOB_LEASE = timedelta(seconds=int(os.environ.get("JOB_LEASE_SECONDS", "600")))
+JOB_RETENTION = timedelta(days=7)  # finished jobs are removed by the TTL index after this
+JOB_BACKOFF_BASE = 5  # seconds, doubled on every failed attempt
+JOB_BACKOFF_MAX = 600
+
+# Response header listing the jobs a request enqueued
+JOB_IDS_HEADER = "X-Job-Ids"
+
+
+def backoff(attempts: int) -> timedelta:
+    return timedelta(seconds=min(JOB_BACKOFF_BASE * 2 ** (attempts - 1), JOB_BACKOFF_MAX))
+
+
+class JobQueue:
+    """Runs registered handlers for jobs stored in ``collection``.
+
+    Jobs are claimed with an atomic find_one_and_update that sets a lease;
+    a job whose worker died (restart, crash) is claimed again once the
+    lease expires, so queued work survives restarts. Failed attempts are
+    retried with exponential backoff up to ``max_attempts``.
+
+    Coroutine handlers run on the event loop; plain functions run in a
+    thread pool of ``workers`` threads.
+    """
+
+    def __init__(self, collection, workers: int = JOB_WORKERS, poll_interval: float = JOB_POLL_INTERVAL,
+                 lease: timedelta = JOB_LEASE, max_attempts: int = JOB_MAX_ATTEMPTS):
+        self.collection = collection
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self._handlers: Dict[str, Callable] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._tasks = []
+        self._running = set()
+        self._wake: Optional[asyncio.Event] = None
+
+    def handler(self, kind: str):
+        """Register the function run for jobs of ``kind``; it receives the payload as keyword arguments"""
+        def register(function):
+            self._handlers[kind] = function
+            return function
+        return register
+
+    async def enqueue(self, kind: str, payload: dict, max_attempts: Optional[int] = None) -> str:
+        if kind not in self._handlers:
+            raise ValueError(f"No handler registered for job kind {kind!r}")
+        now = datetime.utcnow()
+        job_id = uuid.uuid4().hex
+        await self.collection.insert_one({
+            "_id": job_id,
+            "kind": kind,
+            "payload": payload,
+            "status": "queued",
+            "attempts": 0,
+            "max_attempts": max_attempts or self.max_attempts,
+            "run_at": now,
+            "created_at": now,
+            "updated_at": now,
+            "error": None
+        })
+        if self._wake is not None:
+            self._wake.set()
+        return job_id
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        job = await self.collection.find_one({"_id": job_id})
+        if job is not None:
+            job["id"] = job.pop("_id")
+        return job
+
+    async def counts(self) -> Dict[str, int]:
+        groups = await self.collection.aggregate([
+            {"$group": {"_id": "$status", "count": {"$sum": 1}}}
+        ]).to_list(length=None)
+        return {group["_id"]: group["count"] for group in groups}
+
+    async def claim(self) -> Optional[dict]:
+        now = datetime.utcnow()
+        return await self.collection.find_one_and_update(
+            {"$or": [
+                {"status": "queued", "run_at": {"$lte": now}},
+                {"status": "running", "lease_expires_at": {"$lte": now}},
+            ]},
+            {"$set": {"status": "running", "lease_expires_at": now + self.lease, "updated_at": now},
+             "$inc": {"attempts": 1}},
+            sort=[("run_at", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def _execute(self, job: dict):
+        function = self._handlers.get(job["kind"])
+        if function is None:
+            raise RuntimeError(f"No handler registered for job kind {job['kind']!r}")
+        if inspect.iscoroutinefunction(function):
+            return await function(**job["payload"])
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, partial(function, **job["payload"]))
+
+    async def run(self, job: dict):
+        try:
+            result = await self._execute(job)
+        except Exception as e:
+            now = datetime.utcnow()
+            update = {"error": f"{type(e).__name__}: {e}", "updated_at": now}
+            if job["attempts"] >= job["max_attempts"]:
+                update.update({"status": "failed", "finished_at": now, "expires_at": now + JOB_RETENTION})
+                print(f"Job {job['_id']} ({job['kind']}) failed after {job['attempts']} attempts: {e}")
+            else:
+                update.update({"status": "queued", "run_at": now + backoff(job["attempts"])})
+            await self.collection.update_one({"_id": job["_id"]}, {"$set": update, "$unset": {"lease_expires_at": ""}})
+            return
+
+        now = datetime.utcnow()
+        await self.collection.update_one({"_id": job["_id"]}, {
+            "$set": {"status": "done", "result": result, "error": None, "updated_at": now,
+                     "finished_at": now, "expires_at": now + JOB_RETENTION},
+            "$unset": {"lease_expires_at": ""}
+        })
+
+    async def _worker(self):
+        while True:
+            # Cleared before claiming, so an enqueue that races an empty claim still wakes us
+            self._wake.clear()
+            try:
+                job = await self.claim()
+            except Exception as e:
+                print(f"Job claim failed: {e}")
+                job = None
+            if job is not None:
+                self._running.add(job["_id"])
+                try:
+                    await self.run(job)
+                finally:
+                    self._running.discard(job["_id"])
+                continue
+            # Idle: wait for an enqueue here, or poll for retries and other workers' jobs
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self):
+        if self._tasks:
+            return
+        self._wake = asyncio.Event()
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="job")
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        """Stop the workers and hand interrupted jobs back to the queue without using up an attempt"""
+        interrupted = list(self._running)
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+        if interrupted:
+            await self.collection.update_many(
+                {"_id": {"$in": interrupted}, "status": "running"},
+                {"$set": {"status": "queued", "run_at": datetime.utcnow()},
+                 "$inc": {"attempts": -1}, "$unset": {"lease_expires_at": ""}}
+            )
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
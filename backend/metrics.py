@@ -0,0 +1,291 @@
+"""In-process runtime metrics rendered in the Prometheus text format"""
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from pymongo import monitoring
+from starlette.routing import Match
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in pairs) + "}"
+
+
+class MetricsRegistry:
+    """Counters, gauges and histograms keyed by name and label values.
+
+    Updates take one lock around a dict operation: pymongo reports commands
+    from its own threads, everything else runs on the event loop.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._descriptions: Dict[str, Tuple[str, str]] = {}
+        self._values: Dict[str, Dict[Labels, float]] = {}
+        self._histograms: Dict[str, Dict[Labels, list]] = {}
+        self._buckets: Dict[str, Tuple[float, ...]] = {}
+        self._collectors: List[Callable[[], List[Tuple[str, str, str, Dict[str, str], float]]]] = []
+
+    def describe(self, name: str, kind: str, help_text: str, buckets: Optional[Tuple[float, ...]] = None):
+        self._descriptions[name] = (kind, help_text)
+        if kind == "histogram":
+            self._buckets[name] = buckets or LATENCY_BUCKETS
+            self._histograms.setdefault(name, {})
+        else:
+            self._values.setdefault(name, {})
+
+    def inc(self, name: str, amount: float = 1, **labels):
+        key = tuple(labels.items())
+        with self._lock:
+            values = self._values[name]
+            values[key] = values.get(key, 0) + amount
+
+    def set(self, name: str, value: float, **labels):
+        with self._lock:
+            self._values[name][tuple(labels.items())] = value
+
+    def observe(self, name: str, value: float, **labels):
+        key = tuple(labels.items())
+        buckets = self._buckets[name]
+        index = bisect_left(buckets, value)
+        with self._lock:
+            series = self._histograms[name].get(key)
+            if series is None:
+                series = self._histograms[name][key] = [[0] * (len(buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def add_collector(self, collector: Callable):
+        """``collector()`` returns (name, kind, help, labels, value) samples read at scrape time"""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            values = {name: dict(series) for name, series in self._values.items()}
+            histograms = {
+                name: {key: (list(s[0]), s[1], s[2]) for key, s in series.items()}
+                for name, series in self._histograms.items()
+            }
+
+        for name, series in values.items():
+            kind, help_text = self._descriptions[name]
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+            lines += [f"{name}{_format_labels(key)} {value}" for key, value in series.items()]
+
+        for name, series in histograms.items():
+            kind, help_text = self._descriptions[name]
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+            buckets = self._buckets[name]
+            for key, (counts, total, count) in series.items():
+                cumulative = 0
+                for bound, bucket_count in zip(buckets, counts):
+                    cumulative += bucket_count
+                    lines.append(f"{name}_bucket{_format_labels(key, ('le', repr(float(bound))))} {cumulative}")
+                lines.append(f"{name}_bucket{_format_labels(key, ('le', '+Inf'))} {count}")
+                lines.append(f"{name}_sum{_format_labels(key)} {total}")
+                lines.append(f"{name}_count{_format_labels(key)} {count}")
+
+        described = set()
+        for collector in self._collectors:
+            for name, kind, help_text, labels, value in collector():
+                if name not in described:
+                    lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+                    described.add(name)
+                lines.append(f"{name}{_format_labels(tuple(labels.items()))} {value}")
+
+        return "\n".join(lines) + "\n"
+
+
+# Shared by the middleware, the Mongo listener and the modules that count their own work
+metrics = MetricsRegistry()
+metrics.describe("http_requests_total", "counter", "HTTP requests by route, method and status")
+metrics.describe("http_request_duration_seconds", "histogram", "HTTP request latency by route and method")
+metrics.describe("http_response_size_bytes", "histogram", "HTTP response body size by route", SIZE_BUCKETS)
+metrics.describe("http_requests_in_flight", "gauge", "HTTP requests being served")
+metrics.describe("http_request_exceptions_total", "counter", "Unhandled exceptions by route and method")
+metrics.describe("mongo_commands_total", "counter", "MongoDB commands by command name and outcome")
+metrics.describe("mongo_command_duration_seconds", "histogram", "MongoDB command latency by command name")
+metrics.describe("upload_bytes_total", "counter", "Uploaded bytes stored, by file kind")
+metrics.describe("crossref_requests_total", "counter", "CrossRef API requests by outcome")
+metrics.describe("crossref_request_duration_seconds", "histogram", "CrossRef API request latency")
+metrics.describe("mongo_pool_max_size", "gauge", "Configured maximum connections per server")
+metrics.describe("mongo_pool_connections", "gauge", "Open pool connections by server")
+metrics.describe("mongo_pool_connections_in_use", "gauge", "Checked-out pool connections by server")
+metrics.describe("mongo_pool_wait_seconds", "histogram", "Time spent waiting to check out a pool connection")
+metrics.describe("mongo_pool_checkout_failures_total", "counter", "Failed connection checkouts by server and reason")
+metrics.describe("mongo_pool_cleared_total", "counter", "Pool clears (server marked unknown) by server")
+metrics.set("http_requests_in_flight", 0)
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """Counts and times every command sent by the Mongo client"""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        metrics.inc("mongo_commands_total", command=event.command_name, outcome="ok")
+        metrics.observe("mongo_command_duration_seconds", event.duration_micros / 1e6, command=event.command_name)
+
+    def failed(self, event):
+        metrics.inc("mongo_commands_total", command=event.command_name, outcome="error")
+        metrics.observe("mongo_command_duration_seconds", event.duration_micros / 1e6, command=event.command_name)
+
+
+def _address(address) -> str:
+    host, port = address
+    return f"{host}:{port}"
+
+
+class ConnectionPoolMetrics(monitoring.ConnectionPoolListener):
+    """Pool size, utilization and checkout wait times, per server"""
+
+    def __init__(self):
+        # A driver thread checks out one connection at a time
+        self._checkout = threading.local()
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        metrics.inc("mongo_pool_cleared_total", address=_address(event.address))
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        metrics.inc("mongo_pool_connections", address=_address(event.address))
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        metrics.inc("mongo_pool_connections", -1, address=_address(event.address))
+
+    def connection_check_out_started(self, event):
+        self._checkout.started = time.perf_counter()
+
+    def connection_check_out_failed(self, event):
+        address = _address(event.address)
+        metrics.inc("mongo_pool_checkout_failures_total", address=address, reason=str(event.reason))
+        self._observe_wait(address)
+
+    def connection_checked_out(self, event):
+        address = _address(event.address)
+        metrics.inc("mongo_pool_connections_in_use", address=address)
+        self._observe_wait(address)
+
+    def connection_checked_in(self, event):
+        metrics.inc("mongo_pool_connections_in_use", -1, address=_address(event.address))
+
+    def _observe_wait(self, address: str):
+        started = getattr(self._checkout, "started", None)
+        if started is not None:
+            metrics.observe("mongo_pool_wait_seconds", time.perf_counter() - started, address=address)
+            self._checkout.started = None
+
+
+# (middleware, scope) of the request being served; Motor copies the context
+# into its executor threads, so command listeners can see it too
+_current_request: ContextVar = ContextVar("current_request", default=None)
+
+
+def current_route() -> str:
+    """Route of the request in this context as "METHOD /template", or "background" outside one"""
+    current = _current_request.get()
+    if current is None:
+        return "background"
+    middleware, scope = current
+    return f"{scope['method']} {middleware.route_template(scope)}"
+
+
+class MetricsMiddleware:
+    """Records count, latency and response size per route; the outermost middleware.
+
+    Routes are labelled by their path template so ids do not become label values.
+    """
+
+    def __init__(self, app, router, registry: MetricsRegistry = metrics):
+        self.app = app
+        self.router = router
+        self.registry = registry
+        self._in_flight = 0
+        self._paths: Optional[Dict[Any, str]] = None
+
+    def route_template(self, scope) -> str:
+        if self._paths is None:
+            # Built on first use: routes are all registered by then
+            self._paths = {}
+            for route in self.router.routes:
+                self._paths.setdefault(getattr(route, "endpoint", None) or getattr(route, "app", None), route.path)
+        path = self._paths.get(scope.get("endpoint"))
+        if path is not None:
+            return path
+        # Answered before routing (cache hit, 429, CORS preflight); a preflight
+        # only matches partially since no route accepts OPTIONS
+        partial = None
+        for route in self.router.routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return route.path
+            if match == Match.PARTIAL and partial is None:
+                partial = route.path
+        return partial or "unmatched"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        start = time.perf_counter()
+        status = 500
+        size = 0
+
+        async def send_and_measure(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        self._in_flight += 1
+        self.registry.set("http_requests_in_flight", self._in_flight)
+        request_token = _current_request.set((self, scope))
+        failed = False
+        try:
+            await self.app(scope, receive, send_and_measure)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            _current_request.reset(request_token)
+            self._in_flight -= 1
+            self.registry.set("http_requests_in_flight", self._in_flight)
+            route = self.route_template(scope)
+            method = scope["method"]
+            if failed:
+                self.registry.inc("http_request_exceptions_total", route=route, method=method)
+            self.registry.inc("http_requests_total", route=route, method=method, status=str(status))
+            self.registry.observe("http_request_duration_seconds", time.perf_counter() - start, route=route, method=method)
+            self.registry.observe("http_response_size_bytes", size, route=route, method=method)
@@ -0,0 +1,60 @@
+"""Keyset (cursor) pagination over (created_at, id)"""
+import base64
+import json
+from datetime import datetime
+from typing import Optional, List
+
+from fastapi import HTTPException, Response
+
+# Newest first; "id" breaks ties between items created in the same millisecond
+KEYSET_SORT = [("created_at", -1), ("id", -1)]
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(doc: dict) -> str:
+    payload = json.dumps({"c": doc["created_at"].isoformat(), "i": doc["id"]})
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> dict:
+    """Turn an opaque cursor into the filter selecting the items after it"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        created_at = datetime.fromisoformat(payload["c"])
+        item_id = str(payload["i"])
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    return {"$or": [
+        {"created_at": {"$lt": created_at}},
+        {"created_at": created_at, "id": {"$lt": item_id}}
+    ]}
+
+
+async def fetch_page(
+    collection,
+    query: dict,
+    response: Response,
+    skip: int = 0,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    projection: Optional[dict] = None
+) -> List[dict]:
+    """Fetch one page newest-first and advertise the next cursor in a header.
+
+    With ``cursor`` the page is located through the (created_at, id) index
+    and ``skip`` is ignored, so every page costs the same. Without it the
+    legacy skip/limit behaviour is kept.
+    """
+    if cursor:
+        query = {"$and": [query, decode_cursor(cursor)]} if query else decode_cursor(cursor)
+
+    find = collection.find(query, projection).sort(KEYSET_SORT)
+    if not cursor and skip:
+        find = find.skip(skip)
+    items = await find.limit(limit).to_list(length=limit)
+
+    if limit and len(items) == limit:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(items[-1])
+    return items
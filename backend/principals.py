@@ -0,0 +1,46 @@
+"""Short-lived cache of authenticated users keyed by token id"""
+import os
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+PRINCIPAL_CACHE_TTL = float(os.environ.get("PRINCIPAL_CACHE_TTL", "30"))
+PRINCIPAL_CACHE_SIZE = int(os.environ.get("PRINCIPAL_CACHE_SIZE", "1024"))
+
+
+class PrincipalCache:
+    """Maps a token id (``jti``) to the user document it resolved to.
+
+    Entries expire after ``ttl`` seconds, so a change made by another
+    worker is picked up within that window; changes made in this process
+    call ``invalidate_user`` and take effect immediately.
+    """
+
+    def __init__(self, ttl: float = PRINCIPAL_CACHE_TTL, max_entries: int = PRINCIPAL_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, dict]]" = OrderedDict()
+
+    def get(self, token_id: str) -> Optional[dict]:
+        entry = self._entries.get(token_id)
+        if entry is None:
+            return None
+        expires_at, user = entry
+        if time.monotonic() >= expires_at:
+            del self._entries[token_id]
+            return None
+        self._entries.move_to_end(token_id)
+        return user
+
+    def put(self, token_id: str, user: dict):
+        self._entries[token_id] = (time.monotonic() + self.ttl, user)
+        self._entries.move_to_end(token_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate_user(self, username: str):
+        for token_id in [k for k, (_, user) in self._entries.items() if user.get("username") == username]:
+            del self._entries[token_id]
+
+    def clear(self):
+        self._entries.clear()
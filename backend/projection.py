@@ -0,0 +1,37 @@
+"""Sparse fieldsets: Mongo projections and matching lightweight response models"""
+from functools import lru_cache
+from typing import Dict, Iterable, Optional, Tuple, Type
+
+from fastapi import HTTPException
+from pydantic import BaseModel, create_model
+
+# Always returned: identity plus the keyset pagination columns
+REQUIRED_FIELDS = ("id", "created_at")
+
+
+def parse_fields(model: Type[BaseModel], fields: str) -> Tuple[str, ...]:
+    """Validate a ``fields=a,b,c`` parameter against the model's fields"""
+    requested = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in requested if field not in model.model_fields]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return tuple(dict.fromkeys([*REQUIRED_FIELDS, *requested]))
+
+
+@lru_cache(maxsize=256)
+def partial_model(model: Type[BaseModel], fields: Tuple[str, ...]) -> Type[BaseModel]:
+    """A model with only ``fields``, same types and defaults as ``model``"""
+    definitions = {
+        name: (info.annotation, info)
+        for name, info in model.model_fields.items() if name in fields
+    }
+    return create_model(f"{model.__name__}Fields", **definitions)
+
+
+def projection_for(fields: Iterable[str], expressions: Optional[Dict[str, dict]] = None) -> dict:
+    """Mongo projection for ``fields``; ``expressions`` computes some of them server-side"""
+    projection = {"_id": 0}
+    for field in fields:
+        projection[field] = 1
+    projection.update(expressions or {})
+    return projection
@@ -0,0 +1,238 @@
+"""Per-shape Mongo query profile: slow-query log, route attribution and explain capture"""
+import asyncio
+import json
+import os
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from pymongo import monitoring
+
+from metrics import current_route
+
+SLOW_QUERY_MS = float(os.environ.get("SLOW_QUERY_MS", "100"))
+QUERY_PROFILE_MAX_SHAPES = int(os.environ.get("QUERY_PROFILE_MAX_SHAPES", "500"))
+QUERY_EXPLAIN = os.environ.get("QUERY_EXPLAIN", "on") != "off"
+
+# Driver housekeeping, not queries the API issues
+IGNORED_COMMANDS = {
+    "hello", "ismaster", "isMaster", "ping", "buildInfo", "endSessions", "killCursors",
+    "saslStart", "saslContinue", "authenticate", "explain", "listIndexes", "createIndexes",
+}
+
+# Where each command keeps the part of the query that decides the plan
+FILTER_FIELDS = {
+    "find": "filter",
+    "count": "query",
+    "distinct": "query",
+    "findAndModify": "query",
+    "aggregate": "pipeline",
+}
+
+EXPLAINABLE_COMMANDS = {"find", "count", "distinct", "findAndModify", "aggregate", "update", "delete"}
+
+OTHER_SHAPE = "(other shapes)"
+
+
+def _shape(value):
+    """The structure of a filter with every literal replaced by "?" """
+    if isinstance(value, dict):
+        return {key: _shape(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        # $in values collapse to one "?", $or branches keep their distinct shapes
+        shapes = []
+        for item in value:
+            shape = _shape(item)
+            if shape not in shapes:
+                shapes.append(shape)
+        return shapes
+    return "?"
+
+
+def query_shape(command_name: str, command: dict) -> str:
+    if command_name == "getMore":
+        return f"{command.get('collection')}.getMore"
+    collection = command.get(command_name)
+    parts = [f"{collection}.{command_name}"]
+    if command_name in ("update", "delete"):
+        statements = command.get(f"{command_name}s") or [{}]
+        parts.append(json.dumps(_shape(statements[0].get("q", {}))))
+    elif command_name in FILTER_FIELDS:
+        parts.append(json.dumps(_shape(command.get(FILTER_FIELDS[command_name], {}))))
+    sort = command.get("sort")
+    if sort:
+        parts.append(f"sort={json.dumps({key: direction for key, direction in dict(sort).items()}, default=str)}")
+    if command.get("skip"):
+        parts.append("skip")
+    return " ".join(parts)
+
+
+def _find_key(node, key):
+    if isinstance(node, dict):
+        if key in node:
+            return node[key]
+        node = list(node.values())
+    if isinstance(node, list):
+        for item in node:
+            found = _find_key(item, key)
+            if found is not None:
+                return found
+    return None
+
+
+def plan_summary(explain: dict) -> dict:
+    """Stages and indexes of the winning plan, outermost stage first"""
+    stages: List[str] = []
+    indexes: List[str] = []
+
+    def walk(node):
+        if isinstance(node, dict):
+            if "stage" in node:
+                stages.append(node["stage"])
+            if "indexName" in node:
+                indexes.append(node["indexName"])
+            for item in node.values():
+                walk(item)
+        elif isinstance(node, list):
+            for item in node:
+                walk(item)
+
+    walk(_find_key(explain, "winningPlan"))
+    return {
+        "stages": stages,
+        "indexes": indexes,
+        "collscan": "COLLSCAN" in stages,
+        "explained_at": datetime.utcnow()
+    }
+
+
+class QueryShape:
+    __slots__ = ("count", "total_ms", "max_ms", "slow", "routes", "plan", "explaining")
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.slow = 0
+        self.routes: Dict[str, int] = {}
+        self.plan: Optional[dict] = None
+        self.explaining = False
+
+
+class QueryProfiler(monitoring.CommandListener):
+    """Aggregates command timings by query shape and route.
+
+    Commands slower than ``slow_ms`` are logged, and the first slow
+    command of each shape is explained (queryPlanner verbosity, so the
+    query is not run again) to show whether it scans the collection or
+    an index. Listener callbacks run on the driver's threads; explains
+    are handed to the event loop captured by ``start``.
+    """
+
+    def __init__(self, slow_ms: float = SLOW_QUERY_MS, max_shapes: int = QUERY_PROFILE_MAX_SHAPES,
+                 explain: bool = QUERY_EXPLAIN):
+        self.slow_ms = slow_ms
+        self.max_shapes = max_shapes
+        self.explain = explain
+        self.client = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+        self._started: Dict[tuple, tuple] = {}
+        self._shapes: Dict[str, QueryShape] = {}
+
+    def start(self, client):
+        self.client = client
+        self._loop = asyncio.get_running_loop()
+
+    def started(self, event):
+        if event.command_name in IGNORED_COMMANDS:
+            return
+        command = event.command
+        self._started[(event.connection_id, event.request_id)] = (
+            query_shape(event.command_name, command),
+            current_route(),
+            event.database_name,
+            command if event.command_name in EXPLAINABLE_COMMANDS else None
+        )
+
+    def succeeded(self, event):
+        self._finish(event)
+
+    def failed(self, event):
+        self._finish(event)
+
+    def _finish(self, event):
+        started = self._started.pop((event.connection_id, event.request_id), None)
+        if started is None:
+            return
+        shape_key, route, database, command = started
+        duration_ms = event.duration_micros / 1000
+        slow = duration_ms >= self.slow_ms
+
+        with self._lock:
+            shape = self._shapes.get(shape_key)
+            if shape is None:
+                if len(self._shapes) >= self.max_shapes:
+                    shape_key = OTHER_SHAPE
+                shape = self._shapes.setdefault(shape_key, QueryShape())
+            shape.count += 1
+            shape.total_ms += duration_ms
+            shape.max_ms = max(shape.max_ms, duration_ms)
+            shape.routes[route] = shape.routes.get(route, 0) + 1
+            explain = (slow and self.explain and command is not None and shape_key != OTHER_SHAPE
+                       and shape.plan is None and not shape.explaining and self._loop is not None)
+            if slow:
+                shape.slow += 1
+            if explain:
+                shape.explaining = True
+
+        if slow:
+            print(f"Slow query {duration_ms:.1f}ms [{route}]: {shape_key}")
+        if explain:
+            self._loop.call_soon_threadsafe(
+                asyncio.ensure_future, self._explain(shape_key, database, command)
+            )
+
+    async def _explain(self, shape_key: str, database: str, command: dict):
+        # Session and cluster fields belong to the original call, not to the explain
+        explained = {key: value for key, value in command.items()
+                     if not key.startswith("$") and key not in ("lsid", "txnNumber")}
+        try:
+            summary = plan_summary(
+                await self.client[database].command({"explain": explained, "verbosity": "queryPlanner"})
+            )
+        except Exception as e:
+            # Recorded so a shape the server cannot explain is not retried on every slow call
+            print(f"Explain failed for {shape_key}: {e}")
+            summary = {"error": str(e), "explained_at": datetime.utcnow()}
+
+        with self._lock:
+            shape = self._shapes.get(shape_key)
+            if shape is not None:
+                shape.plan = summary
+                shape.explaining = False
+        if summary.get("collscan"):
+            print(f"Collection scan in {shape_key}: {' <- '.join(summary['stages'])}")
+
+    def report(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """The shapes with the most total time first"""
+        with self._lock:
+            rows = [
+                {
+                    "shape": key,
+                    "count": shape.count,
+                    "total_ms": round(shape.total_ms, 3),
+                    "mean_ms": round(shape.total_ms / shape.count, 3),
+                    "max_ms": round(shape.max_ms, 3),
+                    "slow_count": shape.slow,
+                    "routes": dict(sorted(shape.routes.items(), key=lambda item: -item[1])),
+                    "plan": shape.plan
+                }
+                for key, shape in self._shapes.items()
+            ]
+        rows.sort(key=lambda row: -row["total_ms"])
+        return rows[:limit]
+
+    def reset(self):
+        with self._lock:
+            self._shapes.clear()
@@ -0,0 +1,188 @@
+"""Per-client token-bucket rate limiting and upload concurrency caps (ASGI middleware)"""
+import asyncio
+import json
+import math
+import os
+import re
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from pymongo import ReturnDocument
+
+# Reverse proxies in front of the app that append to X-Forwarded-For. Entries to
+# the left of theirs are whatever the client sent and are never trusted.
+# RATE_LIMIT_TRUST_PROXY=true is shorthand for one proxy.
+RATE_LIMIT_TRUST_PROXY = os.environ.get("RATE_LIMIT_TRUST_PROXY", "false").lower() == "true"
+RATE_LIMIT_PROXY_HOPS = int(os.environ.get("RATE_LIMIT_PROXY_HOPS", "1" if RATE_LIMIT_TRUST_PROXY else "0"))
+UPLOAD_CONCURRENCY = int(os.environ.get("UPLOAD_CONCURRENCY", "4"))
+UPLOAD_QUEUE_TIMEOUT = float(os.environ.get("UPLOAD_QUEUE_TIMEOUT", "30"))
+
+
+@dataclass
+class RateLimitPolicy:
+    name: str
+    methods: Tuple[str, ...]
+    path: str  # regex matched against the whole path
+    rate: float  # tokens per second
+    burst: int
+    max_concurrent: Optional[int] = None  # shared by all clients
+
+    def __post_init__(self):
+        self._pattern = re.compile(self.path)
+
+    def matches(self, method: str, path: str) -> bool:
+        return method in self.methods and self._pattern.fullmatch(path) is not None
+
+
+DEFAULT_POLICIES = [
+    RateLimitPolicy("login", ("POST",), r"/api/auth/login", rate=5 / 60, burst=5),
+    RateLimitPolicy(
+        "upload", ("POST",), r"/api/(products|news|ensino|extensao)",
+        rate=30 / 60, burst=10, max_concurrent=UPLOAD_CONCURRENCY
+    ),
+    RateLimitPolicy("doi", ("GET",), r"/api/doi-metadata/.+", rate=30 / 60, burst=10),
+]
+
+
+class MemoryBucketStore:
+    """Buckets in this process only; each worker enforces its own limits"""
+
+    def __init__(self, max_keys: int = 10000):
+        self.max_keys = max_keys
+        # key -> (tokens, updated, seconds for an empty bucket to refill)
+        self._buckets: Dict[str, Tuple[float, float, float]] = {}
+
+    async def take(self, key: str, rate: float, burst: int) -> Tuple[bool, float]:
+        """Consume one token; returns (allowed, seconds until a token is available)"""
+        now = time.monotonic()
+        tokens, updated, _ = self._buckets.get(key, (burst, now, 0.0))
+        tokens = min(burst, tokens + (now - updated) * rate)
+
+        if tokens >= 1:
+            self._buckets[key] = (tokens - 1, now, burst / rate)
+            allowed, retry_after = True, 0.0
+        else:
+            self._buckets[key] = (tokens, now, burst / rate)
+            allowed, retry_after = False, (1 - tokens) / rate
+
+        if len(self._buckets) > self.max_keys:
+            self._prune(now)
+        return allowed, retry_after
+
+    def _prune(self, now: float):
+        # A bucket idle long enough to refill completely carries no state. Each
+        # bucket is judged by its own policy's refill time, not the caller's.
+        for key in [k for k, (_, updated, refill) in self._buckets.items() if now - updated > refill]:
+            del self._buckets[key]
+
+
+class MongoBucketStore:
+    """Buckets in a Mongo collection, shared by every worker.
+
+    Refill and take happen in one atomic pipeline update; documents carry
+    an ``expires_at`` for the TTL index to clean idle buckets.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def take(self, key: str, rate: float, burst: int) -> Tuple[bool, float]:
+        now = datetime.utcnow()
+        elapsed_seconds = {"$divide": [{"$subtract": [now, {"$ifNull": ["$updated_at", now]}]}, 1000]}
+        bucket = await self.collection.find_one_and_update(
+            {"_id": key},
+            [
+                {"$set": {
+                    "tokens": {"$min": [burst, {"$add": [
+                        {"$ifNull": ["$tokens", burst]},
+                        {"$multiply": [elapsed_seconds, rate]}
+                    ]}]},
+                    "updated_at": now,
+                    "expires_at": now + timedelta(seconds=burst / rate)
+                }},
+                {"$set": {"allowed": {"$gte": ["$tokens", 1]}}},
+                {"$set": {"tokens": {"$cond": ["$allowed", {"$subtract": ["$tokens", 1]}, "$tokens"]}}}
+            ],
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        if bucket["allowed"]:
+            return True, 0.0
+        return False, (1 - bucket["tokens"]) / rate
+
+
+class RateLimitMiddleware:
+    """Applies the first matching policy to each request.
+
+    Over-limit clients get 429 with ``Retry-After``. Policies with
+    ``max_concurrent`` also queue requests on a semaphore and answer 503
+    when the wait exceeds ``queue_timeout``.
+    """
+
+    def __init__(self, app, policies: Optional[List[RateLimitPolicy]] = None, store=None,
+                 queue_timeout: float = UPLOAD_QUEUE_TIMEOUT):
+        self.app = app
+        self.policies = DEFAULT_POLICIES if policies is None else policies
+        self.store = store or MemoryBucketStore()
+        self.queue_timeout = queue_timeout
+        self._semaphores = {
+            policy.name: asyncio.Semaphore(policy.max_concurrent)
+            for policy in self.policies if policy.max_concurrent
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        policy = next((p for p in self.policies if p.matches(scope["method"], scope["path"])), None)
+        if policy is None:
+            return await self.app(scope, receive, send)
+
+        allowed, retry_after = await self.store.take(f"{policy.name}:{client_key(scope)}", policy.rate, policy.burst)
+        if not allowed:
+            return await reject(send, 429, "Too many requests", retry_after)
+
+        semaphore = self._semaphores.get(policy.name)
+        if semaphore is None:
+            return await self.app(scope, receive, send)
+
+        try:
+            await asyncio.wait_for(semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            return await reject(send, 503, "Server busy, try again later", self.queue_timeout)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            semaphore.release()
+
+
+def client_key(scope, proxy_hops: int = RATE_LIMIT_PROXY_HOPS) -> str:
+    """The client address: the X-Forwarded-For entry added by the outermost
+    trusted proxy, ``proxy_hops`` from the right, else the peer address"""
+    if proxy_hops > 0:
+        forwarded = [
+            address.strip()
+            for name, value in scope.get("headers", []) if name == b"x-forwarded-for"
+            for address in value.decode("latin-1").split(",") if address.strip()
+        ]
+        if forwarded:
+            # Fewer entries than proxies: the left-most one was still added by a trusted proxy
+            return forwarded[-min(proxy_hops, len(forwarded))]
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+async def reject(send, status_code: int, detail: str, retry_after: float):
+    body = json.dumps({"detail": detail}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status_code,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,245 @@
+"""Declarative resources: create/list/get/delete endpoints generated from the Pydantic models"""
+import inspect
+import json
+import typing
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Set, Tuple, Type
+
+from fastapi import Depends, File, Form, HTTPException, Query, Response, UploadFile
+from pydantic import BaseModel
+
+from jobs import JOB_IDS_HEADER
+from pagination import fetch_page
+from projection import parse_fields, partial_model, projection_for
+from responses import model_list_response
+from uploads import save_upload, FORM_OVERHEAD
+
+ROUTES = ("create", "list", "get", "delete")
+
+
+@dataclass
+class UploadField:
+    form_name: str  # multipart field name, e.g. "material_file"
+    field: str  # document field holding the stored filename, e.g. "file"
+    extensions: Set[str]
+    label: str  # used in the 400/413 messages
+    jobs: Tuple[str, ...] = ()  # job kinds enqueued with {"filename", "record_id"} for each stored file
+    renditions: Optional[str] = None  # document field mapping names to blobs derived from this file
+
+
+@dataclass
+class Resource:
+    name: str  # collection name, also the response cache tag
+    path: str
+    model: Type[BaseModel]
+    create_model: Type[BaseModel]  # form fields accepted by create
+    collection: object
+    not_found: str
+    deleted: str
+    uploads: List[UploadField] = field(default_factory=list)
+    filters: Tuple[str, ...] = ()  # exact-match query parameters on list
+    default_limit: int = 100
+    initial: Dict[str, object] = field(default_factory=dict)  # extra fields set on create
+    routes: Tuple[str, ...] = ROUTES
+    on_delete: Optional[Callable] = None  # called with the deleted document
+
+
+def _is_list(annotation) -> bool:
+    return typing.get_origin(annotation) in (list, List)
+
+
+def _is_datetime(annotation) -> bool:
+    return annotation is datetime or datetime in typing.get_args(annotation)
+
+
+def _endpoint(function, name: str, parameters: List[inspect.Parameter]):
+    # FastAPI reads the generated signature to build form/query/dependency parsing
+    function.__name__ = name
+    function.__signature__ = inspect.Signature(parameters)
+    return function
+
+
+def _param(name: str, annotation, default) -> inspect.Parameter:
+    return inspect.Parameter(name, inspect.Parameter.KEYWORD_ONLY, annotation=annotation, default=default)
+
+
+class ResourceRegistry:
+    """Generates the standard endpoints for each registered resource.
+
+    Every resource goes through the same paths: streamed uploads into the
+    blob store, post-upload work on the job queue, keyset pagination with
+    projections, single-pass list rendering and write invalidation through
+    ``on_change``. List and get read through ``reads`` (collection
+    handles by name, e.g. routed to secondaries) when it is given.
+    """
+
+    def __init__(self, app, blob_store, job_queue, current_user: Callable, on_change: Callable,
+                 max_file_size: int, reads=None, body_limits: Optional[Dict[str, int]] = None):
+        self.app = app
+        self.blob_store = blob_store
+        self.job_queue = job_queue
+        self.current_user = current_user
+        self.on_change = on_change
+        self.max_file_size = max_file_size
+        self.reads = reads
+        # Maximum request body per create path, enforced by UploadSizeLimitMiddleware
+        self.body_limits = {} if body_limits is None else body_limits
+        self.resources: Dict[str, Resource] = {}
+
+    def _read_collection(self, resource: Resource):
+        return resource.collection if self.reads is None else self.reads[resource.name]
+
+    def register(self, resource: Resource) -> Resource:
+        self.resources[resource.name] = resource
+        for route in resource.routes:
+            getattr(self, f"_add_{route}")(resource)
+        return resource
+
+    def _add_create(self, resource: Resource):
+        if resource.uploads:
+            self.body_limits[resource.path] = len(resource.uploads) * self.max_file_size + FORM_OVERHEAD
+        fields = resource.create_model.model_fields
+        list_fields = [name for name, info in fields.items() if _is_list(info.annotation)]
+        datetime_fields = [name for name, info in fields.items() if _is_datetime(info.annotation)]
+
+        parameters = [_param("response", Response, inspect.Parameter.empty)]
+        for name, info in fields.items():
+            if name in list_fields:
+                # Lists arrive as JSON strings in the multipart form
+                annotation = str
+                default = Form(...) if info.is_required() else Form(json.dumps(info.default))
+            elif name in datetime_fields:
+                annotation = Optional[str]
+                default = Form(...) if info.is_required() else Form(None)
+            else:
+                annotation = info.annotation
+                default = Form(...) if info.is_required() else Form(info.default)
+            parameters.append(_param(name, annotation, default))
+        for upload in resource.uploads:
+            parameters.append(_param(upload.form_name, Optional[UploadFile], File(None)))
+        parameters.append(_param("current_user", dict, Depends(self.current_user)))
+
+        async def create(response: Response, current_user: dict, **values):
+            document = {"id": str(uuid.uuid4())}
+            for name in fields:
+                value = values[name]
+                if name in list_fields:
+                    try:
+                        value = json.loads(value)
+                    except json.JSONDecodeError:
+                        raise HTTPException(
+                            status_code=400, detail=f"Invalid JSON format for {' or '.join(list_fields)}"
+                        )
+                elif name in datetime_fields and value:
+                    try:
+                        value = datetime.fromisoformat(value)
+                    except ValueError:
+                        raise HTTPException(status_code=400, detail=f"Invalid {name.replace('_', ' ')} format")
+                document[name] = value
+
+            file_hashes = {}
+            try:
+                for upload in resource.uploads:
+                    document[upload.field] = None
+                    upload_file = values[upload.form_name]
+                    if upload_file:
+                        stored = await save_upload(
+                            upload_file, self.blob_store, upload.extensions, self.max_file_size, upload.label
+                        )
+                        document[upload.field] = stored.filename
+                        file_hashes[upload.field] = stored.sha256
+
+                now = datetime.utcnow()
+                document.update({"file_hashes": file_hashes, "created_at": now, "updated_at": now, **resource.initial})
+                await resource.collection.insert_one(document)
+            except BaseException:
+                # A later file was rejected, the insert failed or the request was
+                # cancelled: no record references the files stored so far
+                for filename in (document[upload.field] for upload in resource.uploads if document.get(upload.field)):
+                    await self.blob_store.release(filename)
+                raise
+
+            await self.on_change(resource.name)
+
+            # Post-upload processing runs on the job queue, outside the request
+            job_ids = []
+            for upload in resource.uploads:
+                if document[upload.field]:
+                    for kind in upload.jobs:
+                        job_ids.append(await self.job_queue.enqueue(
+                            kind, {"filename": document[upload.field], "record_id": document["id"]}
+                        ))
+            if job_ids:
+                response.headers[JOB_IDS_HEADER] = ",".join(job_ids)
+            return resource.model(**document)
+
+        self.app.post(resource.path, response_model=resource.model)(
+            _endpoint(create, f"create_{resource.name}", parameters)
+        )
+
+    def _add_list(self, resource: Resource):
+        model_fields = resource.model.model_fields
+        parameters = [_param("response", Response, inspect.Parameter.empty)]
+        for name in resource.filters:
+            parameters.append(_param(name, Optional[model_fields[name].annotation], Query(None)))
+        parameters += [
+            _param("skip", int, 0),
+            _param("limit", int, resource.default_limit),
+            _param("cursor", Optional[str], None),
+            _param("fields", Optional[str], None),
+        ]
+
+        async def list_items(response: Response, skip: int, limit: int, cursor: Optional[str],
+                             fields: Optional[str], **filters):
+            query = {name: value for name, value in filters.items() if value is not None}
+            # Only the requested fields leave Mongo and get validated
+            selected = parse_fields(resource.model, fields) if fields else tuple(model_fields)
+            documents = await fetch_page(
+                self._read_collection(resource), query, response, skip, limit, cursor, projection_for(selected)
+            )
+            item_model = partial_model(resource.model, selected) if fields else resource.model
+            return model_list_response(item_model, documents, response)
+
+        self.app.get(resource.path, response_model=List[resource.model])(
+            _endpoint(list_items, f"list_{resource.name}", parameters)
+        )
+
+    def _add_get(self, resource: Resource):
+        async def get_item(item_id: str):
+            document = await self._read_collection(resource).find_one({"id": item_id}, {"_id": 0})
+            if not document:
+                raise HTTPException(status_code=404, detail=resource.not_found)
+            return resource.model(**document)
+
+        self.app.get(f"{resource.path}/{{item_id}}", response_model=resource.model)(
+            _endpoint(get_item, f"get_{resource.name}_item", [_param("item_id", str, inspect.Parameter.empty)])
+        )
+
+    def _add_delete(self, resource: Resource):
+        async def delete_item(item_id: str, current_user: dict):
+            # Removed and returned in one round-trip, so two deletes cannot both release the files
+            document = await resource.collection.find_one_and_delete({"id": item_id})
+            if not document:
+                raise HTTPException(status_code=404, detail=resource.not_found)
+
+            # Release associated files
+            for upload in resource.uploads:
+                if document.get(upload.field):
+                    await self.blob_store.release(document[upload.field])
+                if upload.renditions:
+                    for filename in document.get(upload.renditions, {}).values():
+                        await self.blob_store.release(filename)
+
+            await self.on_change(resource.name)
+            if resource.on_delete is not None:
+                resource.on_delete(document)
+            return {"message": resource.deleted}
+
+        self.app.delete(f"{resource.path}/{{item_id}}")(
+            _endpoint(delete_item, f"delete_{resource.name}", [
+                _param("item_id", str, inspect.Parameter.empty),
+                _param("current_user", dict, Depends(self.current_user)),
+            ])
+        )
@@ -0,0 +1,282 @@
+"""In-process LRU cache for public GET responses, invalidated by collection tags"""
+import asyncio
+import os
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode
+
+from pymongo import ReturnDocument
+
+from responses import choose_encoding
+
+CACHE_MAX_BYTES = int(os.environ.get("RESPONSE_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+CACHE_TTL_SECONDS = float(os.environ.get("RESPONSE_CACHE_TTL_SECONDS", "60"))
+CACHE_SYNC_INTERVAL = float(os.environ.get("RESPONSE_CACHE_SYNC_INTERVAL", "1"))
+
+
+@dataclass
+class CachePolicy:
+    name: str
+    path: str  # regex matched against the whole path
+    tags: Tuple[str, ...]  # collections the response is built from
+    on_hit: Optional[Callable] = None  # side effects the handler would have had, called with (scope, match)
+
+    def __post_init__(self):
+        self._pattern = re.compile(self.path)
+
+    def match(self, path: str):
+        return self._pattern.fullmatch(path)
+
+
+class MemoryTagVersions:
+    """Per-tag version counters; bumping a tag makes every entry built under an older version stale"""
+
+    def __init__(self):
+        self._versions: Dict[str, int] = {}
+        self._changed_at: Dict[str, float] = {}
+
+    def current(self, tags: Tuple[str, ...]) -> Tuple[int, ...]:
+        return tuple(self._versions.get(tag, 0) for tag in tags)
+
+    def changed_within(self, tag: str, seconds: float) -> bool:
+        """Whether this worker saw ``tag`` change in the last ``seconds``"""
+        changed_at = self._changed_at.get(tag)
+        return changed_at is not None and time.monotonic() - changed_at < seconds
+
+    async def bump(self, tag: str):
+        self._versions[tag] = self._versions.get(tag, 0) + 1
+        self._changed_at[tag] = time.monotonic()
+
+    def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+
+class MongoTagVersions(MemoryTagVersions):
+    """Tag versions shared by every worker through a Mongo collection.
+
+    The local bump is immediate; other workers pick the new version up
+    within ``interval`` seconds, which bounds their staleness.
+    """
+
+    def __init__(self, collection, interval: float = CACHE_SYNC_INTERVAL):
+        super().__init__()
+        self.collection = collection
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    def _merge(self, tag: str, version: int):
+        # Versions only move forward, so equality checks stay valid
+        if version > self._versions.get(tag, 0):
+            self._versions[tag] = version
+            self._changed_at[tag] = time.monotonic()
+
+    async def bump(self, tag: str):
+        await super().bump(tag)
+        document = await self.collection.find_one_and_update(
+            {"_id": tag},
+            {"$inc": {"version": 1}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        self._merge(tag, document["version"])
+
+    async def sync(self):
+        async for document in self.collection.find({}):
+            self._merge(document["_id"], document["version"])
+
+    async def _run(self):
+        while True:
+            try:
+                await self.sync()
+            except Exception as e:
+                print(f"Response cache tag sync failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+@dataclass
+class CachedResponse:
+    status: int
+    headers: List[Tuple[bytes, bytes]]
+    body: bytes
+    tags: Tuple[str, ...]
+    versions: Tuple[int, ...]
+    expires_at: float
+    size: int
+
+
+class ResponseCache:
+    """LRU of rendered responses bounded by total bytes.
+
+    An entry is served only while unexpired and while every tag it was
+    built under still has the version captured before the handler ran.
+    """
+
+    def __init__(self, max_bytes: int = CACHE_MAX_BYTES, ttl: float = CACHE_TTL_SECONDS, versions=None):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.versions = versions or MemoryTagVersions()
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._bytes = 0
+        self._counts: Dict[str, Dict[str, int]] = {}
+        self._evictions = 0
+        self._invalidations = 0
+
+    def _count(self, policy: str, outcome: str):
+        counts = self._counts.setdefault(policy, {"hits": 0, "misses": 0})
+        counts[outcome] += 1
+
+    def get(self, key: str, policy: str) -> Optional[CachedResponse]:
+        entry = self._entries.get(key)
+        if entry is not None and (
+            time.monotonic() >= entry.expires_at or self.versions.current(entry.tags) != entry.versions
+        ):
+            self._remove(key)
+            entry = None
+        if entry is None:
+            self._count(policy, "misses")
+            return None
+        self._entries.move_to_end(key)
+        self._count(policy, "hits")
+        return entry
+
+    def put(self, key: str, status: int, headers, body: bytes, tags: Tuple[str, ...], versions: Tuple[int, ...]):
+        size = len(key) + len(body) + sum(len(k) + len(v) for k, v in headers)
+        if size > self.max_bytes // 8:
+            return  # one response must not flush most of the cache
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = CachedResponse(
+            status, headers, body, tags, versions, time.monotonic() + self.ttl, size
+        )
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self._evictions += 1
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+    def current_versions(self, tags: Tuple[str, ...]) -> Tuple[int, ...]:
+        return self.versions.current(tags)
+
+    async def invalidate(self, *tags: str):
+        for tag in tags:
+            await self.versions.bump(tag)
+        self._invalidations += 1
+
+    def clear(self):
+        self._entries.clear()
+        self._bytes = 0
+
+    def metrics(self) -> dict:
+        hits = sum(c["hits"] for c in self._counts.values())
+        misses = sum(c["misses"] for c in self._counts.values())
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl,
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": hits / (hits + misses) if hits + misses else 0.0,
+            "evictions": self._evictions,
+            "invalidations": self._invalidations,
+            "by_policy": self._counts
+        }
+
+
+def cache_key(scope, encoding: Optional[str]) -> str:
+    # Parameter order does not matter to the handlers, so it must not split entries
+    query = urlencode(sorted(parse_qsl(scope["query_string"].decode("latin-1"), keep_blank_values=True)))
+    return f"{scope['path']}?{query}|{encoding or 'identity'}"
+
+
+class ResponseCacheMiddleware:
+    """Serves matching GETs from ``cache`` and stores complete 200 responses.
+
+    Sits outside the compression middleware, so hits skip compression too;
+    the negotiated encoding is part of the key.
+    """
+
+    def __init__(self, app, cache: ResponseCache, policies: List[CachePolicy]):
+        self.app = app
+        self.cache = cache
+        self.policies = policies
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "GET":
+            return await self.app(scope, receive, send)
+
+        policy, match = None, None
+        for candidate in self.policies:
+            match = candidate.match(scope["path"])
+            if match:
+                policy = candidate
+                break
+        if policy is None:
+            return await self.app(scope, receive, send)
+
+        accept_encoding = ""
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                accept_encoding = value.decode("latin-1")
+                break
+        key = cache_key(scope, choose_encoding(accept_encoding))
+
+        entry = self.cache.get(key, policy.name)
+        if entry is not None:
+            if policy.on_hit is not None:
+                policy.on_hit(scope, match)
+            await send({
+                "type": "http.response.start",
+                "status": entry.status,
+                "headers": entry.headers + [(b"x-cache", b"HIT")],
+            })
+            return await send({"type": "http.response.body", "body": entry.body})
+
+        # Captured before the handler reads, so a write racing this request makes the entry stale
+        versions = self.cache.current_versions(policy.tags)
+        start_message = None
+
+        async def send_and_store(message):
+            nonlocal start_message
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if start_message is None:
+                return await send(message)
+
+            start, start_message = start_message, None
+            headers = list(start["headers"])
+            cacheable = (
+                start["status"] == 200
+                and not message.get("more_body", False)
+                and not any(k.lower() == b"set-cookie" for k, _ in headers)
+            )
+            if cacheable:
+                self.cache.put(key, start["status"], headers, message.get("body", b""), policy.tags, versions)
+            await send({**start, "headers": headers + [(b"x-cache", b"MISS")]})
+            await send(message)
+
+        await self.app(scope, receive, send_and_store)
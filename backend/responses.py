@@ -0,0 +1,137 @@
+"""Fast JSON rendering for list endpoints and gzip/brotli response compression"""
+import gzip
+import os
+from functools import lru_cache
+from typing import List, Optional, Type
+
+from fastapi.responses import Response
+from pydantic import BaseModel, TypeAdapter
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
+
+COMPRESSION_MIN_SIZE = int(os.environ.get("COMPRESSION_MIN_SIZE", "1024"))
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript", "image/svg+xml")
+
+
+@lru_cache(maxsize=None)
+def _list_adapter(model: Type[BaseModel]) -> TypeAdapter:
+    return TypeAdapter(List[model])
+
+
+def model_list_response(model: Type[BaseModel], documents: List[dict], response: Optional[Response] = None) -> Response:
+    """Validate Mongo documents against ``model`` and render them in one pass.
+
+    pydantic-core validates and dumps the whole list natively, replacing one
+    model instance per document plus FastAPI's jsonable_encoder and json.dumps.
+    Headers set on the endpoint's injected ``response`` are carried over.
+    """
+    adapter = _list_adapter(model)
+    content = adapter.dump_json(adapter.validate_python(documents))
+    headers = None
+    if response is not None:
+        headers = {k: v for k, v in response.headers.items() if k not in ("content-length", "content-type")}
+    return Response(content=content, media_type="application/json", headers=headers)
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    accepted = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip().lower()] = q
+    if brotli is not None and accepted.get("br", 0) > 0:
+        return "br"
+    if accepted.get("gzip", 0) > 0:
+        return "gzip"
+    return None
+
+
+def vary_on_accept_encoding(headers: list) -> list:
+    """``headers`` with Accept-Encoding added to (or kept in) Vary"""
+    vary = b", ".join(v for k, v in headers if k == b"vary")
+    if b"accept-encoding" in vary.lower() or vary.strip() == b"*":
+        return headers
+    headers = [(k, v) for k, v in headers if k != b"vary"]
+    return headers + [(b"vary", vary + b", Accept-Encoding" if vary else b"Accept-Encoding")]
+
+
+class CompressionMiddleware:
+    """Compresses single-message responses above ``minimum_size``.
+
+    Streaming responses (files) are passed through untouched: uploads are
+    already compressed formats and must keep range/length semantics.
+    Every single-message response of a compressible type carries
+    ``Vary: Accept-Encoding``, compressed or not, so shared caches never
+    hand one client the encoding negotiated for another.
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        accept_encoding = ""
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                accept_encoding = value.decode("latin-1")
+                break
+        encoding = choose_encoding(accept_encoding)
+
+        start_message = None
+
+        async def send_compressed(message):
+            nonlocal start_message
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if start_message is None:
+                return await send(message)
+
+            start, start_message = start_message, None
+            body = message.get("body", b"")
+            headers = [(k.lower(), v) for k, v in start["headers"]]
+            header_map = dict(headers)
+            content_type = header_map.get(b"content-type", b"").decode("latin-1")
+
+            negotiable = (
+                not message.get("more_body", False)
+                and b"content-encoding" not in header_map
+                and content_type.startswith(COMPRESSIBLE_TYPES)
+            )
+            if not negotiable:
+                await send(start)
+                return await send(message)
+
+            headers = vary_on_accept_encoding(headers)
+            if encoding is None or len(body) < self.minimum_size:
+                await send({**start, "headers": headers})
+                return await send(message)
+
+            if encoding == "br":
+                body = brotli.compress(body, quality=BROTLI_QUALITY)
+            else:
+                body = gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+            headers = [(k, v) for k, v in headers if k != b"content-length"]
+            headers += [
+                (b"content-encoding", encoding.encode()),
+                (b"content-length", str(len(body)).encode()),
+            ]
+            await send({**start, "headers": headers})
+            await send({**message, "body": body})
+
+        await self.app(scope, receive, send_compressed)
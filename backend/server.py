@@ -1,22 +1,133 @@
-from fastapi import FastAPI, HTTPException, Depends, UploadFile, File, Form, status
+from fastapi import FastAPI, HTTPException, Depends, Header, Query, Request, Response, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import ORJSONResponse
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument
 from pydantic import BaseModel, Field
 from typing import Optional, List, Dict, Any
 from datetime import datetime, timedelta
+import asyncio
 import os
+import re
 import jwt
 import hashlib
-import aiofiles
+import hmac
 import uuid
-import requests
 from pathlib import Path
-import json
 
-app = FastAPI(title="Academic Repository API")
+from doi_resolver import DoiResolver
+from indexes import ensure_indexes
+from pagination import fetch_page, NEXT_CURSOR_HEADER, KEYSET_SORT
+from counters import CounterBuffer, is_bot
+from uploads import BlobStore, UploadSizeLimitMiddleware
+from images import ImageDerivatives, DERIVATIVE_FORMATS, snap_width, snap_quality, BrokenProcessPool, DecompressionBombError
+from principals import PrincipalCache
+from hashers import ScryptHasher
+from rate_limit import RateLimitMiddleware, MemoryBucketStore, MongoBucketStore
+from projection import parse_fields, partial_model, projection_for
+from responses import model_list_response, CompressionMiddleware
+from response_cache import ResponseCache, ResponseCacheMiddleware, CachePolicy, MemoryTagVersions, MongoTagVersions
+from stats import compute_stats, recent_from, StatsSnapshot
+from resources import ResourceRegistry, Resource, UploadField
+from jobs import JobQueue, JOB_IDS_HEADER
+from audio import transcode_renditions, ffmpeg_available, AUDIO_MEDIA_TYPES
+from metrics import metrics, MetricsMiddleware, MongoCommandMetrics, ConnectionPoolMetrics, PROMETHEUS_CONTENT_TYPE
+from database import client_options, public_read_preference, ReadRouter
+from query_profiler import QueryProfiler
+from conditional import conditional_file_response, is_content_addressed, UploadStaticFiles, IMMUTABLE_CACHE_CONTROL
+
+app = FastAPI(title="Academic Repository API", default_response_class=ORJSONResponse)
+
+# Database setup
+MONGO_URL = os.environ.get("MONGO_URL", "mongodb://localhost:27017")
+DB_NAME = os.environ.get("DB_NAME", "academic_repository")
+
+# Slow-query log and per-shape profile (SLOW_QUERY_MS, QUERY_EXPLAIN=off)
+query_profiler = QueryProfiler()
+
+# Pool size, timeouts and compression come from MONGO_* variables (see database.py)
+client = AsyncIOMotorClient(
+    MONGO_URL,
+    event_listeners=[MongoCommandMetrics(), ConnectionPoolMetrics(), query_profiler],
+    **client_options()
+)
+metrics.set("mongo_pool_max_size", client.options.pool_options.max_pool_size)
+db = client[DB_NAME]
+
+# Collections
+products_collection = db.products
+news_collection = db.news
+ensino_collection = db.ensino
+extensao_collection = db.extensao
+users_collection = db.users
+doi_cache_collection = db.doi_cache
+blobs_collection = db.blobs
+rate_limits_collection = db.rate_limits
+cache_tags_collection = db.cache_tags
+jobs_collection = db.jobs
+
+# CrossRef DOI resolver (pooled async client + persistent cache)
+doi_resolver = DoiResolver(doi_cache_collection)
+
+# Buffered view/download counters, flushed periodically with bulk_write
+product_counters = CounterBuffer(products_collection)
+
+# gzip/brotli for JSON responses above COMPRESSION_MIN_SIZE
+app.add_middleware(CompressionMiddleware)
+
+# Oversized uploads are refused before Starlette spools the multipart body;
+# the resource registry fills in each create route's limit
+upload_body_limits: Dict[str, int] = {}
+app.add_middleware(UploadSizeLimitMiddleware, limits=upload_body_limits)
+
+# Public GET responses cached per path+query, tagged by the collections they read.
+# RESPONSE_CACHE_BACKEND=mongo shares invalidations between workers.
+RESPONSE_CACHE_BACKEND = os.environ.get("RESPONSE_CACHE_BACKEND", "memory")
+response_cache = ResponseCache(
+    versions=MongoTagVersions(cache_tags_collection) if RESPONSE_CACHE_BACKEND == "mongo" else MemoryTagVersions()
+)
+
+# Collections for public reads: MONGO_PUBLIC_READ_PREFERENCE=secondaryPreferred moves them
+# to secondaries with bounded staleness (MONGO_MAX_STALENESS_SECONDS). Several workers
+# should also set RESPONSE_CACHE_BACKEND=mongo, so each sees the others' writes.
+public_reads = ReadRouter(db, public_read_preference(), response_cache.versions)
+
+def count_cached_view(scope, match):
+    # A cache hit skips get_product, so the view is counted here
+    user_agent = dict(scope["headers"]).get(b"user-agent", b"").decode("latin-1")
+    if not is_bot(user_agent):
+        product_counters.increment(match["product_id"], "view_count")
+
+# Buffered counter flushes do not invalidate: view/download counts may lag by the TTL
+CONTENT_COLLECTIONS = ("products", "news", "ensino", "extensao")
+app.add_middleware(
+    ResponseCacheMiddleware,
+    cache=response_cache,
+    policies=[
+        CachePolicy("products", r"/api/products", ("products",)),
+        CachePolicy("product", r"/api/products/(?P<product_id>[^/]+)", ("products",), on_hit=count_cached_view),
+        CachePolicy("news", r"/api/news", ("news",)),
+        CachePolicy("news_item", r"/api/news/[^/]+", ("news",)),
+        CachePolicy("ensino", r"/api/ensino", ("ensino",)),
+        CachePolicy("ensino_item", r"/api/ensino/[^/]+", ("ensino",)),
+        CachePolicy("extensao", r"/api/extensao", ("extensao",)),
+        CachePolicy("extensao_item", r"/api/extensao/[^/]+", ("extensao",)),
+        CachePolicy("stats", r"/api/stats", CONTENT_COLLECTIONS),
+        CachePolicy("home", r"/api/home", CONTENT_COLLECTIONS),
+    ]
+)
+
+# Rate limiting for login, uploads and DOI lookups; RATE_LIMIT_BACKEND=mongo
+# shares the buckets between workers, "off" disables it (load benchmarks).
+# Added before CORS so that CORS stays the outermost middleware and 429
+# responses still carry its headers.
+RATE_LIMIT_BACKEND = os.environ.get("RATE_LIMIT_BACKEND", "memory")
+if RATE_LIMIT_BACKEND != "off":
+    app.add_middleware(
+        RateLimitMiddleware,
+        store=MongoBucketStore(rate_limits_collection) if RATE_LIMIT_BACKEND == "mongo" else MemoryBucketStore()
+    )
 
 # CORS configuration
 app.add_middleware(
@@ -30,21 +141,11 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, JOB_IDS_HEADER, "Retry-After"],
 )
 
-# Database setup
-MONGO_URL = os.environ.get("MONGO_URL", "mongodb://localhost:27017")
-DB_NAME = os.environ.get("DB_NAME", "academic_repository")
-
-client = AsyncIOMotorClient(MONGO_URL)
-db = client[DB_NAME]
-
-# Collections
-products_collection = db.products
-news_collection = db.news
-ensino_collection = db.ensino
-extensao_collection = db.extensao
-users_collection = db.users
+# Per-route request metrics; added last so the timings include every other middleware
+app.add_middleware(MetricsMiddleware, router=app.router)
 
 # JWT Configuration
 SECRET_KEY = os.environ.get("SECRET_KEY", "your-secret-key-here")
@@ -53,16 +154,76 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 480  # 8 horas
 
 security = HTTPBearer()
 
+# Salted scrypt hashing in a dedicated thread pool (cost from PASSWORD_SCRYPT_*)
+password_hasher = ScryptHasher()
+
+# Users resolved from recent tokens, so authenticated calls skip the users lookup
+principal_cache = PrincipalCache()
+
+# Filled by startup_event: status of each managed index and the queries it serves
+index_report: Dict[str, List[dict]] = {}
+
 # File upload configuration
 UPLOAD_DIR = Path("uploads")
 UPLOAD_DIR.mkdir(exist_ok=True)
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
-ALLOWED_AUDIO_EXTENSIONS = {".wav"}
+ALLOWED_AUDIO_EXTENSIONS = {".wav", ".mp3", ".m4a", ".ogg", ".flac"}
 ALLOWED_DOCUMENT_EXTENSIONS = {".pdf", ".doc", ".docx"}
 ALLOWED_IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif"}
+ALLOWED_MATERIAL_EXTENSIONS = {".pdf", ".ppt", ".pptx", ".doc", ".docx", ".zip"}
+
+# Content-addressed storage for uploaded files, shared by reference count
+blob_store = BlobStore(blobs_collection, UPLOAD_DIR)
+
+# /api/stats snapshot, invalidated by every create/update/delete
+stats_snapshot = StatsSnapshot(
+    lambda: compute_stats(public_reads["products"], public_reads["news"], public_reads["ensino"], public_reads["extensao"]),
+    versions=response_cache.versions,
+    tags=CONTENT_COLLECTIONS
+)
+
+async def content_changed(*collections: str):
+    """Invalidate cached responses and the stats snapshot built from ``collections``"""
+    await response_cache.invalidate(*collections)
+
+# Resized image derivatives (process pool + size-bounded disk cache)
+image_derivatives = ImageDerivatives(UPLOAD_DIR)
+
+# Post-upload processing, persisted in the jobs collection and retried with backoff
+job_queue = JobQueue(jobs_collection)
+
+# Upload jobs are enqueued by the resource registry with {"filename", "record_id"}
+@job_queue.handler("image_derivatives")
+async def generate_image_derivatives(filename: str, record_id: str):
+    # The record may have been deleted (and its blob collected) before the job ran
+    if not (UPLOAD_DIR / filename).exists():
+        return {"skipped": "file no longer exists"}
+    await image_derivatives.pregenerate(filename)
+
+@job_queue.handler("audio_renditions")
+async def generate_audio_renditions(filename: str, record_id: str):
+    if not (UPLOAD_DIR / filename).exists():
+        return {"skipped": "file no longer exists"}
+    if not ffmpeg_available():
+        return {"skipped": "ffmpeg not available"}
+    
+    renditions = await transcode_renditions(UPLOAD_DIR / filename, blob_store)
+    product = await products_collection.find_one_and_update(
+        {"id": record_id, "audio_file": filename},
+        {"$set": {"audio_renditions": renditions}},
+        projection={"audio_renditions": 1},
+        return_document=ReturnDocument.BEFORE
+    )
+    # Deleted or re-uploaded meanwhile: nothing references the new renditions
+    released = renditions.values() if product is None else product.get("audio_renditions", {}).values()
+    for stale in released:
+        await blob_store.release(stale)
+    if product is not None:
+        await content_changed("products")
+    return renditions
 
 # Mount static files
-app.mount("/uploads", StaticFiles(directory=str(UPLOAD_DIR)), name="uploads")
+app.mount("/uploads", UploadStaticFiles(directory=str(UPLOAD_DIR)), name="uploads")
 
 # Pydantic models
 class User(BaseModel):
@@ -105,10 +266,33 @@ class Product(BaseModel):
     url: Optional[str] = None
     document_file: Optional[str] = None
     audio_file: Optional[str] = None
+    audio_renditions: Dict[str, str] = {}  # Compressed versions of audio_file, e.g. {"opus": ..., "mp3": ...}
     created_at: datetime
     updated_at: datetime
     view_count: int = 0
     download_count: int = 0
+    score: Optional[float] = None  # Relevance, only set for search results
+
+# Compact listing view for product cards
+SUMMARY_EXCERPT_LENGTH = 300
+
+class ProductSummary(BaseModel):
+    id: str
+    title: str
+    authors: List[str]
+    abstract: str  # First SUMMARY_EXCERPT_LENGTH characters
+    product_type: str
+    doi: Optional[str] = None
+    publication_year: Optional[int] = None
+    created_at: datetime
+    view_count: int = 0
+    download_count: int = 0
+    score: Optional[float] = None
+
+PRODUCT_SUMMARY_PROJECTION = projection_for(
+    [name for name in ProductSummary.model_fields if name not in ("abstract", "score")],
+    {"abstract": {"$substrCP": ["$abstract", 0, SUMMARY_EXCERPT_LENGTH]}}
+)
 
 class NewsCreate(BaseModel):
     title: str
@@ -167,11 +351,11 @@ class Extensao(BaseModel):
     updated_at: datetime
 
 # Utility functions
-def hash_password(password: str) -> str:
-    return hashlib.sha256(password.encode()).hexdigest()
+async def hash_password(password: str) -> str:
+    return await password_hasher.hash_async(password)
 
-def verify_password(password: str, hashed_password: str) -> bool:
-    return hash_password(password) == hashed_password
+async def verify_password(password: str, hashed_password: str) -> bool:
+    return await password_hasher.verify_async(password, hashed_password)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -180,6 +364,8 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     else:
         expire = datetime.utcnow() + timedelta(minutes=15)
     to_encode.update({"exp": expire})
+    # Token id for the principal cache
+    to_encode.setdefault("jti", uuid.uuid4().hex)
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
@@ -192,48 +378,26 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     except jwt.PyJWTError:
         raise HTTPException(status_code=401, detail="Invalid token")
     
+    # Tokens issued before "jti" existed are keyed by their digest
+    token_id = payload.get("jti") or hashlib.sha256(credentials.credentials.encode()).hexdigest()
+    user = principal_cache.get(token_id)
+    if user is not None:
+        return user
+    
     user = await users_collection.find_one({"username": username})
     if user is None:
         raise HTTPException(status_code=401, detail="User not found")
+    
+    # Tokens carry the user's token_version; bumping it revokes them
+    if payload.get("ver", 0) != user.get("token_version", 0):
+        raise HTTPException(status_code=401, detail="Token revoked")
+    
+    principal_cache.put(token_id, user)
     return user
 
-async def get_doi_metadata(doi: str) -> Dict[str, Any]:
-    """Fetch metadata from CrossRef API"""
-    try:
-        url = f"https://api.crossref.org/works/{doi}"
-        headers = {"Accept": "application/json"}
-        response = requests.get(url, headers=headers, timeout=10)
-        
-        if response.status_code == 200:
-            data = response.json()
-            work = data["message"]
-            
-            # Extract relevant information
-            metadata = {
-                "title": work.get("title", [""])[0] if work.get("title") else "",
-                "authors": [],
-                "journal": work.get("container-title", [""])[0] if work.get("container-title") else "",
-                "publication_year": work.get("published-print", {}).get("date-parts", [[None]])[0][0] or 
-                                  work.get("published-online", {}).get("date-parts", [[None]])[0][0],
-                "abstract": work.get("abstract", ""),
-                "url": work.get("URL", "")
-            }
-            
-            # Extract authors
-            if work.get("author"):
-                for author in work["author"]:
-                    given = author.get("given", "")
-                    family = author.get("family", "")
-                    full_name = f"{given} {family}".strip()
-                    if full_name:
-                        metadata["authors"].append(full_name)
-            
-            return metadata
-        else:
-            return None
-    except Exception as e:
-        print(f"Error fetching DOI metadata: {e}")
-        return None
+async def get_doi_metadata(doi: str) -> Optional[Dict[str, Any]]:
+    """Fetch metadata from CrossRef API (cached, non-blocking)"""
+    return await doi_resolver.resolve(doi)
 
 # Authentication endpoints
 @app.post("/api/auth/login", response_model=Token)
@@ -241,12 +405,21 @@ async def login(user: User):
     # Check if user exists
     db_user = await users_collection.find_one({"username": user.username})
     
-    if not db_user or not verify_password(user.password, db_user["hashed_password"]):
+    if not db_user or not await verify_password(user.password, db_user["hashed_password"]):
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
+    # Transparently upgrade legacy or outdated hashes
+    if password_hasher.needs_rehash(db_user["hashed_password"]):
+        await users_collection.update_one(
+            {"username": user.username},
+            {"$set": {"hashed_password": await hash_password(user.password)}}
+        )
+        principal_cache.invalidate_user(user.username)
+    
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
+        data={"sub": user.username, "ver": db_user.get("token_version", 0)},
+        expires_delta=access_token_expires
     )
     
     return {"access_token": access_token, "token_type": "bearer"}
@@ -259,7 +432,7 @@ async def register(user: User, current_user: dict = Depends(get_current_user)):
     if existing_user:
         raise HTTPException(status_code=400, detail="Username already exists")
     
-    hashed_password = hash_password(user.password)
+    hashed_password = await hash_password(user.password)
     await users_collection.insert_one({
         "username": user.username,
         "hashed_password": hashed_password
@@ -270,17 +443,32 @@ async def register(user: User, current_user: dict = Depends(get_current_user)):
 @app.post("/api/auth/change-password")
 async def change_password(password_data: PasswordChange, current_user: dict = Depends(get_current_user)):
     # Verify current password
-    if not verify_password(password_data.current_password, current_user["hashed_password"]):
+    if not await verify_password(password_data.current_password, current_user["hashed_password"]):
         raise HTTPException(status_code=400, detail="Current password is incorrect")
     
-    # Update with new password
-    new_hashed_password = hash_password(password_data.new_password)
-    await users_collection.update_one(
+    # Update with new password and revoke every token issued so far
+    new_hashed_password = await hash_password(password_data.new_password)
+    # $inc rather than the cached version + 1, so concurrent changes cannot reuse a version
+    updated_user = await users_collection.find_one_and_update(
         {"username": current_user["username"]},
-        {"$set": {"hashed_password": new_hashed_password}}
+        {"$set": {"hashed_password": new_hashed_password}, "$inc": {"token_version": 1}},
+        projection={"token_version": 1},
+        return_document=ReturnDocument.AFTER
+    )
+    token_version = updated_user["token_version"]
+    principal_cache.invalidate_user(current_user["username"])
+    
+    # Fresh token so the session that changed the password stays logged in
+    access_token = create_access_token(
+        data={"sub": current_user["username"], "ver": token_version},
+        expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     )
     
-    return {"message": "Password changed successfully"}
+    return {
+        "message": "Password changed successfully",
+        "access_token": access_token,
+        "token_type": "bearer"
+    }
 
 # DOI metadata endpoint
 @app.get("/api/doi-metadata/{doi:path}")
@@ -291,135 +479,137 @@ async def get_doi_info(doi: str):
     else:
         raise HTTPException(status_code=404, detail="DOI not found or invalid")
 
-# Product endpoints
-@app.post("/api/products", response_model=Product)
-async def create_product(
-    title: str = Form(...),
-    authors: str = Form(...),  # JSON string of authors array
-    abstract: str = Form(...),
-    product_type: str = Form(...),
-    doi: Optional[str] = Form(None),
-    publication_year: Optional[int] = Form(None),
-    journal: Optional[str] = Form(None),
-    keywords: str = Form("[]"),  # JSON string of keywords array
-    url: Optional[str] = Form(None),
-    document_file: Optional[UploadFile] = File(None),
-    audio_file: Optional[UploadFile] = File(None),
-    current_user: dict = Depends(get_current_user)
-):
-    try:
-        authors_list = json.loads(authors)
-        keywords_list = json.loads(keywords)
-    except json.JSONDecodeError:
-        raise HTTPException(status_code=400, detail="Invalid JSON format for authors or keywords")
-    
-    # Generate unique ID
-    product_id = str(uuid.uuid4())
-    
-    # Handle file uploads
-    document_filename = None
-    audio_filename = None
-    
-    if document_file:
-        if document_file.size > MAX_FILE_SIZE:
-            raise HTTPException(status_code=413, detail="Document file too large")
-        
-        file_extension = Path(document_file.filename).suffix.lower()
-        if file_extension not in ALLOWED_DOCUMENT_EXTENSIONS:
-            raise HTTPException(status_code=400, detail="Invalid document file type")
-        
-        document_filename = f"{product_id}_document{file_extension}"
-        document_path = UPLOAD_DIR / document_filename
-        
-        async with aiofiles.open(document_path, 'wb') as f:
-            content = await document_file.read()
-            await f.write(content)
-    
-    if audio_file:
-        if audio_file.size > MAX_FILE_SIZE:
-            raise HTTPException(status_code=413, detail="Audio file too large")
-        
-        file_extension = Path(audio_file.filename).suffix.lower()
-        if file_extension not in ALLOWED_AUDIO_EXTENSIONS:
-            raise HTTPException(status_code=400, detail="Invalid audio file type")
-        
-        audio_filename = f"{product_id}_audio{file_extension}"
-        audio_path = UPLOAD_DIR / audio_filename
-        
-        async with aiofiles.open(audio_path, 'wb') as f:
-            content = await audio_file.read()
-            await f.write(content)
-    
-    # Create product document
-    now = datetime.utcnow()
-    product_doc = {
-        "id": product_id,
-        "title": title,
-        "authors": authors_list,
-        "abstract": abstract,
-        "product_type": product_type,
-        "doi": doi,
-        "publication_year": publication_year,
-        "journal": journal,
-        "keywords": keywords_list,
-        "url": url,
-        "document_file": document_filename,
-        "audio_file": audio_filename,
-        "created_at": now,
-        "updated_at": now,
-        "view_count": 0,
-        "download_count": 0
-    }
-    
-    await products_collection.insert_one(product_doc)
-    return Product(**product_doc)
+# Resource endpoints: create/list/get/delete generated from the models
+resource_registry = ResourceRegistry(
+    app, blob_store, job_queue,
+    current_user=get_current_user,
+    on_change=content_changed,
+    max_file_size=MAX_FILE_SIZE,
+    reads=public_reads,
+    body_limits=upload_body_limits
+)
+
+IMAGE_UPLOAD = UploadField("image_file", "image_file", ALLOWED_IMAGE_EXTENSIONS, "image", jobs=("image_derivatives",))
+MATERIAL_UPLOAD = UploadField("material_file", "file", ALLOWED_MATERIAL_EXTENSIONS, "material")
+
+# Products keep hand-written list/detail/update below for search, views and counters
+resource_registry.register(Resource(
+    "products", "/api/products", Product, ProductCreate, products_collection,
+    not_found="Product not found",
+    deleted="Product deleted successfully",
+    uploads=[
+        UploadField("document_file", "document_file", ALLOWED_DOCUMENT_EXTENSIONS, "document"),
+        UploadField("audio_file", "audio_file", ALLOWED_AUDIO_EXTENSIONS, "audio",
+                    jobs=("audio_renditions",), renditions="audio_renditions"),
+    ],
+    initial={"view_count": 0, "download_count": 0},
+    routes=("create", "delete"),
+    on_delete=lambda product: product_counters.discard(product["id"])
+))
 
+resource_registry.register(Resource(
+    "news", "/api/news", News, NewsCreate, news_collection,
+    not_found="News not found",
+    deleted="News deleted successfully",
+    uploads=[IMAGE_UPLOAD],
+    filters=("category",),
+    default_limit=10
+))
+
+resource_registry.register(Resource(
+    "ensino", "/api/ensino", Ensino, EnsinoCreate, ensino_collection,
+    not_found="Material not found",
+    deleted="Material deleted successfully",
+    uploads=[MATERIAL_UPLOAD, IMAGE_UPLOAD]
+))
+
+resource_registry.register(Resource(
+    "extensao", "/api/extensao", Extensao, ExtensaoCreate, extensao_collection,
+    not_found="Activity not found",
+    deleted="Activity deleted successfully",
+    uploads=[MATERIAL_UPLOAD, IMAGE_UPLOAD]
+))
+
+# Product endpoints
 @app.get("/api/products", response_model=List[Product])
 async def get_products(
+    response: Response,
     product_type: Optional[str] = None,
     search: Optional[str] = None,
     author: Optional[str] = None,
     year: Optional[int] = None,
     skip: int = 0,
-    limit: int = 20
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    view: str = "full"
 ):
+    # Only the requested fields leave Mongo and get validated
+    if fields:
+        selected = parse_fields(Product, fields)
+        item_model = partial_model(Product, selected)
+        projection = projection_for(selected)
+    elif view == "summary":
+        item_model = ProductSummary
+        projection = dict(PRODUCT_SUMMARY_PROJECTION)
+    elif view == "full":
+        item_model = Product
+        projection = projection_for(name for name in Product.model_fields if name != "score")
+    else:
+        raise HTTPException(status_code=400, detail="Invalid view")
+    
     query = {}
     
     if product_type:
         query["product_type"] = product_type
     
+    # Full-text search served by the weighted "search_text" index
     if search:
-        query["$or"] = [
-            {"title": {"$regex": search, "$options": "i"}},
-            {"abstract": {"$regex": search, "$options": "i"}},
-            {"keywords": {"$regex": search, "$options": "i"}}
-        ]
+        query["$text"] = {"$search": search}
+        projection["score"] = {"$meta": "textScore"}
     
     if author:
-        query["authors"] = {"$regex": author, "$options": "i"}
+        query["authors"] = {"$regex": re.escape(author), "$options": "i"}
     
     if year:
         query["publication_year"] = year
     
-    cursor = products_collection.find(query).skip(skip).limit(limit).sort("created_at", -1)
-    products = await cursor.to_list(length=limit)
+    if search:
+        # Relevance order has no stable keyset, so search pages by skip only
+        if cursor:
+            raise HTTPException(status_code=400, detail="Cursor pagination is not available for search results")
+        find = public_reads["products"].find(query, projection).sort([("score", {"$meta": "textScore"})] + KEYSET_SORT)
+        products = await find.skip(skip).limit(limit).to_list(length=limit)
+    else:
+        products = await fetch_page(public_reads["products"], query, response, skip, limit, cursor, projection)
     
-    return [Product(**product) for product in products]
+    return model_list_response(item_model, products, response)
 
 @app.get("/api/products/{product_id}", response_model=Product)
-async def get_product(product_id: str):
-    product = await products_collection.find_one({"id": product_id})
+async def get_product(product_id: str, user_agent: Optional[str] = Header(None)):
+    product = await public_reads["products"].find_one({"id": product_id})
     
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
     
-    # Increment view count
-    await products_collection.update_one(
-        {"id": product_id},
-        {"$inc": {"view_count": 1}}
-    )
+    # Increment view count (written behind, crawlers are not counted)
+    if not is_bot(user_agent):
+        product_counters.increment(product_id, "view_count")
+    
+    product["view_count"] += product_counters.pending(product_id, "view_count")
+    product["download_count"] += product_counters.pending(product_id, "download_count")
+    return Product(**product)
+
+@app.get("/api/admin/products/{product_id}", response_model=Product)
+async def get_product_for_edit(product_id: str, current_user: dict = Depends(get_current_user)):
+    # The admin edit form: read from the primary, uncached, and not counted as a view
+    product = await products_collection.find_one({"id": product_id})
     
-    product["view_count"] += 1
+    if not product:
+        raise HTTPException(status_code=404, detail="Product not found")
+    
+    product["view_count"] += product_counters.pending(product_id, "view_count")
+    product["download_count"] += product_counters.pending(product_id, "download_count")
     return Product(**product)
 
 @app.put("/api/products/{product_id}", response_model=Product)
@@ -428,45 +618,31 @@ async def update_product(
     product_data: ProductCreate,
     current_user: dict = Depends(get_current_user)
 ):
-    product = await products_collection.find_one({"id": product_id})
-    
-    if not product:
-        raise HTTPException(status_code=404, detail="Product not found")
-    
     update_data = product_data.dict(exclude_unset=True)
     update_data["updated_at"] = datetime.utcnow()
     
-    await products_collection.update_one(
+    # One round-trip: update and read back the new version atomically
+    updated_product = await products_collection.find_one_and_update(
         {"id": product_id},
-        {"$set": update_data}
+        {"$set": update_data},
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
     )
     
-    updated_product = await products_collection.find_one({"id": product_id})
-    return Product(**updated_product)
-
-@app.delete("/api/products/{product_id}")
-async def delete_product(product_id: str, current_user: dict = Depends(get_current_user)):
-    product = await products_collection.find_one({"id": product_id})
-    
-    if not product:
+    if not updated_product:
         raise HTTPException(status_code=404, detail="Product not found")
     
-    # Delete associated files
-    if product.get("document_file"):
-        document_path = UPLOAD_DIR / product["document_file"]
-        if document_path.exists():
-            document_path.unlink()
-    
-    if product.get("audio_file"):
-        audio_path = UPLOAD_DIR / product["audio_file"]
-        if audio_path.exists():
-            audio_path.unlink()
-    
-    await products_collection.delete_one({"id": product_id})
-    return {"message": "Product deleted successfully"}
+    await content_changed("products")
+    return Product(**updated_product)
 
 @app.get("/api/image/{filename}")
-async def serve_image(filename: str):
+async def serve_image(
+    filename: str,
+    request: Request,
+    width: Optional[int] = None,
+    quality: Optional[int] = None,
+    image_format: Optional[str] = Query(None, alias="format")
+):
     file_path = UPLOAD_DIR / filename
     
     if not file_path.exists():
@@ -482,35 +658,72 @@ async def serve_image(filename: str):
     }
     
     media_type = media_type_map.get(file_extension, 'image/jpeg')
-    
-    return FileResponse(
-        path=file_path,
-        media_type=media_type,
-        headers={"Cache-Control": "max-age=3600"}
-    )
+    cache_control = IMMUTABLE_CACHE_CONTROL if is_content_addressed(filename) else "max-age=3600"
+    
+    # Resized derivative requested (e.g. card thumbnails)
+    if width or image_format or quality:
+        headers = None
+        if image_format is None:
+            image_format = "webp" if "image/webp" in request.headers.get("accept", "") else "jpeg"
+            headers = {"Vary": "Accept"}
+        elif image_format not in DERIVATIVE_FORMATS:
+            raise HTTPException(status_code=400, detail="Invalid image format")
+        
+        try:
+            derivative_path = await image_derivatives.get(
+                filename, snap_width(width), snap_quality(quality), image_format
+            )
+        except DecompressionBombError:
+            raise HTTPException(status_code=415, detail="Image too large to resize")
+        except BrokenProcessPool:
+            print("Image worker pool broke; it is restarted on the next request")
+            raise HTTPException(status_code=503, detail="Image service unavailable, try again", headers={"Retry-After": "1"})
+        except (OSError, ValueError) as e:
+            print(f"Error rendering image derivative: {e}")
+            return conditional_file_response(request, file_path, media_type, cache_control=cache_control)
+        return conditional_file_response(
+            request,
+            derivative_path,
+            DERIVATIVE_FORMATS[image_format][1],
+            content_id=derivative_path.name,
+            cache_control=cache_control,
+            headers=headers
+        )
+    
+    return conditional_file_response(request, file_path, media_type, cache_control=cache_control)
 
 @app.get("/api/download/{product_id}/{file_type}")
-async def download_file(product_id: str, file_type: str):
-    product = await products_collection.find_one({"id": product_id})
+async def download_file(
+    product_id: str,
+    file_type: str,
+    request: Request,
+    rendition: Optional[str] = None,
+    user_agent: Optional[str] = Header(None)
+):
+    product = await public_reads["products"].find_one({"id": product_id})
     
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
     
     filename = None
+    field = None
     media_type = 'application/octet-stream'
     
     if file_type == "document" and product.get("document_file"):
+        field = "document_file"
         filename = product["document_file"]
         if filename.lower().endswith('.pdf'):
             media_type = 'application/pdf'
         elif filename.lower().endswith(('.doc', '.docx')):
             media_type = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
     elif file_type == "audio" and product.get("audio_file"):
+        field = "audio_file"
         filename = product["audio_file"]
-        if filename.lower().endswith('.wav'):
-            media_type = 'audio/wav'
-        elif filename.lower().endswith('.mp3'):
-            media_type = 'audio/mpeg'
+        # Compressed rendition when it exists, the original while it is still being transcoded
+        if rendition and rendition in product.get("audio_renditions", {}):
+            field = None
+            filename = product["audio_renditions"][rendition]
+        media_type = AUDIO_MEDIA_TYPES.get(Path(filename).suffix.lower(), media_type)
     
     if not filename:
         raise HTTPException(status_code=404, detail="File not found")
@@ -519,292 +732,26 @@ async def download_file(product_id: str, file_type: str):
     if not file_path.exists():
         raise HTTPException(status_code=404, detail="File not found")
     
-    # Increment download count
-    await products_collection.update_one(
-        {"id": product_id},
-        {"$inc": {"download_count": 1}}
-    )
-    
-    return FileResponse(
-        path=file_path,
+    response = conditional_file_response(
+        request,
+        file_path,
+        media_type,
         filename=filename,
-        media_type=media_type,
-        headers={"Accept-Ranges": "bytes"}  # Enable streaming
+        content_id=product.get("file_hashes", {}).get(field),
+        last_modified=product.get("updated_at")
     )
-
-# News endpoints
-@app.post("/api/news", response_model=News)
-async def create_news(
-    title: str = Form(...),
-    content: str = Form(...),
-    category: str = Form(...),
-    author: str = Form(...),
-    image_file: Optional[UploadFile] = File(None),
-    current_user: dict = Depends(get_current_user)
-):
-    news_id = str(uuid.uuid4())
-    now = datetime.utcnow()
-    
-    # Handle image upload
-    image_filename = None
-    if image_file:
-        if image_file.size > MAX_FILE_SIZE:
-            raise HTTPException(status_code=413, detail="Image file too large")
-        
-        file_extension = Path(image_file.filename).suffix.lower()
-        if file_extension not in ALLOWED_IMAGE_EXTENSIONS:
-            raise HTTPException(status_code=400, detail="Invalid image file type")
-        
-        image_filename = f"{news_id}_image{file_extension}"
-        image_path = UPLOAD_DIR / image_filename
-        
-        async with aiofiles.open(image_path, 'wb') as f:
-            content_bytes = await image_file.read()
-            await f.write(content_bytes)
-    
-    news_doc = {
-        "id": news_id,
-        "title": title,
-        "content": content,
-        "category": category,
-        "author": author,
-        "image_file": image_filename,
-        "created_at": now,
-        "updated_at": now
-    }
-    
-    await news_collection.insert_one(news_doc)
-    return News(**news_doc)
-
-@app.get("/api/news", response_model=List[News])
-async def get_news(category: Optional[str] = None, skip: int = 0, limit: int = 10):
-    query = {}
-    if category:
-        query["category"] = category
-    
-    cursor = news_collection.find(query).skip(skip).limit(limit).sort("created_at", -1)
-    news_list = await cursor.to_list(length=limit)
-    
-    return [News(**news) for news in news_list]
-
-@app.get("/api/news/{news_id}", response_model=News)
-async def get_news_item(news_id: str):
-    news = await news_collection.find_one({"id": news_id})
-    
-    if not news:
-        raise HTTPException(status_code=404, detail="News not found")
-    
-    return News(**news)
-
-@app.delete("/api/news/{news_id}")
-async def delete_news(news_id: str, current_user: dict = Depends(get_current_user)):
-    result = await news_collection.delete_one({"id": news_id})
     
-    if result.deleted_count == 0:
-        raise HTTPException(status_code=404, detail="News not found")
+    # Increment download count (written behind, crawlers, revalidations and seeks are not counted)
+    from_start = response.status_code == 206 and response.headers.get("content-range", "").startswith("bytes 0-")
+    if (response.status_code == 200 or from_start) and not is_bot(user_agent):
+        product_counters.increment(product_id, "download_count")
     
-    return {"message": "News deleted successfully"}
-
-# Ensino endpoints
-@app.post("/api/ensino", response_model=Ensino)
-async def create_ensino(
-    title: str = Form(...),
-    description: str = Form(...),
-    subject: str = Form(...),
-    tipo: str = Form(...),
-    video_url: Optional[str] = Form(None),
-    material_file: Optional[UploadFile] = File(None),
-    image_file: Optional[UploadFile] = File(None),
-    current_user: dict = Depends(get_current_user)
-):
-    ensino_id = str(uuid.uuid4())
-    now = datetime.utcnow()
-    
-    # Handle material file upload
-    material_filename = None
-    if material_file:
-        if material_file.size > MAX_FILE_SIZE:
-            raise HTTPException(status_code=413, detail="Material file too large")
-        
-        file_extension = Path(material_file.filename).suffix.lower()
-        allowed_extensions = {".pdf", ".ppt", ".pptx", ".doc", ".docx", ".zip"}
-        if file_extension not in allowed_extensions:
-            raise HTTPException(status_code=400, detail="Invalid material file type")
-        
-        material_filename = f"{ensino_id}_material{file_extension}"
-        material_path = UPLOAD_DIR / material_filename
-        
-        async with aiofiles.open(material_path, 'wb') as f:
-            content = await material_file.read()
-            await f.write(content)
-    
-    # Handle image upload
-    image_filename = None
-    if image_file:
-        if image_file.size > MAX_FILE_SIZE:
-            raise HTTPException(status_code=413, detail="Image file too large")
-        
-        file_extension = Path(image_file.filename).suffix.lower()
-        if file_extension not in ALLOWED_IMAGE_EXTENSIONS:
-            raise HTTPException(status_code=400, detail="Invalid image file type")
-        
-        image_filename = f"{ensino_id}_image{file_extension}"
-        image_path = UPLOAD_DIR / image_filename
-        
-        async with aiofiles.open(image_path, 'wb') as f:
-            content = await image_file.read()
-            await f.write(content)
-    
-    ensino_doc = {
-        "id": ensino_id,
-        "title": title,
-        "description": description,
-        "subject": subject,
-        "tipo": tipo,
-        "video_url": video_url,
-        "file": material_filename,
-        "image_file": image_filename,
-        "created_at": now,
-        "updated_at": now
-    }
-    
-    await ensino_collection.insert_one(ensino_doc)
-    return Ensino(**ensino_doc)
-
-@app.get("/api/ensino", response_model=List[Ensino])
-async def get_ensino():
-    cursor = ensino_collection.find({}).sort("created_at", -1)
-    ensino_list = await cursor.to_list(length=100)
-    return [Ensino(**ensino) for ensino in ensino_list]
-
-@app.delete("/api/ensino/{ensino_id}")
-async def delete_ensino(ensino_id: str, current_user: dict = Depends(get_current_user)):
-    ensino = await ensino_collection.find_one({"id": ensino_id})
-    
-    if not ensino:
-        raise HTTPException(status_code=404, detail="Material not found")
-    
-    # Delete associated files
-    if ensino.get("file"):
-        file_path = UPLOAD_DIR / ensino["file"]
-        if file_path.exists():
-            file_path.unlink()
-    
-    if ensino.get("image_file"):
-        image_path = UPLOAD_DIR / ensino["image_file"]
-        if image_path.exists():
-            image_path.unlink()
-    
-    await ensino_collection.delete_one({"id": ensino_id})
-    return {"message": "Material deleted successfully"}
-
-# Extensão endpoints  
-@app.post("/api/extensao", response_model=Extensao)
-async def create_extensao(
-    title: str = Form(...),
-    description: str = Form(...),
-    location: str = Form(...),
-    tipo: str = Form(...),
-    event_date: Optional[str] = Form(None),
-    video_url: Optional[str] = Form(None),
-    material_file: Optional[UploadFile] = File(None),
-    image_file: Optional[UploadFile] = File(None),
-    current_user: dict = Depends(get_current_user)
-):
-    extensao_id = str(uuid.uuid4())
-    now = datetime.utcnow()
-    
-    # Parse event_date if provided
-    parsed_event_date = None
-    if event_date:
-        try:
-            parsed_event_date = datetime.fromisoformat(event_date)
-        except ValueError:
-            raise HTTPException(status_code=400, detail="Invalid event date format")
-    
-    # Handle material file upload
-    material_filename = None
-    if material_file:
-        if material_file.size > MAX_FILE_SIZE:
-            raise HTTPException(status_code=413, detail="Material file too large")
-        
-        file_extension = Path(material_file.filename).suffix.lower()
-        allowed_extensions = {".pdf", ".ppt", ".pptx", ".doc", ".docx", ".zip"}
-        if file_extension not in allowed_extensions:
-            raise HTTPException(status_code=400, detail="Invalid material file type")
-        
-        material_filename = f"{extensao_id}_material{file_extension}"
-        material_path = UPLOAD_DIR / material_filename
-        
-        async with aiofiles.open(material_path, 'wb') as f:
-            content = await material_file.read()
-            await f.write(content)
-    
-    # Handle image upload
-    image_filename = None
-    if image_file:
-        if image_file.size > MAX_FILE_SIZE:
-            raise HTTPException(status_code=413, detail="Image file too large")
-        
-        file_extension = Path(image_file.filename).suffix.lower()
-        if file_extension not in ALLOWED_IMAGE_EXTENSIONS:
-            raise HTTPException(status_code=400, detail="Invalid image file type")
-        
-        image_filename = f"{extensao_id}_image{file_extension}"
-        image_path = UPLOAD_DIR / image_filename
-        
-        async with aiofiles.open(image_path, 'wb') as f:
-            content = await image_file.read()
-            await f.write(content)
-    
-    extensao_doc = {
-        "id": extensao_id,
-        "title": title,
-        "description": description,
-        "location": location,
-        "tipo": tipo,
-        "event_date": parsed_event_date,
-        "video_url": video_url,
-        "file": material_filename,
-        "image_file": image_filename,
-        "created_at": now,
-        "updated_at": now
-    }
-    
-    await extensao_collection.insert_one(extensao_doc)
-    return Extensao(**extensao_doc)
-
-@app.get("/api/extensao", response_model=List[Extensao])
-async def get_extensao():
-    cursor = extensao_collection.find({}).sort("created_at", -1)
-    extensao_list = await cursor.to_list(length=100)
-    return [Extensao(**extensao) for extensao in extensao_list]
-
-@app.delete("/api/extensao/{extensao_id}")
-async def delete_extensao(extensao_id: str, current_user: dict = Depends(get_current_user)):
-    extensao = await extensao_collection.find_one({"id": extensao_id})
-    
-    if not extensao:
-        raise HTTPException(status_code=404, detail="Activity not found")
-    
-    # Delete associated files
-    if extensao.get("file"):
-        file_path = UPLOAD_DIR / extensao["file"]
-        if file_path.exists():
-            file_path.unlink()
-    
-    if extensao.get("image_file"):
-        image_path = UPLOAD_DIR / extensao["image_file"]
-        if image_path.exists():
-            image_path.unlink()
-    
-    await extensao_collection.delete_one({"id": extensao_id})
-    return {"message": "Activity deleted successfully"}
+    return response
 
 # Download endpoint for ensino materials
 @app.get("/api/download-ensino/{ensino_id}")
-async def download_ensino_material(ensino_id: str):
-    ensino = await ensino_collection.find_one({"id": ensino_id})
+async def download_ensino_material(ensino_id: str, request: Request):
+    ensino = await public_reads["ensino"].find_one({"id": ensino_id})
     
     if not ensino or not ensino.get("file"):
         raise HTTPException(status_code=404, detail="Material file not found")
@@ -826,16 +773,19 @@ async def download_ensino_material(ensino_id: str):
     
     media_type = media_type_map.get(file_extension, 'application/octet-stream')
     
-    return FileResponse(
-        path=file_path,
+    return conditional_file_response(
+        request,
+        file_path,
+        media_type,
         filename=ensino["file"],
-        media_type=media_type
+        content_id=ensino.get("file_hashes", {}).get("file"),
+        last_modified=ensino.get("updated_at")
     )
 
 # Download endpoint for extensão materials
 @app.get("/api/download-extensao/{extensao_id}")
-async def download_extensao_material(extensao_id: str):
-    extensao = await extensao_collection.find_one({"id": extensao_id})
+async def download_extensao_material(extensao_id: str, request: Request):
+    extensao = await public_reads["extensao"].find_one({"id": extensao_id})
     
     if not extensao or not extensao.get("file"):
         raise HTTPException(status_code=404, detail="Material file not found")
@@ -857,68 +807,166 @@ async def download_extensao_material(extensao_id: str):
     
     media_type = media_type_map.get(file_extension, 'application/octet-stream')
     
-    return FileResponse(
-        path=file_path,
+    return conditional_file_response(
+        request,
+        file_path,
+        media_type,
         filename=extensao["file"],
-        media_type=media_type
+        content_id=extensao.get("file_hashes", {}).get("file"),
+        last_modified=extensao.get("updated_at")
     )
 
+# Blob garbage collection endpoint
+@app.post("/api/admin/blobs/gc")
+async def run_blob_gc(current_user: dict = Depends(get_current_user)):
+    return await blob_store.collect_garbage()
+
+# Index report endpoint
+@app.get("/api/admin/indexes")
+async def get_index_report(current_user: dict = Depends(get_current_user)):
+    return index_report
+
+# Background job status endpoints
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str, current_user: dict = Depends(get_current_user)):
+    job = await job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.get("/api/admin/jobs")
+async def get_job_counts(current_user: dict = Depends(get_current_user)):
+    return await job_queue.counts()
+
+# Response cache metrics endpoint
+@app.get("/api/admin/cache")
+async def get_cache_metrics(current_user: dict = Depends(get_current_user)):
+    return response_cache.metrics()
+
+# Query profile endpoints: shapes with the most total Mongo time, and their plans
+@app.get("/api/admin/queries")
+async def get_query_report(limit: int = Query(20, ge=1, le=500), current_user: dict = Depends(get_current_user)):
+    return query_profiler.report(limit)
+
+@app.delete("/api/admin/queries")
+async def reset_query_report(current_user: dict = Depends(get_current_user)):
+    query_profiler.reset()
+    return {"message": "Query profile reset"}
+
+# Prometheus metrics endpoint: scrapers send METRICS_TOKEN, admins their login token.
+# Anonymous scraping (e.g. from inside a private network) is opt-in: METRICS_PUBLIC=true
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN")
+METRICS_PUBLIC = os.environ.get("METRICS_PUBLIC", "false").lower() == "true"
+
+def response_cache_samples():
+    cache = response_cache.metrics()
+    samples = [
+        ("response_cache_entries", "gauge", "Responses held in the cache", {}, cache["entries"]),
+        ("response_cache_bytes", "gauge", "Bytes held in the cache", {}, cache["bytes"]),
+        ("response_cache_evictions_total", "counter", "Entries evicted to stay under the size limit", {}, cache["evictions"]),
+    ]
+    for policy, counts in cache["by_policy"].items():
+        samples.append(("response_cache_hits_total", "counter", "Cache hits by policy", {"policy": policy}, counts["hits"]))
+        samples.append(("response_cache_misses_total", "counter", "Cache misses by policy", {"policy": policy}, counts["misses"]))
+    return samples
+
+metrics.add_collector(response_cache_samples)
+
+async def require_metrics_access(authorization: Optional[str] = Header(None)):
+    if METRICS_PUBLIC:
+        return
+    if METRICS_TOKEN and hmac.compare_digest(authorization or "", f"Bearer {METRICS_TOKEN}"):
+        return
+    scheme, _, credentials = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not credentials:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    await get_current_user(HTTPAuthorizationCredentials(scheme=scheme, credentials=credentials))
+
+@app.get("/api/metrics", dependencies=[Depends(require_metrics_access)])
+async def get_metrics():
+    return Response(metrics.render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
 # Statistics endpoint update
 @app.get("/api/stats")
 async def get_stats():
-    total_products = await products_collection.count_documents({})
-    total_news = await news_collection.count_documents({})
-    total_ensino = await ensino_collection.count_documents({})
-    total_extensao = await extensao_collection.count_documents({})
-    
-    # Count by product type
-    product_types = await products_collection.aggregate([
-        {"$group": {"_id": "$product_type", "count": {"$sum": 1}}}
-    ]).to_list(length=None)
-    
-    # Count by ensino type
-    ensino_types = await ensino_collection.aggregate([
-        {"$group": {"_id": "$tipo", "count": {"$sum": 1}}}
-    ]).to_list(length=None)
-    
-    # Count by extensao type
-    extensao_types = await extensao_collection.aggregate([
-        {"$group": {"_id": "$tipo", "count": {"$sum": 1}}}
-    ]).to_list(length=None)
-    
-    # Recent items
-    recent_products = await products_collection.find({}).sort("created_at", -1).limit(3).to_list(length=3)
-    recent_ensino = await ensino_collection.find({}).sort("created_at", -1).limit(3).to_list(length=3)
-    recent_extensao = await extensao_collection.find({}).sort("created_at", -1).limit(3).to_list(length=3)
+    return ORJSONResponse(await stats_snapshot.get())
+
+# Home bundle: every dashboard section in one request
+HOME_LIMITS = {"products": 20, "news": 10, "ensino": 100, "extensao": 100}
+
+class HomeBundle(BaseModel):
+    products: List[ProductSummary]
+    news: List[News]
+    ensino: List[Ensino]
+    extensao: List[Extensao]
+    stats: Dict[str, Any]
+
+@app.get("/api/home", response_model=HomeBundle)
+async def get_home():
+    def first_page(collection, limit, projection):
+        return collection.find({}, projection).sort(KEYSET_SORT).limit(limit).to_list(length=limit)
+    
+    pages = asyncio.gather(
+        first_page(public_reads["products"], HOME_LIMITS["products"], PRODUCT_SUMMARY_PROJECTION),
+        first_page(public_reads["news"], HOME_LIMITS["news"], projection_for(News.model_fields)),
+        first_page(public_reads["ensino"], HOME_LIMITS["ensino"], projection_for(Ensino.model_fields)),
+        first_page(public_reads["extensao"], HOME_LIMITS["extensao"], projection_for(Extensao.model_fields)),
+    )
     
-    return {
-        "total_products": total_products,
-        "total_news": total_news,
-        "total_ensino": total_ensino,
-        "total_extensao": total_extensao,
-        "product_types": {item["_id"]: item["count"] for item in product_types},
-        "ensino_types": {item["_id"]: item["count"] for item in ensino_types},
-        "extensao_types": {item["_id"]: item["count"] for item in extensao_types},
-        "recent_products": [{"id": p["id"], "title": p["title"], "created_at": p["created_at"]} for p in recent_products],
-        "recent_ensino": [{"id": e["id"], "title": e["title"], "created_at": e["created_at"]} for e in recent_ensino],
-        "recent_extensao": [{"id": e["id"], "title": e["title"], "created_at": e["created_at"]} for e in recent_extensao]
-    }
+    async def recent_from_pages():
+        products, _, ensino, extensao = await pages
+        return recent_from(products), recent_from(ensino), recent_from(extensao)
+    
+    # A stale snapshot is rebuilt from the counts plus the pages loaded here
+    stats = stats_snapshot.get(lambda: compute_stats(
+        public_reads["products"], public_reads["news"], public_reads["ensino"], public_reads["extensao"],
+        recent=recent_from_pages()
+    ))
+    try:
+        (products, news, ensino, extensao), stats = await asyncio.gather(pages, stats)
+    except BaseException:
+        # The stats failed: stop the page queries instead of leaving them running
+        pages.cancel()
+        raise
+    
+    bundle = HomeBundle(products=products, news=news, ensino=ensino, extensao=extensao, stats=stats)
+    return Response(content=bundle.model_dump_json(), media_type="application/json")
 
 # Initialize default admin user and sample news
 @app.on_event("startup")
 async def startup_event():
+    query_profiler.start(client)
+
+    # Reconcile collection indexes before serving any query
+    global index_report
+    index_report = await ensure_indexes(db)
+    for collection_name, entries in index_report.items():
+        changed = [e["name"] for e in entries if e["status"] not in ("ok", "unmanaged")]
+        if changed:
+            print(f"Indexes on {collection_name}: {', '.join(changed)}")
+    
+    product_counters.start()
+    response_cache.versions.start()
+    job_queue.start()
+    
+    # Reclaim blobs left unreferenced by deletes
+    gc_result = await blob_store.collect_garbage()
+    if gc_result["deleted_blobs"] or gc_result["orphan_files"]:
+        print(f"Blob GC: {gc_result}")
+    
     # Always ensure the correct admin user exists with the right credentials
     await users_collection.update_one(
         {"username": "marc0_santos"},
         {"$set": {
             "username": "marc0_santos",
-            "hashed_password": hash_password("tda-8maq9")
+            "hashed_password": await hash_password("tda-8maq9")
         }},
         upsert=True
     )
     
     # Also remove any old admin users that might exist
     await users_collection.delete_many({"username": {"$ne": "marc0_santos"}})
+    principal_cache.clear()
     
     print("Admin user ensured: marc0_santos/tda-8maq9")
     
@@ -960,8 +1008,18 @@ async def startup_event():
         ]
         
         await news_collection.insert_many(sample_news)
+        await content_changed("news")
         print("Sample news created")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    await product_counters.stop()
+    await response_cache.versions.stop()
+    await job_queue.stop()
+    await doi_resolver.close()
+    image_derivatives.close()
+    password_hasher.close()
+
 @app.get("/api/health")
 async def health_check():
     return {"status": "healthy", "message": "Academic Repository API is running"}
\ No newline at end of file
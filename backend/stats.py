@@ -0,0 +1,113 @@
+"""Homepage statistics computed concurrently and served from an in-memory snapshot"""
+import asyncio
+import os
+import time
+from typing import Awaitable, Callable, Optional, Dict, Any, Tuple
+
+STATS_TTL_SECONDS = float(os.environ.get("STATS_TTL_SECONDS", "60"))
+
+
+async def _type_counts(collection, field: str) -> Dict[Any, int]:
+    groups = await collection.aggregate([
+        {"$group": {"_id": f"${field}", "count": {"$sum": 1}}}
+    ]).to_list(length=None)
+    return {item["_id"]: item["count"] for item in groups}
+
+
+RECENT_LIMIT = 3
+
+
+async def _recent(collection, limit: int = RECENT_LIMIT):
+    cursor = collection.find({}, {"_id": 0, "id": 1, "title": 1, "created_at": 1}).sort("created_at", -1).limit(limit)
+    return await cursor.to_list(length=limit)
+
+
+def recent_from(documents: list, limit: int = RECENT_LIMIT) -> list:
+    """The "recent" entries taken from a page already sorted newest first"""
+    return [
+        {"id": document["id"], "title": document["title"], "created_at": document["created_at"]}
+        for document in documents[:limit]
+    ]
+
+
+async def _recent_all(products_collection, ensino_collection, extensao_collection):
+    return await asyncio.gather(
+        _recent(products_collection),
+        _recent(ensino_collection),
+        _recent(extensao_collection),
+    )
+
+
+async def compute_stats(products_collection, news_collection, ensino_collection, extensao_collection,
+                        recent: Optional[Awaitable] = None) -> dict:
+    """All /api/stats figures in one concurrent round of seven queries.
+
+    Totals are the sums of the per-type groups, so no separate
+    count_documents is needed except for news, which has no type.
+    ``recent`` may supply (products, ensino, extensao) recent lists from
+    pages the caller is loading anyway, replacing three of the queries.
+    """
+    (
+        product_types, ensino_types, extensao_types, total_news,
+        (recent_products, recent_ensino, recent_extensao)
+    ) = await asyncio.gather(
+        _type_counts(products_collection, "product_type"),
+        _type_counts(ensino_collection, "tipo"),
+        _type_counts(extensao_collection, "tipo"),
+        news_collection.count_documents({}),
+        recent or _recent_all(products_collection, ensino_collection, extensao_collection),
+    )
+
+    return {
+        "total_products": sum(product_types.values()),
+        "total_news": total_news,
+        "total_ensino": sum(ensino_types.values()),
+        "total_extensao": sum(extensao_types.values()),
+        "product_types": product_types,
+        "ensino_types": ensino_types,
+        "extensao_types": extensao_types,
+        "recent_products": recent_products,
+        "recent_ensino": recent_ensino,
+        "recent_extensao": recent_extensao
+    }
+
+
+class StatsSnapshot:
+    """Caches the stats until one of ``tags`` changes or ``ttl`` expires.
+
+    Validity is keyed on the response cache's tag ``versions``, so with
+    shared (Mongo) versions a write on any worker invalidates every
+    worker's snapshot. Concurrent misses share one refresh. A snapshot
+    computed while a write happened is not trusted beyond that request.
+    """
+
+    def __init__(self, compute, versions, tags: Tuple[str, ...], ttl: float = STATS_TTL_SECONDS):
+        self.compute = compute
+        self.versions = versions
+        self.tags = tags
+        self.ttl = ttl
+        self._stats: Optional[dict] = None
+        self._snapshot_version: Optional[Tuple[int, ...]] = None
+        self._expires_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def _fresh(self) -> bool:
+        return (
+            self._stats is not None
+            and self._snapshot_version == self.versions.current(self.tags)
+            and time.monotonic() < self._expires_at
+        )
+
+    async def get(self, compute: Optional[Callable[[], Awaitable[dict]]] = None) -> dict:
+        """The snapshot, refreshed by ``compute`` (default: the constructor's) when stale"""
+        if self._fresh():
+            return self._stats
+        async with self._lock:
+            if self._fresh():
+                return self._stats
+            version = self.versions.current(self.tags)
+            stats = await (compute or self.compute)()
+            self._stats = stats
+            self._snapshot_version = version
+            self._expires_at = time.monotonic() + self.ttl
+            return stats
@@ -0,0 +1,199 @@
+"""Streaming upload stage and content-addressed blob store shared by every create endpoint"""
+import asyncio
+import hashlib
+import os
+import re
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Set
+
+import aiofiles
+from fastapi import HTTPException, UploadFile
+from fastapi.responses import JSONResponse
+
+from metrics import metrics
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # 1MB
+BLOB_GC_GRACE = timedelta(hours=1)
+FORM_OVERHEAD = 1024 * 1024  # multipart boundaries and the text fields around the files
+
+# Blob files are named "<sha256><ext>"; anything else predates the blob store
+BLOB_FILENAME = re.compile(r"^[0-9a-f]{64}\.[a-z0-9]+$")
+
+
+@dataclass
+class StoredUpload:
+    filename: str
+    size: int
+    sha256: str
+
+
+class BlobStore:
+    """Files in ``upload_dir`` named by their SHA-256, shared by reference count.
+
+    Each blob has a document in ``collection`` (``_id`` is the filename)
+    holding how many records point at it. Deleting a record only releases
+    its reference; ``collect_garbage`` removes blobs nobody has referenced
+    for a grace period, plus blob-named files with no document at all.
+    Files from before the blob store have no document and are unlinked
+    directly when released.
+    """
+
+    def __init__(self, collection, upload_dir: Path):
+        self.collection = collection
+        self.upload_dir = upload_dir
+        # Serializes placing a blob against garbage-collecting it
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, temp_path: Path, sha256: str, extension: str, size: int) -> str:
+        """Move a completed temp file into the store and take a reference"""
+        filename = f"{sha256}{extension}"
+        async with self._lock:
+            await self.collection.update_one(
+                {"_id": filename},
+                {
+                    "$inc": {"refcount": 1},
+                    "$setOnInsert": {"sha256": sha256, "size": size, "created_at": datetime.utcnow()},
+                    "$unset": {"released_at": ""}
+                },
+                upsert=True
+            )
+            # Identical content: replacing the existing blob is a cheap atomic rename
+            os.replace(temp_path, self.upload_dir / filename)
+        return filename
+
+    async def release(self, filename: str):
+        """Drop one reference to a stored file"""
+        blob = await self.collection.find_one_and_update(
+            {"_id": filename},
+            {"$inc": {"refcount": -1}, "$set": {"released_at": datetime.utcnow()}}
+        )
+        if blob is None:
+            path = self.upload_dir / filename
+            if path.exists():
+                path.unlink()
+
+    async def collect_garbage(self, grace: timedelta = BLOB_GC_GRACE) -> dict:
+        """Delete unreferenced blobs, orphaned blob files and stale temp files"""
+        cutoff = datetime.utcnow() - grace
+        deleted_blobs = 0
+        orphan_files = 0
+        freed_bytes = 0
+
+        candidates = await self.collection.find(
+            {"refcount": {"$lte": 0}, "released_at": {"$lt": cutoff}}, {"_id": 1}
+        ).to_list(length=None)
+        for candidate in candidates:
+            async with self._lock:
+                # Re-check atomically: an upload may have re-acquired the blob
+                blob = await self.collection.find_one_and_delete(
+                    {"_id": candidate["_id"], "refcount": {"$lte": 0}}
+                )
+                if blob is None:
+                    continue
+                path = self.upload_dir / blob["_id"]
+                if path.exists():
+                    freed_bytes += path.stat().st_size
+                    path.unlink()
+                deleted_blobs += 1
+
+        known = {doc["_id"] for doc in await self.collection.find({}, {"_id": 1}).to_list(length=None)}
+        for path in self.upload_dir.iterdir():
+            if not path.is_file():
+                continue
+            stat = path.stat()
+            if time.time() - stat.st_mtime < grace.total_seconds():
+                continue
+            is_orphan_blob = BLOB_FILENAME.match(path.name) and path.name not in known
+            is_stale_temp = path.name.startswith(".") and path.name.endswith(".part")
+            if is_orphan_blob or is_stale_temp:
+                freed_bytes += stat.st_size
+                path.unlink()
+                orphan_files += 1
+
+        return {"deleted_blobs": deleted_blobs, "orphan_files": orphan_files, "freed_bytes": freed_bytes}
+
+
+async def save_upload(
+    upload: UploadFile,
+    blob_store: BlobStore,
+    allowed_extensions: Set[str],
+    max_size: int,
+    label: str
+) -> StoredUpload:
+    """Copy an upload into the blob store chunk by chunk.
+
+    The size limit is enforced on the bytes actually received and the
+    SHA-256 is computed while copying. The file only appears under its
+    final, content-addressed name once it is complete.
+    """
+    file_extension = Path(upload.filename or "").suffix.lower()
+    if file_extension not in allowed_extensions:
+        raise HTTPException(status_code=400, detail=f"Invalid {label} file type")
+
+    temp_path = blob_store.upload_dir / f".{uuid.uuid4()}.part"
+    digest = hashlib.sha256()
+    size = 0
+
+    try:
+        async with aiofiles.open(temp_path, 'wb') as f:
+            while True:
+                chunk = await upload.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_size:
+                    raise HTTPException(status_code=413, detail=f"{label.capitalize()} file too large")
+                digest.update(chunk)
+                await f.write(chunk)
+        sha256 = digest.hexdigest()
+        filename = await blob_store.acquire(temp_path, sha256, file_extension, size)
+    finally:
+        if temp_path.exists():
+            temp_path.unlink()
+
+    metrics.inc("upload_bytes_total", size, kind=label)
+    return StoredUpload(filename=filename, size=size, sha256=sha256)
+
+
+class UploadSizeLimitMiddleware:
+    """Rejects oversized upload requests before the multipart body is parsed.
+
+    Starlette spools the whole body to a temp file before any endpoint
+    code runs, so ``save_upload``'s limit alone comes too late. ``limits``
+    maps POST paths to their maximum body size (filled in by the resource
+    registry): a larger ``Content-Length`` is answered with 413 without
+    reading the body, and a body that grows past the limit anyway
+    (chunked, or a lying header) is cut off while it streams in.
+    """
+
+    def __init__(self, app, limits: Dict[str, int]):
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope, receive, send):
+        limit = self.limits.get(scope["path"]) if scope["type"] == "http" and scope["method"] == "POST" else None
+        if limit is None:
+            return await self.app(scope, receive, send)
+
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > limit:
+            response = JSONResponse({"detail": "Request body too large"}, status_code=413)
+            return await response(scope, receive, send)
+
+        received = 0
+
+        async def receive_limited():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # Raised inside request.form(), which FastAPI lets HTTPException through
+                    raise HTTPException(status_code=413, detail="Request body too large")
+            return message
+
+        await self.app(scope, receive_limited, send)
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Find-and-modify benchmark
+Per-call latency of the old read/write/read sequences against find_one_and_update
+and find_one_and_delete, on a local mongod (MONGO_URL, scratch database)
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+import uuid
+from datetime import datetime
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument
+
+MONGO_URL = os.environ.get("MONGO_URL", "mongodb://localhost:27017")
+
+
+async def seed(collection, count):
+    await collection.drop()
+    await collection.create_index("id", unique=True)
+    now = datetime.utcnow()
+    ids = [str(uuid.uuid4()) for _ in range(count)]
+    await collection.insert_many([
+        {"id": product_id, "title": f"Produto {i}", "abstract": "x" * 1000, "created_at": now, "updated_at": now}
+        for i, product_id in enumerate(ids)
+    ])
+    return ids
+
+
+async def update_previous(collection, product_id):
+    await collection.find_one({"id": product_id})
+    await collection.update_one({"id": product_id}, {"$set": {"updated_at": datetime.utcnow()}})
+    return await collection.find_one({"id": product_id})
+
+
+async def update_atomic(collection, product_id):
+    return await collection.find_one_and_update(
+        {"id": product_id},
+        {"$set": {"updated_at": datetime.utcnow()}},
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
+    )
+
+
+async def delete_previous(collection, product_id):
+    await collection.find_one({"id": product_id})
+    await collection.delete_one({"id": product_id})
+
+
+async def delete_atomic(collection, product_id):
+    await collection.find_one_and_delete({"id": product_id})
+
+
+async def timed(function, collection, ids):
+    samples = []
+    for product_id in ids:
+        start = time.perf_counter()
+        await function(collection, product_id)
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        "calls": len(samples),
+        "mean_ms": statistics.fmean(samples),
+        "p50_ms": samples[len(samples) // 2],
+        "p95_ms": samples[int(len(samples) * 0.95)]
+    }
+
+
+async def run(args):
+    client = AsyncIOMotorClient(MONGO_URL)
+    collection = client[args.database].products
+    results = {}
+    try:
+        ids = await seed(collection, args.documents)
+        for name, function in (("update_previous", update_previous), ("update_atomic", update_atomic)):
+            results[name] = await timed(function, collection, ids[:args.calls])
+
+        # Each delete needs its own document, so reseed between the two paths
+        for name, function in (("delete_previous", delete_previous), ("delete_atomic", delete_atomic)):
+            ids = await seed(collection, args.documents)
+            results[name] = await timed(function, collection, ids[:args.calls])
+    finally:
+        await client.drop_database(args.database)
+        client.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--documents", type=int, default=2000)
+    parser.add_argument("--calls", type=int, default=1000)
+    parser.add_argument("--database", default="find_and_modify_benchmark")
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{args.calls} calls against {MONGO_URL}")
+    print(f"{'path':>16} {'mean ms':>8} {'p50 ms':>8} {'p95 ms':>8}")
+    for name, result in results.items():
+        print(f"{name:>16} {result['mean_ms']:>8.2f} {result['p50_ms']:>8.2f} {result['p95_ms']:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+"""
+Load benchmark
+Drives concurrent browse/search/detail/download/upload workloads against the API and reports
+throughput and p50/p95/p99 latency per endpoint. Starts server.py against a scratch database on a
+local mongod unless --base-url points at a running server.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+import httpx
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend")
+
+# Admin account ensured by server.py on startup (same one backend_test.py uses)
+ADMIN = {"username": "marc0_santos", "password": "tda-8maq9"}
+
+SEARCH_TERMS = ["educação", "cotidiano", "escola", "currículo", "formação", "docência"]
+PRODUCT_TYPES = ["Articles", "Books", "Book Chapters", "Projects"]
+DOCUMENT = b"%PDF-1.4\n" + b"0" * 64 * 1024  # 64KB stand-in document
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(samples, fraction):
+    """Nearest-rank percentile of sorted samples"""
+    if not samples:
+        return None
+    return samples[min(len(samples) - 1, max(0, int(round(fraction * len(samples))) - 1))]
+
+
+def product_form(i):
+    return {
+        "title": f"Cotidiano em debate: estudo de carga {i}",
+        "authors": json.dumps(["Maria Silva", "João Santos"]),
+        "abstract": f"Estudo {i} sobre {random.choice(SEARCH_TERMS)} e {random.choice(SEARCH_TERMS)} na escola pública. " * 10,
+        "product_type": random.choice(PRODUCT_TYPES),
+        "publication_year": str(2015 + i % 10),
+        "keywords": json.dumps(random.sample(SEARCH_TERMS, 3))
+    }
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+
+    async def request(self, client, endpoint, method, url, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+            status = response.status_code
+        except httpx.HTTPError as e:
+            response, status = None, type(e).__name__
+        self.latencies[endpoint].append((time.perf_counter() - start) * 1000)
+        self.statuses[endpoint][str(status)] += 1
+        return response
+
+    def report(self, elapsed):
+        results = {}
+        for endpoint, samples in sorted(self.latencies.items()):
+            samples.sort()
+            statuses = dict(self.statuses[endpoint])
+            errors = sum(count for status, count in statuses.items() if not status.startswith(("2", "3")))
+            results[endpoint] = {
+                "requests": len(samples),
+                "throughput_rps": len(samples) / elapsed,
+                "p50_ms": percentile(samples, 0.50),
+                "p95_ms": percentile(samples, 0.95),
+                "p99_ms": percentile(samples, 0.99),
+                "max_ms": samples[-1],
+                "errors": errors,
+                "statuses": statuses
+            }
+        return results
+
+
+class Workloads:
+    """One request (or short request chain) per call, like a single user action"""
+
+    def __init__(self, client, recorder, token, product_ids):
+        self.client = client
+        self.recorder = recorder
+        self.auth = {"Authorization": f"Bearer {token}"}
+        self.product_ids = product_ids
+        self.created = []
+
+    async def browse(self):
+        response = await self.recorder.request(
+            self.client, "GET /api/products?view=summary", "GET", "/api/products",
+            params={"view": "summary", "limit": 20}
+        )
+        cursor = response.headers.get("x-next-cursor") if response is not None else None
+        if cursor:
+            await self.recorder.request(
+                self.client, "GET /api/products?cursor=", "GET", "/api/products",
+                params={"view": "summary", "limit": 20, "cursor": cursor}
+            )
+        await self.recorder.request(self.client, "GET /api/home", "GET", "/api/home")
+
+    async def search(self):
+        await self.recorder.request(
+            self.client, "GET /api/products?search=", "GET", "/api/products",
+            params={"search": random.choice(SEARCH_TERMS), "view": "summary"}
+        )
+
+    async def detail(self):
+        await self.recorder.request(
+            self.client, "GET /api/products/{id}", "GET", f"/api/products/{random.choice(self.product_ids)}"
+        )
+
+    async def download(self):
+        await self.recorder.request(
+            self.client, "GET /api/download/{id}/document", "GET",
+            f"/api/download/{random.choice(self.product_ids)}/document"
+        )
+
+    async def upload(self):
+        response = await self.recorder.request(
+            self.client, "POST /api/products", "POST", "/api/products",
+            data=product_form(random.randrange(10 ** 6)),
+            files={"document_file": ("carga.pdf", DOCUMENT, "application/pdf")},
+            headers=self.auth
+        )
+        if response is not None and response.status_code == 200:
+            self.created.append(response.json()["id"])
+
+
+async def login(client):
+    response = await client.post("/api/auth/login", json=ADMIN)
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+async def seed(client, token, count):
+    """Create ``count`` products with a document; returns their ids"""
+    auth = {"Authorization": f"Bearer {token}"}
+    semaphore = asyncio.Semaphore(8)
+
+    async def create(i):
+        async with semaphore:
+            response = await client.post(
+                "/api/products", data=product_form(i),
+                files={"document_file": (f"seed-{i}.pdf", DOCUMENT + str(i).encode(), "application/pdf")},
+                headers=auth
+            )
+            response.raise_for_status()
+            return response.json()["id"]
+
+    return await asyncio.gather(*(create(i) for i in range(count)))
+
+
+async def cleanup(client, token, product_ids):
+    auth = {"Authorization": f"Bearer {token}"}
+    semaphore = asyncio.Semaphore(8)
+
+    async def delete(product_id):
+        async with semaphore:
+            await client.delete(f"/api/products/{product_id}", headers=auth)
+
+    await asyncio.gather(*(delete(product_id) for product_id in product_ids))
+
+
+def parse_mix(mix):
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        if not hasattr(Workloads, name.strip()):
+            raise SystemExit(f"Unknown workload: {name}")
+        weights[name.strip()] = float(weight or 1)
+    return weights
+
+
+async def run(args, base_url):
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+        token = await login(client)
+        print(f"Seeding {args.products} products...", file=sys.stderr)
+        product_ids = await seed(client, token, args.products)
+
+        recorder = Recorder()
+        workloads = Workloads(client, recorder, token, product_ids)
+        weights = parse_mix(args.mix)
+        names, name_weights = list(weights), list(weights.values())
+
+        # Warm-up requests are not recorded
+        warmup = Workloads(client, Recorder(), token, product_ids)
+        for name in names:
+            await getattr(warmup, name)()
+        workloads.created += warmup.created
+
+        deadline = time.perf_counter() + args.duration
+
+        async def user():
+            while time.perf_counter() < deadline:
+                await getattr(workloads, random.choices(names, weights=name_weights)[0])()
+
+        print(f"Running {args.concurrency} concurrent users for {args.duration}s...", file=sys.stderr)
+        start = time.perf_counter()
+        await asyncio.gather(*(user() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - start
+
+        await cleanup(client, token, product_ids + workloads.created)
+        return recorder.report(elapsed), elapsed
+
+
+def start_server(args, workdir):
+    port = free_port()
+    env = {
+        **os.environ,
+        "MONGO_URL": args.mongo_url,
+        "DB_NAME": args.database,
+        "RATE_LIMIT_BACKEND": "off"
+    }
+    for assignment in args.server_env:
+        key, _, value = assignment.partition("=")
+        env[key] = value
+    # Run from a scratch directory so uploads/ and image_cache/ stay out of the checkout
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:app", "--app-dir", BACKEND_DIR,
+         "--host", "127.0.0.1", "--port", str(port), "--workers", str(args.workers), "--log-level", "warning"],
+        cwd=workdir, env=env
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    for _ in range(100):
+        if process.poll() is not None:
+            raise SystemExit("server.py exited during startup")
+        try:
+            if httpx.get(f"{base_url}/api/health", timeout=1).status_code == 200:
+                return process, base_url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise SystemExit("server.py did not become healthy")
+
+
+def drop_database(args):
+    from pymongo import MongoClient
+    client = MongoClient(args.mongo_url)
+    client.drop_database(args.database)
+    client.close()
+
+
+def print_table(results, elapsed, baseline=None):
+    print(f"{elapsed:.1f}s")
+    print(f"{'endpoint':<34} {'reqs':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for endpoint, result in results.items():
+        line = (
+            f"{endpoint:<34} {result['requests']:>7} {result['throughput_rps']:>8.1f} "
+            f"{result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f} {result['p99_ms']:>8.1f} {result['errors']:>7}"
+        )
+        previous = (baseline or {}).get(endpoint)
+        if previous:
+            line += f"   p95 {result['p95_ms'] - previous['p95_ms']:+.1f} ms vs baseline"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--base-url", help="Benchmark a running server instead of starting one")
+    parser.add_argument("--mongo-url", default=os.environ.get("MONGO_URL", "mongodb://localhost:27017"))
+    parser.add_argument("--database", default="load_benchmark", help="Scratch database, dropped afterwards")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers for the started server")
+    parser.add_argument("--server-env", action="append", default=[], metavar="KEY=VALUE",
+                        help="Extra environment for the started server, e.g. RESPONSE_CACHE_MAX_BYTES=0")
+    parser.add_argument("--products", type=int, default=200, help="Products seeded before the run")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--mix", default="browse=4,search=2,detail=4,download=1,upload=1",
+                        help="Workload weights: browse, search, detail, download, upload")
+    parser.add_argument("--baseline", help="Earlier --output file to compare p95 against")
+    parser.add_argument("--output", help="Write machine-readable results to this file")
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results")
+    args = parser.parse_args()
+
+    process = None
+    workdir = tempfile.TemporaryDirectory(prefix="load-benchmark-")
+    base_url = args.base_url
+    if base_url is None:
+        process, base_url = start_server(args, workdir.name)
+    try:
+        results, elapsed = asyncio.run(run(args, base_url))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+            drop_database(args)
+        workdir.cleanup()
+
+    document = {
+        "base_url": base_url,
+        "concurrency": args.concurrency,
+        "duration_s": elapsed,
+        "mix": args.mix,
+        "endpoints": results
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(document, f, indent=2)
+
+    if args.json:
+        print(json.dumps(document, indent=2))
+        return
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["endpoints"]
+    print_table(results, elapsed, baseline)
+
+
+if __name__ == "__main__":
+    main()
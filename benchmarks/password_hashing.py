@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Password hashing micro-benchmark
+Reports logins/sec per core for each scrypt cost setting, to size PASSWORD_SCRYPT_N
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from hashers import ScryptHasher
+
+
+def bench_setting(n, r, p, iterations, threads):
+    hasher = ScryptHasher(n=n, r=r, p=p)
+    hashed = hasher.hash("benchmark-password")
+
+    # Single core: one verify at a time
+    start = time.perf_counter()
+    for _ in range(iterations):
+        hasher.verify("benchmark-password", hashed)
+    single = time.perf_counter() - start
+
+    # All cores: scrypt releases the GIL, so a thread pool scales with cores
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(lambda _: hasher.verify("benchmark-password", hashed), range(iterations * threads)))
+    parallel = time.perf_counter() - start
+
+    return {
+        "n": n,
+        "r": r,
+        "p": p,
+        "memory_mb": 128 * n * r * p / (1024 * 1024),
+        "ms_per_login": single / iterations * 1000,
+        "logins_per_sec_per_core": iterations / single,
+        "threads": threads,
+        "logins_per_sec_total": iterations * threads / parallel
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--log2-n", type=int, nargs="+", default=[12, 13, 14, 15, 16])
+    parser.add_argument("-r", type=int, default=8)
+    parser.add_argument("-p", type=int, default=1)
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--threads", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results")
+    args = parser.parse_args()
+
+    results = [bench_setting(2 ** log2_n, args.r, args.p, args.iterations, args.threads) for log2_n in args.log2_n]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'N':>8} {'mem MB':>7} {'ms/login':>9} {'logins/s/core':>14} {'logins/s (' + str(args.threads) + ' thr)':>18}")
+    for result in results:
+        print(
+            f"{result['n']:>8} {result['memory_mb']:>7.0f} {result['ms_per_login']:>9.1f} "
+            f"{result['logins_per_sec_per_core']:>14.1f} {result['logins_per_sec_total']:>18.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
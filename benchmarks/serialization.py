@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+List serialization benchmark
+Bytes on the wire and serialization CPU for a 1,000-product listing, before and after the fast JSON path
+"""
+
+import argparse
+import gzip
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend")
+sys.path.insert(0, BACKEND_DIR)
+os.chdir(BACKEND_DIR)  # server.py resolves uploads/ relative to the working directory
+
+from fastapi.encoders import jsonable_encoder
+
+from responses import model_list_response, brotli, GZIP_LEVEL, BROTLI_QUALITY
+from server import Product
+
+# Vocabulary for the generated text; every row gets its own abstract, title,
+# authors and keywords, so compression is measured on realistic, non-repeating rows
+WORDS = (
+    "cotidiano escolar práticas educação contextos urbanos narrativas professores estudantes escola "
+    "pública currículo formação docente pesquisa cultura infância juventude território comunidade "
+    "saberes experiências política avaliação ensino aprendizagem leitura escrita diversidade gênero "
+    "inclusão tecnologia digital memória identidade linguagem arte corpo movimento democracia "
+    "participação gestão família periferia campo cidade sociologia história filosofia metodologia "
+    "etnografia entrevistas análise discurso observação cotidianos redes conversas invenção tática"
+).split()
+NAMES = ["Maria", "João", "Ana", "Pedro", "Luiza", "Carlos", "Beatriz", "Rafael", "Juliana", "Marcos"]
+SURNAMES = ["Silva", "Santos", "Souza", "Oliveira", "Pereira", "Lima", "Carvalho", "Ferreira", "Almeida", "Costa"]
+JOURNALS = ["Revista de Educação", "Currículo sem Fronteiras", "Educação & Sociedade", "Revista Teias"]
+PRODUCT_TYPES = ["Articles", "Books", "Book Chapters", "Projects"]
+
+
+def sentence(rng, words):
+    text = " ".join(rng.choice(WORDS) for _ in range(words))
+    return text[0].upper() + text[1:] + "."
+
+
+def product_fixture(count, seed=0):
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    return [
+        {
+            "_id": uuid.UUID(int=rng.getrandbits(128)).hex,
+            "id": str(uuid.UUID(int=rng.getrandbits(128))),
+            "title": sentence(rng, rng.randint(6, 14)).rstrip("."),
+            "authors": [f"{rng.choice(NAMES)} {rng.choice(SURNAMES)}" for _ in range(rng.randint(1, 4))],
+            "abstract": " ".join(sentence(rng, rng.randint(12, 30)) for _ in range(rng.randint(5, 10))),
+            "product_type": rng.choice(PRODUCT_TYPES),
+            "doi": f"10.{rng.randint(1000, 9999)}/{rng.getrandbits(40):x}",
+            "publication_year": rng.randint(2000, 2024),
+            "journal": rng.choice(JOURNALS),
+            "keywords": rng.sample(WORDS, rng.randint(3, 6)),
+            "url": None,
+            "document_file": None,
+            "audio_file": None,
+            "file_hashes": {},
+            "created_at": now - timedelta(minutes=i),
+            "updated_at": now - timedelta(minutes=i),
+            "view_count": rng.randint(0, 5000),
+            "download_count": rng.randint(0, 1000)
+        }
+        for i in range(count)
+    ]
+
+
+def previous_path(documents):
+    """One model per document, then jsonable_encoder and json.dumps"""
+    products = [Product(**document) for document in documents]
+    return json.dumps(jsonable_encoder(products)).encode()
+
+
+def fast_path(documents):
+    return model_list_response(Product, documents).body
+
+
+def timed(function, documents, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.process_time()
+        body = function(documents)
+        elapsed = time.process_time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return body, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--products", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results")
+    args = parser.parse_args()
+
+    documents = product_fixture(args.products)
+    results = {}
+    for name, function in (("previous", previous_path), ("fast", fast_path)):
+        body, cpu = timed(function, documents, args.repeat)
+        results[name] = {
+            "cpu_ms": cpu * 1000,
+            "identity_bytes": len(body),
+            "gzip_bytes": len(gzip.compress(body, compresslevel=GZIP_LEVEL)),
+            "br_bytes": len(brotli.compress(body, quality=BROTLI_QUALITY)) if brotli else None
+        }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{args.products} products, best of {args.repeat}")
+    print(f"{'path':>9} {'cpu ms':>8} {'identity':>10} {'gzip':>9} {'br':>9}")
+    for name, result in results.items():
+        br = result["br_bytes"] if result["br_bytes"] is not None else "n/a"
+        print(f"{name:>9} {result['cpu_ms']:>8.1f} {result['identity_bytes']:>10} {result['gzip_bytes']:>9} {br:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -160,7 +160,7 @@ const EnsinoCard = ({ ensinoItem, onClick }) => (
     {ensinoItem.image_file && (
       <div className="h-48 overflow-hidden">
         <img 
-          src={`${API_URL}/api/image/${ensinoItem.image_file}`}
+          src={`${API_URL}/api/image/${ensinoItem.image_file}?width=640`}
           alt={ensinoItem.title}
           className="w-full h-full object-cover hover:scale-105 transition-transform duration-300"
         />
@@ -191,7 +191,7 @@ const ExtensaoCard = ({ extensaoItem, onClick }) => (
     {extensaoItem.image_file && (
       <div className="h-48 overflow-hidden">
         <img 
-          src={`${API_URL}/api/image/${extensaoItem.image_file}`}
+          src={`${API_URL}/api/image/${extensaoItem.image_file}?width=640`}
           alt={extensaoItem.title}
           className="w-full h-full object-cover hover:scale-105 transition-transform duration-300"
         />
@@ -222,7 +222,7 @@ const NewsCard = ({ newsItem, onClick }) => (
     {newsItem.image_file && (
       <div className="h-48 overflow-hidden">
         <img 
-          src={`${API_URL}/api/image/${newsItem.image_file}`}
+          src={`${API_URL}/api/image/${newsItem.image_file}?width=640`}
           alt={newsItem.title}
           className="w-full h-full object-cover hover:scale-105 transition-transform duration-300"
         />
@@ -268,7 +268,7 @@ const EnsinoDetail = ({ ensino, onBack }) => (
     {ensino.image_file && (
       <div className="mb-6">
         <img 
-          src={`${API_URL}/api/image/${ensino.image_file}`}
+          src={`${API_URL}/api/image/${ensino.image_file}?width=1280`}
           alt={ensino.title}
           className="w-full max-h-96 object-cover rounded-lg shadow-md"
         />
@@ -340,7 +340,7 @@ const ExtensaoDetail = ({ extensao, onBack }) => (
     {extensao.image_file && (
       <div className="mb-6">
         <img 
-          src={`${API_URL}/api/image/${extensao.image_file}`}
+          src={`${API_URL}/api/image/${extensao.image_file}?width=1280`}
           alt={extensao.title}
           className="w-full max-h-96 object-cover rounded-lg shadow-md"
         />
@@ -459,7 +459,7 @@ const NewsDetail = ({ news, onBack }) => (
     {news.image_file && (
       <div className="mb-6">
         <img 
-          src={`${API_URL}/api/image/${news.image_file}`}
+          src={`${API_URL}/api/image/${news.image_file}?width=1280`}
           alt={news.title}
           className="w-full max-h-96 object-cover rounded-lg shadow-md"
         />
@@ -718,12 +718,17 @@ const ProductDetail = ({ product, onBack }) => (
             className="w-full mb-3"
             preload="metadata"
           >
-            <source src={`${API_URL}/api/download/${product.id}/audio`} type="audio/wav" />
-            <source src={`${API_URL}/api/download/${product.id}/audio`} type="audio/mpeg" />
+            {product.audio_renditions?.opus && (
+              <source src={`${API_URL}/api/download/${product.id}/audio?rendition=opus`} type="audio/ogg; codecs=opus" />
+            )}
+            {product.audio_renditions?.mp3 && (
+              <source src={`${API_URL}/api/download/${product.id}/audio?rendition=mp3`} type="audio/mpeg" />
+            )}
+            <source src={`${API_URL}/api/download/${product.id}/audio`} />
             Seu navegador não suporta o elemento de áudio.
           </audio>
           <div className="flex justify-between items-center text-sm text-gray-600">
-            <span>Formato: WAV</span>
+            <span>Formato: {product.audio_file.split('.').pop().toUpperCase()}</span>
             <a
               href={`${API_URL}/api/download/${product.id}/audio`}
               className="text-blue-600 hover:text-blue-800 transition-colors"
@@ -1130,11 +1135,11 @@ const ProductForm = ({ product, onSave, onCancel, token }) => {
 
           <div>
             <label className="block text-sm font-medium text-gray-700 mb-2">
-              Arquivo de Áudio (WAV - Max 10MB)
+              Arquivo de Áudio (WAV, MP3, M4A, OGG, FLAC - Max 10MB)
             </label>
             <input
               type="file"
-              accept=".wav"
+              accept=".wav,.mp3,.m4a,.ogg,.flac"
               onChange={(e) => setFiles({...files, audio_file: e.target.files[0]})}
               className="w-full px-3 py-2 border border-gray-300 rounded-lg focus:ring-2 focus:ring-blue-500 focus:border-transparent"
             />
@@ -1707,7 +1712,7 @@ const ExtensaoForm = ({ extensao, onSave, onCancel, token }) => {
   );
 };
 
-const PasswordChangeForm = ({ token }) => {
+const PasswordChangeForm = ({ token, onTokenRefresh }) => {
   const [formData, setFormData] = useState({
     current_password: '',
     new_password: '',
@@ -1743,11 +1748,16 @@ const PasswordChangeForm = ({ token }) => {
         }
       };
 
-      await axios.post(`${API_URL}/api/auth/change-password`, {
+      const response = await axios.post(`${API_URL}/api/auth/change-password`, {
         current_password: formData.current_password,
         new_password: formData.new_password
       }, config);
 
+      // Older tokens are revoked by the password change
+      if (response.data.access_token && onTokenRefresh) {
+        onTokenRefresh(response.data.access_token);
+      }
+
       setMessage('Senha alterada com sucesso!');
       setFormData({
         current_password: '',
@@ -1845,7 +1855,7 @@ const PasswordChangeForm = ({ token }) => {
   );
 };
 
-const AdminPanel = ({ token }) => {
+const AdminPanel = ({ token, onTokenRefresh }) => {
   const [products, setProducts] = useState([]);
   const [news, setNews] = useState([]);
   const [ensino, setEnsino] = useState([]);
@@ -1868,29 +1878,60 @@ const AdminPanel = ({ token }) => {
     }
   }, [token]);
 
+  // Each section loaded on its own, so one failing endpoint leaves the others on screen
+  const loadSections = async () => {
+    const section = (path, params) =>
+      axios.get(`${API_URL}${path}`, { params }).then(res => res.data).catch(error => {
+        console.error(`Error loading ${path}:`, error);
+        return null;
+      });
+    const [productsData, newsData, ensinoData, extensaoData, statsData] = await Promise.all([
+      section('/api/products', { view: 'summary' }),
+      section('/api/news'),
+      section('/api/ensino'),
+      section('/api/extensao'),
+      section('/api/stats')
+    ]);
+
+    setProducts(productsData || []);
+    setNews(newsData || []);
+    setEnsino(ensinoData || []);
+    setExtensao(extensaoData || []);
+    setStats(statsData);
+  };
+
   const loadData = async () => {
     setLoading(true);
     try {
-      const [productsRes, newsRes, ensinoRes, extensaoRes, statsRes] = await Promise.all([
-        axios.get(`${API_URL}/api/products`),
-        axios.get(`${API_URL}/api/news`),
-        axios.get(`${API_URL}/api/ensino`).catch(() => ({ data: [] })),
-        axios.get(`${API_URL}/api/extensao`).catch(() => ({ data: [] })),
-        axios.get(`${API_URL}/api/stats`)
-      ]);
+      const { data } = await axios.get(`${API_URL}/api/home`);
       
-      setProducts(productsRes.data);
-      setNews(newsRes.data);
-      setEnsino(ensinoRes.data);
-      setExtensao(extensaoRes.data);
-      setStats(statsRes.data);
+      setProducts(data.products);
+      setNews(data.news);
+      setEnsino(data.ensino);
+      setExtensao(data.extensao);
+      setStats(data.stats);
     } catch (error) {
-      console.error('Error loading data:', error);
+      console.error('Error loading dashboard bundle, loading sections separately:', error);
+      await loadSections();
     } finally {
       setLoading(false);
     }
   };
 
+  // Listing rows are summaries (abstract cut, no journal/keywords/url), so the form loads the full record
+  const editProduct = async (productId) => {
+    try {
+      // Admin read: the public detail endpoint would count this as a view
+      const { data } = await axios.get(`${API_URL}/api/admin/products/${productId}`, {
+        headers: { Authorization: `Bearer ${token}` }
+      });
+      setEditingProduct(data);
+      setShowProductForm(true);
+    } catch (error) {
+      alert('Erro ao carregar produto: ' + (error.response?.data?.detail || error.message));
+    }
+  };
+
   const deleteProduct = async (productId) => {
     if (!window.confirm('Tem certeza que deseja excluir este produto?')) return;
 
@@ -2179,10 +2220,7 @@ const AdminPanel = ({ token }) => {
                           </td>
                           <td className="px-6 py-4 whitespace-nowrap text-sm font-medium">
                             <button
-                              onClick={() => {
-                                setEditingProduct(product);
-                                setShowProductForm(true);
-                              }}
+                              onClick={() => editProduct(product.id)}
                               className="text-indigo-600 hover:text-indigo-900 mr-3"
                             >
                               Editar
@@ -2482,7 +2520,7 @@ const AdminPanel = ({ token }) => {
               
               <div className="grid grid-cols-1 lg:grid-cols-2 gap-8">
                 <div>
-                  <PasswordChangeForm token={token} />
+                  <PasswordChangeForm token={token} onTokenRefresh={onTokenRefresh} />
                 </div>
                 
                 <div className="bg-white rounded-lg shadow-md p-8">
@@ -2580,6 +2618,7 @@ function App() {
     try {
       const response = await axios.get(`${API_URL}/api/products`, {
         params: {
+          view: 'summary',
           product_type: filters.productType || undefined,
           search: filters.search || undefined,
           author: filters.author || undefined,
@@ -2630,6 +2669,11 @@ function App() {
     setCurrentView('admin');
   };
 
+  const handleTokenRefresh = (newToken) => {
+    localStorage.setItem('token', newToken);
+    setToken(newToken);
+  };
+
   const handleLogout = () => {
     localStorage.removeItem('token');
     setToken(null);
@@ -2902,7 +2946,7 @@ function App() {
         )}
 
         {currentView === 'admin' && token && (
-          <AdminPanel token={token} />
+          <AdminPanel token={token} onTokenRefresh={handleTokenRefresh} />
         )}
       </main>
     </div>
@@ -0,0 +1,60 @@
+import os
+import sys
+from pathlib import Path
+
+import httpx
+import pytest
+
+# The backend modules import each other as top-level modules (server.py runs from backend/)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+# Endpoint tests log in many times from one address; test_rate_limit covers the limiter
+os.environ.setdefault("RATE_LIMIT_BACKEND", "off")
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def mongo_db():
+    from mongomock_motor import AsyncMongoMockClient
+    return AsyncMongoMockClient()["tests"]
+
+
+@pytest.fixture
+def server(mongo_db, tmp_path, monkeypatch):
+    """The API module with its collections, upload dirs and caches pointed at the test database"""
+    # server.py creates uploads/ relative to the working directory on import
+    monkeypatch.chdir(tmp_path)
+    import server
+
+    upload_dir = tmp_path / "uploads"
+    upload_dir.mkdir(exist_ok=True)
+    monkeypatch.setattr(server, "UPLOAD_DIR", upload_dir)
+    monkeypatch.setattr(server.blob_store, "upload_dir", upload_dir)
+    monkeypatch.setattr(server.blob_store, "collection", mongo_db.blobs)
+    monkeypatch.setattr(server.image_derivatives, "upload_dir", upload_dir)
+    monkeypatch.setattr(server.image_derivatives, "cache_dir", tmp_path / "image_cache")
+    monkeypatch.setattr(server.job_queue, "collection", mongo_db.jobs)
+    monkeypatch.setattr(server, "products_collection", mongo_db.products)
+    monkeypatch.setattr(server, "users_collection", mongo_db.users)
+    for resource in server.resource_registry.resources.values():
+        monkeypatch.setattr(resource, "collection", mongo_db[resource.name])
+    monkeypatch.setattr(server.public_reads, "primary", mongo_db)
+    monkeypatch.setattr(server.public_reads, "replica", mongo_db)
+    monkeypatch.setattr(server.public_reads, "_primary_collections", {})
+    monkeypatch.setattr(server.public_reads, "_replica_collections", {})
+    server.response_cache.clear()
+    server.principal_cache.clear()
+    yield server
+    server.app.dependency_overrides.clear()
+    server.response_cache.clear()
+    server.principal_cache.clear()
+    server.image_derivatives.close()
+
+
+@pytest.fixture
+async def api(server):
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app), base_url="http://test") as client:
+        yield client
@@ -0,0 +1,80 @@
+import pytest
+
+import principals
+from principals import PrincipalCache
+
+pytestmark = pytest.mark.anyio
+
+PASSWORD = "senha-antiga"
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(principals.time, "monotonic", lambda: now[0])
+    return now
+
+
+@pytest.fixture
+async def admin(server):
+    await server.users_collection.insert_one({
+        "username": "admin", "hashed_password": await server.hash_password(PASSWORD)
+    })
+
+
+async def login(api, password=PASSWORD):
+    response = await api.post("/api/auth/login", json={"username": "admin", "password": password})
+    assert response.status_code == 200, response.text
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def test_principals_are_cached_by_token_id(server, api, admin, clock):
+    headers = await login(api)
+    assert (await api.get("/api/admin/cache", headers=headers)).status_code == 200
+
+    # Served from the cache: the user document is not read again within the TTL
+    await server.users_collection.delete_one({"username": "admin"})
+    assert (await api.get("/api/admin/cache", headers=headers)).status_code == 200
+
+    clock[0] += server.principal_cache.ttl
+    assert (await api.get("/api/admin/cache", headers=headers)).status_code == 401
+
+
+async def test_password_change_revokes_cached_tokens_at_once(server, api, admin, clock):
+    old_headers = await login(api)
+    assert (await api.get("/api/admin/cache", headers=old_headers)).status_code == 200
+
+    response = await api.post("/api/auth/change-password", headers=old_headers, json={
+        "current_password": PASSWORD, "new_password": "senha-nova"
+    })
+    assert response.status_code == 200
+    new_headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    response = await api.get("/api/admin/cache", headers=old_headers)
+    assert response.status_code == 401
+    assert response.json()["detail"] == "Token revoked"
+    assert (await api.get("/api/admin/cache", headers=new_headers)).status_code == 200
+
+
+async def test_token_version_bumped_elsewhere_revokes_within_the_ttl(server, api, admin, clock):
+    headers = await login(api)
+    assert (await api.get("/api/admin/cache", headers=headers)).status_code == 200
+
+    # Another worker revoked the tokens: this one notices when its entry expires
+    await server.users_collection.update_one({"username": "admin"}, {"$inc": {"token_version": 1}})
+    assert (await api.get("/api/admin/cache", headers=headers)).status_code == 200
+
+    clock[0] += server.principal_cache.ttl
+    assert (await api.get("/api/admin/cache", headers=headers)).status_code == 401
+
+
+def test_cache_is_bounded_and_invalidated_per_user(clock):
+    cache = PrincipalCache(ttl=30, max_entries=2)
+    cache.put("t1", {"username": "ana"})
+    cache.put("t2", {"username": "bruno"})
+    assert cache.get("t1") is not None  # t1 is now the most recently used
+    cache.put("t3", {"username": "ana"})
+
+    assert cache.get("t2") is None
+    cache.invalidate_user("ana")
+    assert cache.get("t1") is None and cache.get("t3") is None
@@ -0,0 +1,123 @@
+import httpx
+import pytest
+from fastapi import FastAPI, Request
+
+from conditional import MAX_RANGES, conditional_file_response, parse_range
+
+CONTENT = bytes(range(256)) * 4  # 1024 bytes
+
+
+def test_parse_range_single_and_open_ended():
+    assert parse_range("bytes=0-99", 1024) == [(0, 99)]
+    assert parse_range("bytes=1000-", 1024) == [(1000, 1023)]
+    assert parse_range("bytes=1000-5000", 1024) == [(1000, 1023)]
+
+
+def test_parse_range_suffix():
+    assert parse_range("bytes=-100", 1024) == [(924, 1023)]
+    assert parse_range("bytes=-5000", 1024) == [(0, 1023)]
+
+
+def test_parse_range_merges_overlapping_and_adjacent_ranges():
+    assert parse_range("bytes=500-599, 0-99, 50-149, 150-199", 1024) == [(0, 199), (500, 599)]
+
+
+def test_parse_range_unsatisfiable():
+    assert parse_range("bytes=2000-3000", 1024) == []
+    assert parse_range("bytes=1024-", 1024) == []
+    assert parse_range("bytes=-0", 1024) == []
+
+
+def test_parse_range_ignored_headers():
+    assert parse_range("items=0-10", 1024) is None
+    assert parse_range("bytes=abc", 1024) is None
+    assert parse_range("bytes=10-5", 1024) is None
+    too_many = ",".join(f"{i * 10}-{i * 10 + 1}" for i in range(MAX_RANGES + 1))
+    assert parse_range(f"bytes={too_many}", 1024) is None
+
+
+@pytest.fixture
+def file_app(tmp_path):
+    path = tmp_path / "document.pdf"
+    path.write_bytes(CONTENT)
+    app = FastAPI()
+
+    @app.get("/file")
+    async def serve(request: Request):
+        return conditional_file_response(request, path, "application/pdf", content_id="abc123")
+
+    @app.get("/download")
+    async def download(request: Request):
+        return conditional_file_response(request, path, "application/pdf", filename="relatório.pdf")
+
+    return app
+
+
+@pytest.fixture
+async def client(file_app):
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=file_app), base_url="http://test") as client:
+        yield client
+
+
+@pytest.mark.anyio
+async def test_full_response_advertises_ranges(client):
+    response = await client.get("/file")
+    assert response.status_code == 200
+    assert response.content == CONTENT
+    assert response.headers["etag"] == '"abc123"'
+    assert response.headers["accept-ranges"] == "bytes"
+
+
+@pytest.mark.anyio
+async def test_matching_etag_is_not_modified(client):
+    response = await client.get("/file", headers={"If-None-Match": 'W/"abc123"'})
+    assert response.status_code == 304
+    assert response.content == b""
+
+
+@pytest.mark.anyio
+async def test_single_range(client):
+    response = await client.get("/file", headers={"Range": "bytes=100-199"})
+    assert response.status_code == 206
+    assert response.headers["content-range"] == "bytes 100-199/1024"
+    assert response.headers["content-length"] == "100"
+    assert response.content == CONTENT[100:200]
+
+
+@pytest.mark.anyio
+async def test_multiple_ranges_are_multipart(client):
+    response = await client.get("/file", headers={"Range": "bytes=0-9,500-509"})
+    assert response.status_code == 206
+    content_type = response.headers["content-type"]
+    assert content_type.startswith("multipart/byteranges; boundary=")
+    boundary = content_type.split("boundary=")[1]
+    assert int(response.headers["content-length"]) == len(response.content)
+    assert b"Content-Range: bytes 0-9/1024\r\n\r\n" + CONTENT[0:10] + b"\r\n" in response.content
+    assert b"Content-Range: bytes 500-509/1024\r\n\r\n" + CONTENT[500:510] + b"\r\n" in response.content
+    assert response.content.endswith(f"--{boundary}--\r\n".encode())
+
+
+@pytest.mark.anyio
+async def test_unsatisfiable_range(client):
+    response = await client.get("/file", headers={"Range": "bytes=5000-"})
+    assert response.status_code == 416
+    assert response.headers["content-range"] == "bytes */1024"
+
+
+@pytest.mark.anyio
+async def test_stale_if_range_sends_the_whole_file(client):
+    response = await client.get("/file", headers={"Range": "bytes=0-9", "If-Range": '"older"'})
+    assert response.status_code == 200
+    assert response.content == CONTENT
+
+    response = await client.get("/file", headers={"Range": "bytes=0-9", "If-Range": '"abc123"'})
+    assert response.status_code == 206
+
+
+@pytest.mark.anyio
+async def test_ranges_keep_the_attachment_filename(client):
+    full = await client.get("/download")
+    partial = await client.get("/download", headers={"Range": "bytes=0-9"})
+    assert partial.status_code == 206
+    assert "attachment" in full.headers["content-disposition"]
+    assert partial.headers["content-disposition"] == full.headers["content-disposition"]
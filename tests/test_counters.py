@@ -0,0 +1,93 @@
+import pytest
+from pymongo.errors import AutoReconnect, BulkWriteError
+
+from counters import CounterBuffer
+
+pytestmark = pytest.mark.anyio
+
+
+class FailingCollection:
+    """Wraps a collection; the next bulk_write raises ``error`` after applying the ops it lets through"""
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.error = None
+        self.failing_ids = set()
+
+    async def bulk_write(self, operations, ordered=True):
+        error, self.error = self.error, None
+        if isinstance(error, AutoReconnect):
+            raise error
+        if error is None:
+            return await self.collection.bulk_write(operations, ordered=ordered)
+
+        applied, write_errors = [], []
+        for index, operation in enumerate(operations):
+            if operation._filter["id"] in self.failing_ids:
+                write_errors.append({"index": index, "code": 14, "errmsg": "cannot $inc"})
+            else:
+                applied.append(operation)
+        if applied:
+            await self.collection.bulk_write(applied, ordered=ordered)
+        raise BulkWriteError({"writeErrors": write_errors, "nInserted": 0})
+
+
+@pytest.fixture
+async def products(mongo_db):
+    await mongo_db.products.insert_many([{"id": item_id, "view_count": 0, "download_count": 0} for item_id in "abc"])
+    return mongo_db.products
+
+
+async def counts(products):
+    return {p["id"]: (p["view_count"], p["download_count"]) async for p in products.find({})}
+
+
+async def test_increments_are_merged_into_one_update_per_item(products):
+    buffer = CounterBuffer(products)
+    for _ in range(3):
+        buffer.increment("a", "view_count")
+    buffer.increment("a", "download_count")
+    buffer.increment("b", "view_count", 2)
+
+    assert buffer.pending("a", "view_count") == 3
+    assert await buffer.flush() == 2
+    assert buffer.pending("a", "view_count") == 0
+    assert await counts(products) == {"a": (3, 1), "b": (2, 0), "c": (0, 0)}
+    assert await buffer.flush() == 0
+
+
+async def test_failed_flush_is_retried_with_later_increments(products):
+    collection = FailingCollection(products)
+    buffer = CounterBuffer(collection)
+    buffer.increment("a", "view_count")
+    collection.error = AutoReconnect("primary stepped down")
+
+    assert await buffer.flush() == 0
+    assert buffer.pending("a", "view_count") == 1
+
+    buffer.increment("a", "view_count")
+    assert await buffer.flush() == 1
+    assert await counts(products) == {"a": (2, 0), "b": (0, 0), "c": (0, 0)}
+
+
+async def test_partial_bulk_failure_only_retries_the_failed_updates(products):
+    collection = FailingCollection(products)
+    buffer = CounterBuffer(collection)
+    for item_id in "abc":
+        buffer.increment(item_id, "view_count")
+    collection.failing_ids = {"b"}
+    collection.error = BulkWriteError({})
+
+    assert await buffer.flush() == 2
+    assert buffer.pending("a", "view_count") == 0
+    assert buffer.pending("b", "view_count") == 1
+
+    assert await buffer.flush() == 1
+    assert await counts(products) == {"a": (1, 0), "b": (1, 0), "c": (1, 0)}
+
+
+async def test_discarded_items_are_not_written(products):
+    buffer = CounterBuffer(products)
+    buffer.increment("a", "view_count")
+    buffer.discard("a")
+    assert await buffer.flush() == 0
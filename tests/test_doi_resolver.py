@@ -0,0 +1,106 @@
+import asyncio
+from datetime import timedelta
+
+import httpx
+import pytest
+
+from doi_resolver import DoiResolver, normalize_doi
+
+pytestmark = pytest.mark.anyio
+
+WORK = {"message": {"title": ["Cotidiano em debate"], "author": [{"given": "Maria", "family": "Silva"}]}}
+
+
+class CrossRefStandIn:
+    """Answers /works/{doi} with a fixed status, counting the requests it gets"""
+
+    def __init__(self, status_code=200, delay=0.0, work=WORK):
+        self.status_code = status_code
+        self.delay = delay
+        self.work = work
+        self.paths = []
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.paths.append(request.url.path)
+        await asyncio.sleep(self.delay)
+        if self.status_code == 200:
+            return httpx.Response(200, json=self.work)
+        return httpx.Response(self.status_code, json={"status": "error"})
+
+
+def make_resolver(mongo_db, upstream):
+    return DoiResolver(
+        mongo_db.doi_cache,
+        base_url="http://crossref.test",
+        ttl=timedelta(hours=1),
+        negative_ttl=timedelta(minutes=5),
+        transport=httpx.MockTransport(upstream),
+    )
+
+
+async def test_concurrent_lookups_share_one_request(mongo_db):
+    upstream = CrossRefStandIn(delay=0.05)
+    resolver = make_resolver(mongo_db, upstream)
+
+    results = await asyncio.gather(*(resolver.resolve("10.1234/ABC") for _ in range(10)))
+
+    assert len(upstream.paths) == 1
+    assert all(result == results[0] for result in results)
+    assert results[0]["title"] == "Cotidiano em debate"
+    await resolver.close()
+
+
+async def test_not_found_is_cached_with_negative_ttl(mongo_db):
+    upstream = CrossRefStandIn(status_code=404)
+    resolver = make_resolver(mongo_db, upstream)
+
+    assert await resolver.resolve("10.1234/missing") is None
+    assert await resolver.resolve("10.1234/missing") is None
+
+    assert len(upstream.paths) == 1
+    cached = await mongo_db.doi_cache.find_one({"_id": "10.1234/missing"})
+    assert cached["found"] is False
+    assert cached["expires_at"] - cached["fetched_at"] == timedelta(minutes=5)
+    await resolver.close()
+
+
+async def test_server_errors_are_not_cached(mongo_db):
+    upstream = CrossRefStandIn(status_code=503)
+    resolver = make_resolver(mongo_db, upstream)
+
+    assert await resolver.resolve("10.1234/flaky") is None
+    assert await resolver.resolve("10.1234/flaky") is None
+
+    assert len(upstream.paths) == 2
+    assert await mongo_db.doi_cache.count_documents({}) == 0
+    await resolver.close()
+
+
+@pytest.mark.parametrize("message", [
+    {"title": ["Sem data"], "published-print": {"date-parts": []}},
+    {"title": ["Sem data"], "published-print": {"date-parts": [None]}},
+    {"title": ["Sem data"], "author": "Maria Silva"},
+])
+async def test_malformed_records_resolve_to_none_without_caching(mongo_db, message):
+    upstream = CrossRefStandIn(work={"message": message}, delay=0.01)
+    resolver = make_resolver(mongo_db, upstream)
+
+    results = await asyncio.gather(*(resolver.resolve("10.1234/odd") for _ in range(3)))
+
+    assert results == [None, None, None]
+    assert len(upstream.paths) == 1
+    assert await mongo_db.doi_cache.count_documents({}) == 0
+    await resolver.close()
+
+
+async def test_lookups_use_the_normalized_key(mongo_db):
+    upstream = CrossRefStandIn()
+    resolver = make_resolver(mongo_db, upstream)
+
+    await resolver.resolve("https://doi.org/10.1234/ABC")
+    await resolver.resolve("  doi:10.1234/abc ")
+
+    assert normalize_doi("https://doi.org/10.1234/ABC") == "10.1234/abc"
+    assert upstream.paths == ["/works/10.1234/abc"]
+    assert await mongo_db.doi_cache.find_one({"_id": "10.1234/abc"}) is not None
+    await resolver.close()
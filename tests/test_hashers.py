@@ -0,0 +1,62 @@
+import hashlib
+
+import pytest
+
+from hashers import ScryptHasher
+
+# Cheap parameters keep the suite fast; the format and logic do not depend on them
+FAST = dict(n=2 ** 10, r=8, p=1)
+
+
+@pytest.fixture
+def hasher():
+    hasher = ScryptHasher(**FAST, workers=1)
+    yield hasher
+    hasher.close()
+
+
+def test_hashes_are_salted_and_verify(hasher):
+    first, second = hasher.hash("segredo"), hasher.hash("segredo")
+    assert first != second
+    assert first.startswith("scrypt$1024$8$1$")
+    assert hasher.verify("segredo", first) and hasher.verify("segredo", second)
+    assert not hasher.verify("errado", first)
+
+
+def test_legacy_sha256_hashes_verify(hasher):
+    legacy = hashlib.sha256(b"segredo").hexdigest()
+    assert hasher.verify("segredo", legacy)
+    assert not hasher.verify("errado", legacy)
+
+
+@pytest.mark.parametrize("hashed", ["scrypt$1024$8$1$nosalt", "scrypt$x$8$1$c2FsdA$a2V5", ""])
+def test_malformed_hashes_never_verify(hasher, hashed):
+    assert not hasher.verify("segredo", hashed)
+
+
+def test_needs_rehash(hasher):
+    assert not hasher.needs_rehash(hasher.hash("segredo"))
+    assert hasher.needs_rehash(hashlib.sha256(b"segredo").hexdigest())
+    assert hasher.needs_rehash(ScryptHasher(n=2 ** 11, r=8, p=1).hash("segredo"))
+    # Hashes made with other parameters still verify until they are upgraded
+    assert hasher.verify("segredo", ScryptHasher(n=2 ** 11, r=8, p=1).hash("segredo"))
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("stored", [
+    hashlib.sha256(b"segredo").hexdigest(),
+    ScryptHasher(n=2 ** 11, r=8, p=1).hash("segredo"),
+])
+async def test_login_upgrades_outdated_hashes(server, api, hasher, monkeypatch, stored):
+    monkeypatch.setattr(server, "password_hasher", hasher)
+    await server.users_collection.insert_one({"username": "admin", "hashed_password": stored})
+
+    for _ in range(2):
+        response = await api.post("/api/auth/login", json={"username": "admin", "password": "segredo"})
+        assert response.status_code == 200
+        user = await server.users_collection.find_one({"username": "admin"})
+        assert user["hashed_password"].startswith("scrypt$1024$8$1$")
+        assert not hasher.needs_rehash(user["hashed_password"])
+
+    response = await api.post("/api/auth/login", json={"username": "admin", "password": "errado"})
+    assert response.status_code == 401
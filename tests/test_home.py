@@ -0,0 +1,61 @@
+import asyncio
+import gc
+
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_home_bundles_every_section(server, api, mongo_db):
+    response = await api.get("/api/home")
+    assert response.status_code == 200
+    assert set(response.json()) == {"products", "news", "ensino", "extensao", "stats"}
+
+
+class SlowFailingCollection:
+    """find().sort().limit().to_list() fails after a while; counts the queries still running"""
+
+    running = 0
+
+    def find(self, *args):
+        return self
+
+    def sort(self, *args):
+        return self
+
+    def limit(self, *args):
+        return self
+
+    async def to_list(self, length=None):
+        SlowFailingCollection.running += 1
+        try:
+            await asyncio.sleep(0.02)
+            raise RuntimeError("page query failed")
+        finally:
+            SlowFailingCollection.running -= 1
+
+
+async def test_failing_stats_stop_the_page_queries(server, api, monkeypatch):
+    async def broken_stats(*args, recent=None, **kwargs):
+        recent.close()
+        raise RuntimeError("aggregation failed")
+
+    monkeypatch.setattr(server, "compute_stats", broken_stats)
+    failing_db = {name: SlowFailingCollection() for name in ("products", "news", "ensino", "extensao")}
+    monkeypatch.setattr(server.public_reads, "primary", failing_db)
+    monkeypatch.setattr(server.public_reads, "replica", failing_db)
+    monkeypatch.setattr(server.stats_snapshot, "_stats", None)
+    unretrieved = []
+    loop = asyncio.get_running_loop()
+    loop.set_exception_handler(lambda loop, context: unretrieved.append(context["message"]))
+    try:
+        with pytest.raises(RuntimeError, match="aggregation failed"):
+            await api.get("/api/home")
+        await asyncio.sleep(0)
+        assert SlowFailingCollection.running == 0
+        await asyncio.sleep(0.05)
+        gc.collect()
+    finally:
+        loop.set_exception_handler(None)
+
+    assert unretrieved == []
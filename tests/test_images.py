@@ -0,0 +1,43 @@
+import os
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+from PIL import Image
+
+import images
+from images import DecompressionBombError, ImageDerivatives, render_derivative
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def derivatives(tmp_path):
+    upload_dir = tmp_path / "uploads"
+    upload_dir.mkdir()
+    Image.new("RGB", (800, 400), "teal").save(upload_dir / "photo.png")
+    derivatives = ImageDerivatives(upload_dir, cache_dir=tmp_path / "cache", workers=1)
+    yield derivatives
+    derivatives.close()
+
+
+async def test_renders_in_a_spawned_worker(derivatives):
+    path = await derivatives.get("photo.png", 320, 80, "webp")
+    with Image.open(path) as image:
+        assert image.size == (320, 160)
+    assert derivatives.executor._mp_context.get_start_method() == "spawn"
+
+
+async def test_broken_pool_is_replaced(derivatives):
+    derivatives.executor.submit(os._exit, 1)
+    with pytest.raises(BrokenProcessPool):
+        await derivatives.get("photo.png", 320, 80, "webp")
+
+    path = await derivatives.get("photo.png", 320, 80, "webp")
+    assert path.exists()
+
+
+def test_decompression_bombs_are_refused(derivatives, monkeypatch):
+    monkeypatch.setattr(images.Image, "MAX_IMAGE_PIXELS", 1000)
+    source = derivatives.upload_dir / "photo.png"
+    with pytest.raises(DecompressionBombError):
+        render_derivative(str(source), str(derivatives.upload_dir / "out.webp"), 320, 80, "WEBP")
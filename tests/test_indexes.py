@@ -0,0 +1,52 @@
+import pytest
+from pymongo import ASCENDING
+
+from indexes import IndexSpec, ensure_indexes
+
+pytestmark = pytest.mark.anyio
+
+USERS = {"users": [IndexSpec("username_unique", [("username", ASCENDING)], unique=True)]}
+
+
+def statuses(report, collection="users"):
+    return {entry["name"]: entry["status"] for entry in report[collection]}
+
+
+async def test_missing_indexes_are_created_then_left_alone(mongo_db):
+    assert statuses(await ensure_indexes(mongo_db, USERS)) == {"username_unique": "created"}
+    assert statuses(await ensure_indexes(mongo_db, USERS)) == {"username_unique": "ok"}
+
+
+async def test_matching_index_under_another_name_is_kept(mongo_db):
+    await mongo_db.users.create_index([("username", ASCENDING)], name="username_1", unique=True)
+
+    report = await ensure_indexes(mongo_db, USERS)
+
+    assert report["users"][0]["status"] == "ok"
+    assert report["users"][0]["existing_name"] == "username_1"
+    assert "username_1" in await mongo_db.users.index_information()
+
+
+async def test_drifted_index_is_rebuilt(mongo_db):
+    await mongo_db.users.create_index([("username", ASCENDING)], name="username_unique")
+
+    assert statuses(await ensure_indexes(mongo_db, USERS)) == {"username_unique": "rebuilt"}
+    assert (await mongo_db.users.index_information())["username_unique"]["unique"] is True
+
+
+async def test_unique_rebuild_over_duplicates_keeps_the_old_index(mongo_db):
+    await mongo_db.users.create_index([("username", ASCENDING)], name="username_unique")
+    await mongo_db.users.insert_many([{"username": "admin"}, {"username": "admin"}])
+
+    assert statuses(await ensure_indexes(mongo_db, USERS)) == {"username_unique": "failed"}
+    indexes = await mongo_db.users.index_information()
+    assert indexes["username_unique"]["key"] == [("username", ASCENDING)]
+
+
+async def test_undeclared_indexes_are_reported_and_kept(mongo_db):
+    await mongo_db.users.create_index([("email", ASCENDING)], name="email_1")
+
+    report = await ensure_indexes(mongo_db, USERS)
+
+    assert statuses(report)["email_1"] == "unmanaged"
+    assert "email_1" in await mongo_db.users.index_information()
@@ -0,0 +1,112 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from jobs import JobQueue, backoff
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def queue(mongo_db):
+    queue = JobQueue(mongo_db.jobs, workers=1, poll_interval=0.01, lease=timedelta(seconds=60), max_attempts=3)
+    queue.outcomes = []
+
+    @queue.handler("echo")
+    async def echo(value):
+        queue.outcomes.append(value)
+        return {"echoed": value}
+
+    @queue.handler("broken")
+    async def broken(value):
+        raise RuntimeError(f"cannot handle {value}")
+
+    return queue
+
+
+async def test_enqueue_rejects_unknown_kinds(queue):
+    with pytest.raises(ValueError):
+        await queue.enqueue("missing", {})
+
+
+async def test_claim_takes_due_jobs_oldest_first_and_leases_them(queue):
+    first = await queue.enqueue("echo", {"value": 1})
+    second = await queue.enqueue("echo", {"value": 2})
+    await queue.collection.update_one({"_id": second}, {"$set": {"run_at": datetime.utcnow() + timedelta(hours=1)}})
+
+    job = await queue.claim()
+    assert job["_id"] == first
+    assert job["status"] == "running"
+    assert job["attempts"] == 1
+    assert job["lease_expires_at"] > datetime.utcnow() + timedelta(seconds=50)
+
+    # The other job is not due yet and the first is leased
+    assert await queue.claim() is None
+
+
+async def test_successful_run_marks_the_job_done(queue):
+    job_id = await queue.enqueue("echo", {"value": "ok"})
+    await queue.run(await queue.claim())
+
+    job = await queue.get(job_id)
+    assert job["status"] == "done"
+    assert job["result"] == {"echoed": "ok"}
+    assert "lease_expires_at" not in job
+    assert job["expires_at"] > datetime.utcnow()
+    assert queue.outcomes == ["ok"]
+
+
+async def test_failed_attempts_back_off_then_fail(queue):
+    job_id = await queue.enqueue("broken", {"value": "x"})
+
+    await queue.run(await queue.claim())
+    job = await queue.get(job_id)
+    assert job["status"] == "queued"
+    assert job["error"] == "RuntimeError: cannot handle x"
+    assert job["run_at"] >= datetime.utcnow() + backoff(1) - timedelta(seconds=1)
+    assert await queue.claim() is None  # backing off
+
+    for _ in range(2):
+        await queue.collection.update_one({"_id": job_id}, {"$set": {"run_at": datetime.utcnow()}})
+        await queue.run(await queue.claim())
+
+    job = await queue.get(job_id)
+    assert job["status"] == "failed"
+    assert job["attempts"] == 3
+    assert "expires_at" in job
+
+
+async def test_expired_lease_is_claimed_again(queue):
+    job_id = await queue.enqueue("echo", {"value": 1})
+    await queue.claim()
+    assert await queue.claim() is None
+
+    await queue.collection.update_one(
+        {"_id": job_id}, {"$set": {"lease_expires_at": datetime.utcnow() - timedelta(seconds=1)}}
+    )
+    job = await queue.claim()
+    assert job["_id"] == job_id
+    assert job["attempts"] == 2
+
+
+async def test_workers_run_jobs_and_stop_requeues_interrupted_ones(queue):
+    started = asyncio.Event()
+
+    @queue.handler("slow")
+    async def slow():
+        started.set()
+        await asyncio.sleep(60)
+
+    queue.start()
+    try:
+        done_id = await queue.enqueue("echo", {"value": 1})
+        slow_id = await queue.enqueue("slow", {})
+        await asyncio.wait_for(started.wait(), timeout=5)
+    finally:
+        await queue.stop()
+
+    assert (await queue.get(done_id))["status"] == "done"
+    interrupted = await queue.get(slow_id)
+    assert interrupted["status"] == "queued"
+    assert interrupted["attempts"] == 0  # the interrupted attempt is given back
@@ -0,0 +1,31 @@
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+
+async def admin_token(server):
+    await server.users_collection.insert_one({"username": "admin", "token_version": 0})
+    return server.create_access_token({"sub": "admin", "ver": 0})
+
+
+async def test_metrics_require_authentication(server, api):
+    assert (await api.get("/api/metrics")).status_code == 401
+    assert (await api.get("/api/metrics", headers={"Authorization": "Bearer nonsense"})).status_code == 401
+
+
+async def test_metrics_accept_the_scrape_token(server, api, monkeypatch):
+    monkeypatch.setattr(server, "METRICS_TOKEN", "scrape-secret")
+    response = await api.get("/api/metrics", headers={"Authorization": "Bearer scrape-secret"})
+    assert response.status_code == 200
+    assert "http_requests_total" in response.text
+
+
+async def test_metrics_accept_an_admin_login(server, api):
+    token = await admin_token(server)
+    response = await api.get("/api/metrics", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200
+
+
+async def test_anonymous_metrics_are_opt_in(server, api, monkeypatch):
+    monkeypatch.setattr(server, "METRICS_PUBLIC", True)
+    assert (await api.get("/api/metrics")).status_code == 200
@@ -0,0 +1,47 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException, Response
+
+from pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor, fetch_page
+
+
+def test_cursor_round_trip():
+    created_at = datetime(2024, 5, 1, 12, 30, 15, 123000)
+    query = decode_cursor(encode_cursor({"created_at": created_at, "id": "abc"}))
+    assert query == {"$or": [
+        {"created_at": {"$lt": created_at}},
+        {"created_at": created_at, "id": {"$lt": "abc"}}
+    ]}
+
+
+def test_cursor_is_url_safe():
+    cursor = encode_cursor({"created_at": datetime(2024, 5, 1), "id": "??>>"})
+    assert "=" not in cursor and "+" not in cursor and "/" not in cursor
+
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", "", "e30", "eyJjIjogIm5vdC1hLWRhdGUiLCAiaSI6ICIxIn0"])
+def test_invalid_cursor_is_a_400(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor)
+    assert error.value.status_code == 400
+
+
+@pytest.mark.anyio
+async def test_pages_cover_every_item_once_across_equal_timestamps(mongo_db):
+    base = datetime(2024, 1, 1)
+    # Pairs share a created_at, so pages must break ties on id
+    await mongo_db.items.insert_many([
+        {"id": f"item-{i:02d}", "created_at": base + timedelta(minutes=i // 2)} for i in range(11)
+    ])
+
+    seen, cursor = [], None
+    while True:
+        response = Response()
+        page = await fetch_page(mongo_db.items, {}, response, limit=4, cursor=cursor, projection={"_id": 0})
+        seen += [item["id"] for item in page]
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        if not cursor:
+            break
+
+    assert seen == [f"item-{i:02d}" for i in reversed(range(11))]
@@ -0,0 +1,112 @@
+import httpx
+import pytest
+
+import rate_limit
+from rate_limit import MemoryBucketStore, RateLimitMiddleware, RateLimitPolicy, client_key
+
+
+def scope_from(peer, *forwarded_headers):
+    return {
+        "client": (peer, 51234),
+        "headers": [(b"x-forwarded-for", value.encode()) for value in forwarded_headers],
+    }
+
+
+def test_peer_address_without_trusted_proxies():
+    assert client_key(scope_from("10.0.0.5", "1.2.3.4"), proxy_hops=0) == "10.0.0.5"
+
+
+def test_spoofed_forwarded_entries_are_ignored():
+    # The client sent "6.6.6.6"; the proxy appended the address it saw
+    scope = scope_from("10.0.0.5", "6.6.6.6, 203.0.113.7")
+    assert client_key(scope, proxy_hops=1) == "203.0.113.7"
+
+
+def test_each_trusted_proxy_adds_a_hop():
+    scope = scope_from("10.0.0.5", "6.6.6.6, 203.0.113.7", "10.0.0.2")
+    assert client_key(scope, proxy_hops=2) == "203.0.113.7"
+
+
+def test_missing_header_falls_back_to_the_peer():
+    assert client_key(scope_from("10.0.0.5"), proxy_hops=1) == "10.0.0.5"
+
+
+def test_short_header_never_reaches_client_supplied_entries():
+    assert client_key(scope_from("10.0.0.5", "203.0.113.7"), proxy_hops=3) == "203.0.113.7"
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(rate_limit.time, "monotonic", lambda: now[0])
+    return now
+
+
+@pytest.mark.anyio
+async def test_bucket_allows_a_burst_then_refills_at_the_rate(clock):
+    store = MemoryBucketStore()
+    results = [await store.take("login:1.2.3.4", rate=0.5, burst=3) for _ in range(4)]
+    assert [allowed for allowed, _ in results] == [True, True, True, False]
+    assert results[-1][1] == pytest.approx(2.0)  # one token every 2s
+
+    clock[0] += 2
+    assert (await store.take("login:1.2.3.4", rate=0.5, burst=3))[0] is True
+    assert (await store.take("login:1.2.3.4", rate=0.5, burst=3))[0] is False
+
+    # Refill never exceeds the burst
+    clock[0] += 3600
+    results = [await store.take("login:1.2.3.4", rate=0.5, burst=3) for _ in range(4)]
+    assert [allowed for allowed, _ in results] == [True, True, True, False]
+
+
+@pytest.mark.anyio
+async def test_buckets_are_per_key(clock):
+    store = MemoryBucketStore()
+    assert (await store.take("login:a", rate=1, burst=1))[0] is True
+    assert (await store.take("login:a", rate=1, burst=1))[0] is False
+    assert (await store.take("login:b", rate=1, burst=1))[0] is True
+
+
+@pytest.mark.anyio
+async def test_idle_full_buckets_are_pruned(clock):
+    store = MemoryBucketStore(max_keys=2)
+    await store.take("a", rate=1, burst=1)
+    await store.take("b", rate=1, burst=1)
+    clock[0] += 10
+    await store.take("c", rate=1, burst=1)
+    assert set(store._buckets) == {"c"}
+
+
+@pytest.mark.anyio
+async def test_middleware_answers_429_with_retry_after(clock):
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    policy = RateLimitPolicy("login", ("POST",), r"/api/auth/login", rate=1 / 60, burst=2)
+    middleware = RateLimitMiddleware(app, policies=[policy], store=MemoryBucketStore())
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=middleware), base_url="http://test") as client:
+        statuses = [(await client.post("/api/auth/login")).status_code for _ in range(3)]
+        rejected = await client.post("/api/auth/login")
+        other = await client.get("/api/products")
+
+    assert statuses == [200, 200, 429]
+    assert rejected.headers["retry-after"] == "60"
+    assert other.status_code == 200
+
+
+@pytest.mark.anyio
+async def test_pruning_keeps_buckets_of_slower_policies(clock):
+    store = MemoryBucketStore(max_keys=2)
+    for _ in range(5):
+        await store.take("login:a", rate=5 / 60, burst=5)
+    await store.take("upload:a", rate=0.5, burst=10)
+
+    # Idle past the upload refill time (20s) but not the login one (60s)
+    clock[0] += 30
+    await store.take("upload:b", rate=0.5, burst=10)
+
+    assert set(store._buckets) == {"login:a", "upload:b"}
+    # 30s refilled 2.5 tokens; a reset bucket would allow a full burst of 5
+    results = [await store.take("login:a", rate=5 / 60, burst=5) for _ in range(3)]
+    assert [allowed for allowed, _ in results] == [True, True, False]
@@ -0,0 +1,36 @@
+import pytest
+from pymongo.errors import DuplicateKeyError
+
+from .test_upload_jobs import ADMIN, upload_requests
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture(autouse=True)
+def as_admin(server):
+    server.app.dependency_overrides[server.get_current_user] = lambda: ADMIN
+
+
+async def test_failed_insert_releases_the_stored_uploads(server, api, mongo_db, monkeypatch):
+    resource, data, files = next(upload_requests(server))
+
+    async def insert_one(document):
+        raise DuplicateKeyError("E11000 duplicate key error")
+
+    monkeypatch.setattr(resource.collection, "insert_one", insert_one)
+    with pytest.raises(DuplicateKeyError):
+        await api.post(resource.path, data=data, files=files)
+
+    blobs = await mongo_db.blobs.find({}).to_list(length=None)
+    assert blobs and all(blob["refcount"] == 0 for blob in blobs)
+    assert await mongo_db.jobs.count_documents({}) == 0
+
+
+async def test_stored_uploads_stay_referenced(server, api, mongo_db):
+    resource, data, files = next(upload_requests(server))
+
+    response = await api.post(resource.path, data=data, files=files)
+
+    assert response.status_code == 200
+    blobs = await mongo_db.blobs.find({}).to_list(length=None)
+    assert blobs and all(blob["refcount"] == 1 for blob in blobs)
@@ -0,0 +1,108 @@
+import httpx
+import pytest
+
+from response_cache import CachePolicy, MongoTagVersions, ResponseCache, ResponseCacheMiddleware
+from responses import CompressionMiddleware
+
+pytestmark = pytest.mark.anyio
+
+BODY = b'{"items": [' + b", ".join(b'"produto"' for _ in range(500)) + b"]}"
+
+
+def put(cache, key, tags=("products",)):
+    cache.put(key, 200, [], b"{}", tags, cache.current_versions(tags))
+
+
+async def test_invalidating_a_tag_drops_only_its_entries():
+    cache = ResponseCache()
+    put(cache, "/api/products", ("products",))
+    put(cache, "/api/news", ("news",))
+    put(cache, "/api/stats", ("products", "news"))
+
+    await cache.invalidate("news")
+
+    assert cache.get("/api/products", "products") is not None
+    assert cache.get("/api/news", "news") is None
+    assert cache.get("/api/stats", "stats") is None
+
+
+async def test_mongo_versions_invalidate_other_workers_after_sync(mongo_db):
+    worker_a = ResponseCache(versions=MongoTagVersions(mongo_db.cache_tags))
+    worker_b = ResponseCache(versions=MongoTagVersions(mongo_db.cache_tags))
+    put(worker_b, "/api/products")
+
+    await worker_a.invalidate("products")
+    # Worker B serves its entry until it syncs the shared versions
+    assert worker_b.get("/api/products", "products") is not None
+
+    await worker_b.versions.sync()
+    assert worker_b.get("/api/products", "products") is None
+
+    # Bumps from either worker land on the same shared counter
+    await worker_b.invalidate("products")
+    await worker_a.versions.sync()
+    assert worker_a.versions.current(("products",)) == worker_b.versions.current(("products",)) == (2,)
+
+
+@pytest.fixture
+def cached_app():
+    calls = []
+
+    async def app(scope, receive, send):
+        calls.append(scope["path"])
+        status = 404 if scope["path"] == "/api/products/missing" else 200
+        await send({"type": "http.response.start", "status": status,
+                    "headers": [(b"content-type", b"application/json")]})
+        await send({"type": "http.response.body", "body": BODY})
+
+    hits = []
+    cache = ResponseCache()
+    policies = [
+        CachePolicy("products", r"/api/products", ("products",)),
+        CachePolicy("product", r"/api/products/(?P<product_id>[^/]+)", ("products",),
+                    on_hit=lambda scope, match: hits.append(match["product_id"])),
+    ]
+    middleware = ResponseCacheMiddleware(CompressionMiddleware(app), cache=cache, policies=policies)
+    transport = httpx.ASGITransport(app=middleware)
+    return httpx.AsyncClient(transport=transport, base_url="http://test"), cache, calls, hits
+
+
+async def test_entries_are_keyed_by_negotiated_encoding(cached_app):
+    client, cache, calls, _ = cached_app
+    async with client:
+        gzip_miss = await client.get("/api/products?a=1&b=2", headers={"Accept-Encoding": "gzip"})
+        gzip_hit = await client.get("/api/products?b=2&a=1", headers={"Accept-Encoding": "gzip"})
+        identity = await client.get("/api/products?a=1&b=2", headers={"Accept-Encoding": "identity"})
+
+    assert [r.headers["x-cache"] for r in (gzip_miss, gzip_hit, identity)] == ["MISS", "HIT", "MISS"]
+    assert gzip_hit.headers["content-encoding"] == "gzip" and gzip_hit.content == BODY
+    assert "content-encoding" not in identity.headers and identity.content == BODY
+    assert len(calls) == 2
+    assert cache.metrics()["by_policy"]["products"] == {"hits": 1, "misses": 2}
+
+
+async def test_hits_run_the_policy_side_effects(cached_app):
+    client, _, _, hits = cached_app
+    async with client:
+        await client.get("/api/products/abc")
+        await client.get("/api/products/abc")
+    assert hits == ["abc"]
+
+
+async def test_only_successful_responses_are_cached(cached_app):
+    client, _, calls, _ = cached_app
+    async with client:
+        first = await client.get("/api/products/missing")
+        second = await client.get("/api/products/missing")
+    assert first.status_code == second.status_code == 404
+    assert len(calls) == 2
+
+
+async def test_invalidation_reaches_the_middleware(cached_app):
+    client, cache, calls, _ = cached_app
+    async with client:
+        await client.get("/api/products")
+        await cache.invalidate("products")
+        response = await client.get("/api/products")
+    assert response.headers["x-cache"] == "MISS"
+    assert len(calls) == 2
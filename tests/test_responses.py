@@ -0,0 +1,49 @@
+import httpx
+import pytest
+
+from responses import CompressionMiddleware
+
+pytestmark = pytest.mark.anyio
+
+BODY = b'{"items": [' + b", ".join(b'"item"' for _ in range(500)) + b"]}"
+
+
+def app_sending(body, content_type=b"application/json", headers=()):
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", content_type), *headers]})
+        await send({"type": "http.response.body", "body": body})
+    return app
+
+
+async def get(app, accept_encoding):
+    transport = httpx.ASGITransport(app=CompressionMiddleware(app))
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        return await client.get("/", headers={"Accept-Encoding": accept_encoding})
+
+
+async def test_compressed_response_varies_on_accept_encoding():
+    response = await get(app_sending(BODY), "gzip")
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.content == BODY
+
+
+@pytest.mark.parametrize("accept_encoding, body", [("identity", BODY), ("gzip", b"{}")])
+async def test_uncompressed_response_still_varies_on_accept_encoding(accept_encoding, body):
+    response = await get(app_sending(body), accept_encoding)
+    assert "content-encoding" not in response.headers
+    assert response.headers["vary"] == "Accept-Encoding"
+
+
+async def test_existing_vary_is_extended_once():
+    response = await get(app_sending(BODY, headers=[(b"vary", b"Origin")]), "gzip")
+    assert response.headers["vary"] == "Origin, Accept-Encoding"
+
+    response = await get(app_sending(BODY, headers=[(b"vary", b"accept-encoding")]), "identity")
+    assert response.headers["vary"] == "accept-encoding"
+
+
+async def test_incompressible_types_do_not_vary():
+    response = await get(app_sending(BODY, content_type=b"image/png"), "gzip")
+    assert "vary" not in response.headers
@@ -0,0 +1,45 @@
+import pytest
+
+from response_cache import MongoTagVersions
+from stats import StatsSnapshot
+
+pytestmark = pytest.mark.anyio
+
+TAGS = ("products", "news")
+
+
+def counting_snapshot(versions):
+    calls = []
+
+    async def compute():
+        calls.append(len(calls))
+        return {"computed": len(calls)}
+
+    return StatsSnapshot(compute, versions=versions, tags=TAGS), calls
+
+
+async def test_snapshot_is_reused_until_a_tag_changes(mongo_db):
+    versions = MongoTagVersions(mongo_db.cache_tags)
+    snapshot, calls = counting_snapshot(versions)
+
+    assert await snapshot.get() == {"computed": 1}
+    assert await snapshot.get() == {"computed": 1}
+
+    await versions.bump("extensao")  # not one of the snapshot's tags
+    assert await snapshot.get() == {"computed": 1}
+
+    await versions.bump("news")
+    assert await snapshot.get() == {"computed": 2}
+    assert len(calls) == 2
+
+
+async def test_a_write_on_another_worker_invalidates_the_snapshot(mongo_db):
+    worker_a = MongoTagVersions(mongo_db.cache_tags)
+    worker_b = MongoTagVersions(mongo_db.cache_tags)
+    snapshot_b, _ = counting_snapshot(worker_b)
+    assert await snapshot_b.get() == {"computed": 1}
+
+    await worker_a.bump("products")
+    await worker_b.sync()
+
+    assert await snapshot_b.get() == {"computed": 2}
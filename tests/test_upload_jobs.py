@@ -0,0 +1,58 @@
+"""Every job an upload enqueues runs with the payload the resource registry sends"""
+import io
+
+import httpx
+import pytest
+from PIL import Image
+
+pytestmark = pytest.mark.anyio
+
+ADMIN = {"username": "admin", "token_version": 0}
+
+
+@pytest.fixture(autouse=True)
+def as_admin(server):
+    server.app.dependency_overrides[server.get_current_user] = lambda: ADMIN
+
+
+def png_bytes():
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 48), (200, 30, 30)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+# One create per resource, attaching every upload field that enqueues jobs
+def upload_requests(server):
+    for resource in server.resource_registry.resources.values():
+        uploads = [upload for upload in resource.uploads if upload.jobs]
+        if not uploads or "create" not in resource.routes:
+            continue
+        data = {
+            name: "[]" if "List" in str(info.annotation) else ("2024" if name == "publication_year" else "teste")
+            for name, info in resource.create_model.model_fields.items() if info.is_required()
+        }
+        files = {}
+        for upload in uploads:
+            extension = ".png" if ".png" in upload.extensions else sorted(upload.extensions)[0]
+            files[upload.form_name] = (f"upload{extension}", png_bytes() if extension == ".png" else b"RIFF0000WAVE")
+        yield resource, data, files
+
+
+async def test_every_upload_job_runs_with_the_registry_payload(server):
+    kinds_seen = set()
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app), base_url="http://test") as client:
+        for resource, data, files in upload_requests(server):
+            response = await client.post(resource.path, data=data, files=files)
+            assert response.status_code == 200, (resource.name, response.text)
+
+    while (job := await server.job_queue.claim()) is not None:
+        kinds_seen.add(job["kind"])
+        await server.job_queue.run(job)
+        finished = await server.job_queue.get(job["_id"])
+        assert finished["status"] == "done", (job["kind"], finished["error"])
+
+    registered = {kind for resource in server.resource_registry.resources.values()
+                  for upload in resource.uploads for kind in upload.jobs}
+    assert kinds_seen == registered
+    # The image job did its work rather than skipping
+    assert any(server.image_derivatives.cache_dir.iterdir())
@@ -0,0 +1,150 @@
+import hashlib
+import os
+import time
+import uuid
+from datetime import timedelta
+
+import httpx
+import pytest
+from fastapi import FastAPI, File, UploadFile
+
+from uploads import BlobStore, UploadSizeLimitMiddleware
+
+pytestmark = pytest.mark.anyio
+
+LIMIT = 64 * 1024
+
+
+@pytest.fixture
+def upload_app():
+    app = FastAPI()
+    app.state.calls = 0
+
+    @app.post("/upload")
+    async def upload(document_file: UploadFile = File(...)):
+        app.state.calls += 1
+        return {"size": len(await document_file.read())}
+
+    app.add_middleware(UploadSizeLimitMiddleware, limits={"/upload": LIMIT})
+    return app
+
+
+def client_for(app):
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+
+async def test_body_within_limit_reaches_the_endpoint(upload_app):
+    async with client_for(upload_app) as client:
+        response = await client.post("/upload", files={"document_file": ("a.pdf", b"0" * 1024)})
+    assert response.status_code == 200
+    assert response.json() == {"size": 1024}
+
+
+async def test_declared_oversized_body_is_refused_before_parsing(upload_app):
+    async with client_for(upload_app) as client:
+        response = await client.post("/upload", files={"document_file": ("a.pdf", b"0" * (LIMIT + 1))})
+    assert response.status_code == 413
+    assert upload_app.state.calls == 0
+
+
+async def test_streamed_body_is_cut_off_at_the_limit(upload_app):
+    chunks_sent = 0
+
+    async def body():
+        nonlocal chunks_sent
+        yield b'--b\r\nContent-Disposition: form-data; name="document_file"; filename="a.pdf"\r\n\r\n'
+        for _ in range(100):
+            chunks_sent += 1
+            yield b"0" * 16384
+        yield b"\r\n--b--\r\n"
+
+    async with client_for(upload_app) as client:
+        response = await client.post(
+            "/upload", content=body(), headers={"content-type": "multipart/form-data; boundary=b"}
+        )
+    assert response.status_code == 413
+    assert upload_app.state.calls == 0
+    assert chunks_sent < 100
+
+
+@pytest.fixture
+def blob_store(mongo_db, tmp_path):
+    return BlobStore(mongo_db.blobs, tmp_path)
+
+
+async def store_bytes(blob_store, content: bytes, extension=".pdf") -> str:
+    temp_path = blob_store.upload_dir / f".{uuid.uuid4()}.part"
+    temp_path.write_bytes(content)
+    return await blob_store.acquire(temp_path, hashlib.sha256(content).hexdigest(), extension, len(content))
+
+
+def age(path, seconds):
+    past = time.time() - seconds
+    os.utime(path, (past, past))
+
+
+async def test_identical_content_shares_one_blob(blob_store):
+    first = await store_bytes(blob_store, b"same bytes")
+    second = await store_bytes(blob_store, b"same bytes")
+
+    assert first == second == hashlib.sha256(b"same bytes").hexdigest() + ".pdf"
+    assert [path.name for path in blob_store.upload_dir.iterdir()] == [first]
+    assert (await blob_store.collection.find_one({"_id": first}))["refcount"] == 2
+
+
+async def test_released_blob_survives_until_the_last_reference_and_the_grace(blob_store):
+    filename = await store_bytes(blob_store, b"shared")
+    await store_bytes(blob_store, b"shared")
+
+    await blob_store.release(filename)
+    assert (await blob_store.collect_garbage(grace=timedelta(0)))["deleted_blobs"] == 0
+
+    await blob_store.release(filename)
+    assert (await blob_store.collect_garbage(grace=timedelta(hours=1)))["deleted_blobs"] == 0
+    assert (blob_store.upload_dir / filename).exists()
+
+    released_at = (await blob_store.collection.find_one({"_id": filename}))["released_at"]
+    await blob_store.collection.update_one(
+        {"_id": filename}, {"$set": {"released_at": released_at - timedelta(hours=2)}}
+    )
+    result = await blob_store.collect_garbage(grace=timedelta(hours=1))
+    assert result == {"deleted_blobs": 1, "orphan_files": 0, "freed_bytes": len(b"shared")}
+    assert not (blob_store.upload_dir / filename).exists()
+    assert await blob_store.collection.find_one({"_id": filename}) is None
+
+
+async def test_reacquired_blob_is_not_collected(blob_store):
+    filename = await store_bytes(blob_store, b"comes back")
+    await blob_store.release(filename)
+    await store_bytes(blob_store, b"comes back")
+
+    assert (await blob_store.collect_garbage(grace=timedelta(0)))["deleted_blobs"] == 0
+    blob = await blob_store.collection.find_one({"_id": filename})
+    assert blob["refcount"] == 1
+    assert "released_at" not in blob
+
+
+async def test_gc_removes_orphan_blob_files_and_stale_temp_files(blob_store):
+    kept = await store_bytes(blob_store, b"referenced")
+    orphan = blob_store.upload_dir / ("0" * 64 + ".pdf")
+    orphan.write_bytes(b"orphan")
+    stale_temp = blob_store.upload_dir / ".abc.part"
+    stale_temp.write_bytes(b"partial")
+    fresh_temp = blob_store.upload_dir / ".def.part"
+    fresh_temp.write_bytes(b"in progress")
+    legacy = blob_store.upload_dir / "legacy_image.png"
+    legacy.write_bytes(b"legacy")
+    for path in (blob_store.upload_dir / kept, orphan, stale_temp, legacy):
+        age(path, 7200)
+
+    result = await blob_store.collect_garbage(grace=timedelta(hours=1))
+
+    assert result["orphan_files"] == 2
+    assert sorted(path.name for path in blob_store.upload_dir.iterdir()) == sorted([kept, ".def.part", "legacy_image.png"])
+
+
+async def test_releasing_a_legacy_file_unlinks_it(blob_store):
+    legacy = blob_store.upload_dir / "legacy_document.pdf"
+    legacy.write_bytes(b"legacy")
+    await blob_store.release("legacy_document.pdf")
+    assert not legacy.exists()